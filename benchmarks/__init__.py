@@ -0,0 +1,6 @@
+"""
+بنچمارک مسیر دریافت تصویر با سرور آزمایشی به جای دوربین واقعی
+
+اجرا از ریشه پروژه:
+    python -m benchmarks.run_benchmarks --duration 10
+"""
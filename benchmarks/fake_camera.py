@@ -0,0 +1,410 @@
+"""
+سرور HTTP شبیه دوربین برای بنچمارک بدون ITC231 واقعی
+
+صفحه اصلی (برای test_connection)، CGI عکس و استریم multipart MJPEG را از
+فریم‌های مصنوعی یا ضبط شده ارائه می‌کند. زمان تولید هر فریم به صورت
+بلوک‌های سیاه و سفید در نوار بالای تصویر نوشته می‌شود تا مصرف‌کننده
+بتواند تاخیر سرتاسری را بدون هماهنگی جداگانه اندازه بگیرد.
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+
+STAMP_BITS = 40
+CHECK_BITS = 8
+BOUNDARY = "fakecameraboundary"
+
+SNAPSHOT_PATHS = {"/cgi-bin/snapshot.cgi", "/snapshot.cgi", "/snapshot.jpg"}
+MJPEG_PATHS = {
+    "/mjpeg", "/video.mjpg", "/videostream.cgi", "/video",
+    "/cgi-bin/mjpg/video.cgi", "/axis-cgi/mjpg/video.cgi"
+}
+
+
+def _stamp_geometry(width):
+    """اندازه بلوک‌های مهر زمانی برای عرض تصویر"""
+    block = max(4, width // (STAMP_BITS + CHECK_BITS))
+    return block, max(8, block)
+
+
+def stamp_frame(image, value):
+    """
+    نوشتن یک عدد صحیح (مثلاً زمان تولید بر حسب میلی‌ثانیه) در نوار بالای تصویر
+
+    Args:
+        image (numpy.ndarray): تصویر BGR که در جا تغییر می‌کند
+        value (int): مقدار 40 بیتی
+    """
+    block, height = _stamp_geometry(image.shape[1])
+    check = value % 251
+    bits = [(value >> i) & 1 for i in range(STAMP_BITS)] + [(check >> i) & 1 for i in range(CHECK_BITS)]
+    for i, bit in enumerate(bits):
+        image[:height, i * block:(i + 1) * block] = 255 if bit else 0
+
+
+def read_stamp(image):
+    """
+    خواندن مقدار نوشته شده با stamp_frame
+
+    Args:
+        image (numpy.ndarray): تصویر BGR دریافتی
+
+    Returns:
+        int: مقدار یا None اگر مهر معتبر نباشد
+    """
+    if image is None or image.ndim != 3:
+        return None
+    block, height = _stamp_geometry(image.shape[1])
+    row = image[height // 2, :, 1]
+    bits = [1 if row[i * block + block // 2] > 127 else 0 for i in range(STAMP_BITS + CHECK_BITS)]
+    value = sum(bit << i for i, bit in enumerate(bits[:STAMP_BITS]))
+    check = sum(bit << i for i, bit in enumerate(bits[STAMP_BITS:]))
+    return value if value % 251 == check else None
+
+
+def now_ms():
+    """زمان monotonic بر حسب میلی‌ثانیه (مشترک بین فرآیندهای یک سیستم)"""
+    return int(time.monotonic() * 1000)
+
+
+class FrameSource:
+    """
+    منبع تصاویر پایه: مصنوعی (گرادیان و جسم متحرک) یا فریم‌های ضبط شده
+
+    فریم‌های ضبط شده یک بار خوانده و در حافظه نگه داشته می‌شوند.
+    """
+
+    def __init__(self, width=1280, height=720, path=None, max_frames=300):
+        """
+        مقداردهی اولیه
+
+        Args:
+            width (int): عرض تصویر
+            height (int): ارتفاع تصویر
+            path (str): فایل ویدیو یا پوشه JPEG ها (None یعنی مصنوعی)
+            max_frames (int): حداکثر تعداد فریم ضبط شده در حافظه
+        """
+        self.width = width
+        self.height = height
+        self._recorded = self._load(path, max_frames) if path else []
+
+        x = np.linspace(0, 255, width, dtype=np.float32)
+        y = np.linspace(0, 255, height, dtype=np.float32)
+        self._background = np.dstack([
+            np.tile(x, (height, 1)),
+            np.tile(y[:, None], (1, width)),
+            np.full((height, width), 96, dtype=np.float32)
+        ]).astype(np.uint8)
+
+    def _load(self, path, max_frames):
+        """خواندن فریم‌های ضبط شده از فایل ویدیو یا پوشه تصاویر"""
+        frames = []
+        if os.path.isdir(path):
+            for name in sorted(glob.glob(os.path.join(path, "*.jpg")))[:max_frames]:
+                image = cv2.imread(name)
+                if image is not None:
+                    frames.append(cv2.resize(image, (self.width, self.height)))
+        else:
+            cap = cv2.VideoCapture(path)
+            while len(frames) < max_frames:
+                ret, image = cap.read()
+                if not ret:
+                    break
+                frames.append(cv2.resize(image, (self.width, self.height)))
+            cap.release()
+
+        if not frames:
+            raise IOError(f"هیچ فریمی از {path} خوانده نشد")
+        return frames
+
+    def image(self, index):
+        """
+        تصویر پایه فریم index (کپی قابل تغییر)
+
+        Args:
+            index (int): شماره فریم
+
+        Returns:
+            numpy.ndarray: تصویر BGR
+        """
+        if self._recorded:
+            return self._recorded[index % len(self._recorded)].copy()
+
+        image = self._background.copy()
+        size = max(20, self.height // 6)
+        x = (index * 8) % max(1, self.width - size)
+        y = self.height // 2 - size // 2
+        cv2.rectangle(image, (x, y), (x + size, y + size), (0, 0, 255), -1)
+        cv2.putText(image, f"#{index}", (20, self.height - 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+        return image
+
+
+class FrameProducer(threading.Thread):
+    """
+    تولید فریم با نرخ ثابت؛ هر فریم یک بار encode می‌شود و بین همه کلاینت‌ها مشترک است
+    """
+
+    def __init__(self, source, fps=25.0, quality=85):
+        super().__init__(daemon=True)
+        self.source = source
+        self.fps = fps
+        self.quality = quality
+        self.running = False
+
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+
+    def start(self):
+        """شروع تولید فریم"""
+        self.running = True
+        super().start()
+
+    def stop(self):
+        """توقف تولید فریم"""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+
+    def run(self):
+        """حلقه تولید فریم با زمان‌بندی ثابت"""
+        interval = 1.0 / self.fps
+        next_time = time.monotonic()
+        index = 0
+
+        while self.running:
+            image = self.source.image(index)
+            stamp_frame(image, now_ms())
+            ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+            if ok:
+                with self._condition:
+                    self._jpeg = encoded.tobytes()
+                    self._seq += 1
+                    self._condition.notify_all()
+            index += 1
+
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # عقب افتادن از نرخ؛ زمان‌بندی از اکنون ادامه می‌یابد
+                next_time = time.monotonic()
+
+    def wait_frame(self, after_seq=0, timeout=5.0):
+        """
+        انتظار برای فریمی جدیدتر از after_seq
+
+        Returns:
+            tuple: (seq, jpeg) یا (after_seq, None) در صورت پایان مهلت
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > after_seq or not self.running, timeout)
+            if self._seq <= after_seq:
+                return after_seq, None
+            return self._seq, self._jpeg
+
+
+class FakeCameraHandler(BaseHTTPRequestHandler):
+    """پاسخ به درخواست‌های صفحه اصلی، CGI عکس و استریم MJPEG"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        """لاگ درخواست‌ها خاموش است تا خروجی بنچمارک خوانا بماند"""
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        producer = self.server.producer
+
+        if path == "/":
+            body = b"<html><body>Fake ITC231</body></html>"
+            self._send(200, "text/html", body)
+        elif path in SNAPSHOT_PATHS:
+            _, jpeg = producer.wait_frame()
+            if jpeg is None:
+                self._send(503, "text/plain", b"no frame")
+            else:
+                self._send(200, "image/jpeg", jpeg)
+        elif path in MJPEG_PATHS:
+            self._stream(producer)
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status, content_type, body):
+        """ارسال پاسخ کامل با Content-Length (اتصال keep-alive می‌ماند)"""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, producer):
+        """ارسال پیاپی فریم‌ها به صورت multipart/x-mixed-replace"""
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        seq = 0
+        try:
+            while producer.running:
+                seq, jpeg = producer.wait_frame(seq)
+                if jpeg is None:
+                    continue
+                header = (
+                    f"--{BOUNDARY}\r\n"
+                    f"Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n"
+                ).encode("latin-1")
+                self.wfile.write(header + jpeg + b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class FakeCameraServer:
+    """
+    سرور آزمایشی شبیه دوربین روی یک پورت محلی
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, fps=25.0, width=1280, height=720,
+                 source_path=None, quality=85):
+        """
+        مقداردهی اولیه
+
+        Args:
+            host (str): آدرس گوش دادن
+            port (int): پورت (0 یعنی یک پورت آزاد)
+            fps (float): نرخ تولید فریم
+            width (int): عرض تصویر
+            height (int): ارتفاع تصویر
+            source_path (str): فایل ویدیو یا پوشه JPEG (None یعنی تصویر مصنوعی)
+            quality (int): کیفیت JPEG
+        """
+        source = FrameSource(width, height, source_path)
+        self.producer = FrameProducer(source, fps=fps, quality=quality)
+        self.httpd = ThreadingHTTPServer((host, port), FakeCameraHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.producer = self.producer
+        self._thread = None
+
+    @property
+    def port(self):
+        """پورت واقعی سرور"""
+        return self.httpd.server_address[1]
+
+    def start(self):
+        """شروع تولید فریم و سرور HTTP در پس‌زمینه"""
+        self.producer.start()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """توقف سرور"""
+        self.producer.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _serve_process(conn, kwargs):
+    """نقطه ورود فرآیند سرور: پورت را برمی‌گرداند و تا پایان فرآیند اجرا می‌شود"""
+    server = FakeCameraServer(**kwargs).start()
+    conn.send(server.port)
+    conn.close()
+    while True:
+        time.sleep(3600)
+
+
+def start_server_process(**kwargs):
+    """
+    اجرای سرور در فرآیند جداگانه تا CPU آن در اندازه‌گیری بنچمارک شمرده نشود
+
+    Args:
+        **kwargs: پارامترهای FakeCameraServer
+
+    Returns:
+        tuple: (process, port)؛ پایان با process.terminate()
+    """
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_serve_process, args=(child_conn, kwargs), daemon=True)
+    process.start()
+    child_conn.close()
+    if not parent_conn.poll(30):
+        process.terminate()
+        raise RuntimeError("سرور آزمایشی شروع نشد")
+    port = parent_conn.recv()
+    parent_conn.close()
+    return process, port
+
+
+def make_test_video(path, frames=300, width=1280, height=720, fps=25.0, source_path=None):
+    """
+    ساخت فایل ویدیوی آزمایشی که cv2.VideoCapture بتواند باز کند
+
+    شماره فریم (نه زمان) در نوار بالای تصویر نوشته می‌شود.
+
+    Args:
+        path (str): مسیر فایل خروجی (.avi)
+        frames (int): تعداد فریم
+        width (int): عرض تصویر
+        height (int): ارتفاع تصویر
+        fps (float): نرخ اعلام شده فایل
+        source_path (str): فریم‌های ضبط شده (اختیاری)
+
+    Returns:
+        str: مسیر فایل
+    """
+    source = FrameSource(width, height, source_path)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"امکان ساخت ویدیو وجود ندارد: {path}")
+    try:
+        for index in range(frames):
+            image = source.image(index)
+            stamp_frame(image, index)
+            writer.write(image)
+    finally:
+        writer.release()
+    return path
+
+
+def main():
+    """اجرای مستقل سرور آزمایشی"""
+    parser = argparse.ArgumentParser(description="سرور HTTP شبیه دوربین")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--source", help="فایل ویدیو یا پوشه JPEG به جای تصویر مصنوعی")
+    args = parser.parse_args()
+
+    server = FakeCameraServer(
+        args.host, args.port, fps=args.fps, width=args.width, height=args.height,
+        source_path=args.source
+    ).start()
+    print(f"🎥 دوربین آزمایشی روی http://{args.host}:{server.port}/ (MJPEG: /mjpeg، عکس: /cgi-bin/snapshot.cgi)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
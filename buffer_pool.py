@@ -0,0 +1,246 @@
+import threading
+import weakref
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+
+class BufferLease:
+    """
+    شمارش ارجاع صریح یک آرایه امانت گرفته شده از استخر
+
+    سازنده (حلقه دریافت) با شمارش 1 شروع می‌کند. هر مصرف‌کننده‌ای که فریم را
+    بعد از برگشتن فراخوانی نگه می‌دارد (بافر فریم‌های اخیر، صف ذخیره، ضبط،
+    تصویر در انتظار نمایش) retain و در پایان release می‌کند؛ با رسیدن شمارش
+    به صفر آرایه به استخر برمی‌گردد و می‌تواند بازنویسی شود. leaseی که هرگز
+    آزاد نشود فقط استفاده دوباره را از دست می‌دهد و آرایه مثل هر شیء دیگری
+    جمع‌آوری می‌شود.
+    """
+
+    __slots__ = ("pool", "buffer", "_count")
+
+    def __init__(self, pool, buffer):
+        """
+        مقداردهی اولیه (شمارش 1 متعلق به سازنده)
+
+        Args:
+            pool (BufferPool): استخر صاحب آرایه
+            buffer (numpy.ndarray): آرایه امانت گرفته شده
+        """
+        self.pool = pool
+        self.buffer = buffer
+        self._count = 1
+
+    @property
+    def refs(self):
+        """تعداد ارجاع‌های فعلی"""
+        return self._count
+
+    def retain(self):
+        """
+        افزودن یک ارجاع
+
+        Returns:
+            BufferLease: همین lease
+        """
+        with self.pool._lock:
+            if self._count <= 0:
+                raise RuntimeError("آرایه قبلاً به استخر برگشته است")
+            self._count += 1
+        return self
+
+    def release(self):
+        """کم کردن یک ارجاع؛ آخرین ارجاع آرایه را به استخر برمی‌گرداند"""
+        with self.pool._lock:
+            if self._count <= 0:
+                return
+            self._count -= 1
+            if self._count:
+                return
+        self.pool.release(self.buffer)
+
+
+class BufferPool:
+    """
+    استخر آرایه‌های از پیش ساخته شده برای حذف تخصیص حافظه در هر فریم
+
+    دیکد، کوچک کردن و تبدیل رنگ مستقیماً در آرایه‌های استخر نوشته می‌شوند.
+    امانت صریح است: acquire() یک آرایه آزاد می‌دهد و release() آن را برمی‌گرداند.
+    برای فریم‌هایی که بین چند مصرف‌کننده دست به دست می‌شوند lease() یک
+    BufferLease می‌سازد که با Frame.retain()/Frame.release() شمرده می‌شود.
+    مصرف‌کننده‌ای که فریم را نگه می‌دارد باید retain کند یا کپی بگیرد. اگر
+    آرایه آزاد مناسبی نباشد آرایه جدید ساخته می‌شود و در نرخ تخصیص شمرده می‌شود.
+    """
+
+    def __init__(self, max_buffers=8, name="frames", registry=None, camera=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            max_buffers (int): حداکثر تعداد آرایه‌های آزادی که استخر نگه می‌دارد
+            name (str): برچسب استخر در متریک‌ها (مثلاً "frames" یا "display")
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+        """
+        self.max_buffers = max_buffers
+        self._lock = threading.Lock()
+        self._free = []
+        # آرایه‌های امانت داده شده؛ آرایه‌ای که بدون release رها شود خودکار حذف می‌شود
+        self._borrowed = weakref.WeakValueDictionary()
+        self._last_shape = None
+
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.reuses = 0
+
+        registry = registry if registry is not None else metrics
+        labels = {"pool": name, "camera": camera}
+        self._alloc_rate = registry.rate("buffer_allocations", **labels)
+        self._alloc_bytes = registry.counter("buffer_allocated_bytes", **labels)
+        self._reuse_counter = registry.counter("buffer_reuses", **labels)
+
+    def _count_allocation(self, nbytes):
+        """ثبت یک تخصیص جدید (باید با قفل فراخوانی شود)"""
+        self.allocations += 1
+        self.allocated_bytes += nbytes
+        self._alloc_rate.mark()
+        self._alloc_bytes.inc(nbytes)
+
+    def acquire(self, shape, dtype=np.uint8):
+        """
+        امانت گرفتن یک آرایه آزاد با ابعاد مشخص (یا ساختن آن)
+
+        محتوای آرایه مقدار قبلی است و باید کامل بازنویسی شود. بعد از پایان
+        استفاده باید با release() برگردانده شود.
+
+        Args:
+            shape (tuple): ابعاد آرایه
+            dtype: نوع داده
+
+        Returns:
+            numpy.ndarray: آرایه
+        """
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        with self._lock:
+            for index, buffer in enumerate(self._free):
+                if buffer.shape == shape and buffer.dtype == dtype:
+                    del self._free[index]
+                    self._borrowed[id(buffer)] = buffer
+                    self.reuses += 1
+                    self._reuse_counter.inc()
+                    return buffer
+
+            buffer = np.empty(shape, dtype=dtype)
+            self._count_allocation(buffer.nbytes)
+            self._borrowed[id(buffer)] = buffer
+            return buffer
+
+    def release(self, buffer):
+        """
+        برگرداندن آرایه امانت گرفته شده به استخر
+
+        آرایه‌هایی که از این استخر امانت گرفته نشده‌اند (یا قبلاً برگشته‌اند) نادیده گرفته می‌شوند.
+
+        Args:
+            buffer (numpy.ndarray): آرایه
+        """
+        with self._lock:
+            if self._borrowed.get(id(buffer)) is not buffer:
+                return
+            del self._borrowed[id(buffer)]
+            if len(self._free) >= self.max_buffers:
+                # اول آرایه‌ای با ابعاد قدیمی (مثلاً قبل از تغییر رزولوشن) کنار گذاشته می‌شود
+                stale = next((i for i, free in enumerate(self._free) if free.shape != buffer.shape), 0)
+                del self._free[stale]
+            self._free.append(buffer)
+
+    def lease(self, buffer):
+        """
+        ساختن شمارش ارجاع برای آرایه‌ای که از این استخر امانت گرفته شده است
+
+        Args:
+            buffer (numpy.ndarray): آرایه برگردانده شده از acquire یا retrieve
+
+        Returns:
+            BufferLease: lease با شمارش 1 یا None اگر آرایه متعلق به استخر نباشد
+        """
+        if buffer is None:
+            return None
+        with self._lock:
+            if self._borrowed.get(id(buffer)) is not buffer:
+                return None
+        return BufferLease(self, buffer)
+
+    def retrieve(self, cap):
+        """
+        دیکد فریم grab شده در یک آرایه امانت گرفته شده از استخر
+
+        فقط cv2.VideoCapture خروجی را در آرایه داده شده می‌نویسد؛ برای بقیه
+        منابع (MJPEGReader) همان retrieve معمولی صدا زده می‌شود و آرایه
+        متعلق به استخر نیست.
+
+        Args:
+            cap: منبع تصویر
+
+        Returns:
+            tuple: (ret, image) مشابه cv2.VideoCapture.retrieve؛ image تا release
+                (مستقیم یا با lease) امانت است
+        """
+        if not isinstance(cap, cv2.VideoCapture):
+            return cap.retrieve()
+
+        buffer = self.acquire(self._last_shape) if self._last_shape is not None else None
+        ret, image = cap.retrieve(image=buffer) if buffer is not None else cap.retrieve()
+        if not ret or image is None:
+            if buffer is not None:
+                self.release(buffer)
+            return False, None
+        if image is not buffer:
+            # اولین فریم یا تغییر ابعاد: OpenCV آرایه جدید ساخته است
+            if buffer is not None:
+                self.release(buffer)
+            self._last_shape = image.shape
+            with self._lock:
+                self._count_allocation(image.nbytes)
+                self._borrowed[id(image)] = image
+        return True, image
+
+    def read(self, cap):
+        """
+        grab و دیکد فریم بعدی در آرایه استخر
+
+        Args:
+            cap: منبع تصویر
+
+        Returns:
+            tuple: (ret, image) مشابه cv2.VideoCapture.read
+        """
+        if not isinstance(cap, cv2.VideoCapture):
+            return cap.read()
+        if not cap.grab():
+            return False, None
+        return self.retrieve(cap)
+
+    def get_stats(self):
+        """
+        آمار استخر
+
+        Returns:
+            dict: تعداد آرایه‌های آزاد و امانت، تخصیص‌ها (کل و در ثانیه) و استفاده‌های دوباره
+        """
+        with self._lock:
+            free = len(self._free)
+            busy = len(self._borrowed)
+            pooled_bytes = sum(buffer.nbytes for buffer in self._free)
+        return {
+            "buffers": free + busy,
+            "busy": busy,
+            "pooled_bytes": pooled_bytes,
+            "allocations": self.allocations,
+            "allocations_per_second": self._alloc_rate.rate(),
+            "allocated_bytes": self.allocated_bytes,
+            "reuses": self.reuses
+        }
@@ -0,0 +1,242 @@
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+def burst_filename(directory, prefix, wall_time, index, ext=".jpg"):
+    """
+    نام فایل یک عکس سری با زمان دقیق دریافت (تا میلی‌ثانیه)
+
+    Args:
+        directory (str): پوشه خروجی
+        prefix (str): پیشوند نام (مثلاً "series")
+        wall_time (float): زمان واقعی دریافت فریم
+        index (int): شماره عکس در سری (از 1)
+        ext (str): پسوند فایل
+
+    Returns:
+        str: مسیر مثل snapshots/series_20250814_105916_123_1.jpg
+    """
+    stamp = datetime.fromtimestamp(wall_time)
+    name = f"{prefix}_{stamp.strftime('%Y%m%d_%H%M%S')}_{stamp.microsecond // 1000:03d}_{index}{ext}"
+    return os.path.join(directory, name)
+
+
+class BurstCapture:
+    """
+    جمع‌آوری یک سری عکس از فریم‌های استریم با فاصله دقیق
+
+    فریم‌ها با offer() از حلقه دریافت (یا بافر فریم‌های اخیر) داده می‌شوند؛
+    زمان هر عکس بر اساس زمان دریافت فریم (نه زمان ذخیره) انتخاب می‌شود و
+    encode و نوشتن به صورت موازی روی SnapshotWriter انجام می‌شود. offer()
+    هرگز منتظر نمی‌ماند: فریم‌های انتخاب شده در صف جداگانه سری قرار می‌گیرند
+    و یک thread مخصوص سری آن‌ها را (در صورت پر بودن صف ذخیره با انتظار) به
+    SnapshotWriter می‌دهد؛ اگر صف سری هم پر باشد فریم رد و در خلاصه ثبت
+    می‌شود. بعد از پایان، یک فایل JSON کنار عکس‌ها زمان دقیق، شماره فریم و
+    منبع هر عکس را نگه می‌دارد.
+    """
+
+    def __init__(self, writer, count, interval=None, directory="snapshots", prefix="series",
+                 quality=95, camera_id=None, copy_images=False, source="live", max_pending=64):
+        """
+        مقداردهی اولیه
+
+        Args:
+            writer (SnapshotWriter): صف ذخیره موازی
+            count (int): تعداد عکس‌ها
+            interval (float): فاصله بین عکس‌ها بر حسب ثانیه (None یا 0 یعنی همه فریم‌ها)
+            directory (str): پوشه خروجی
+            prefix (str): پیشوند نام فایل‌ها
+            quality (int): کیفیت JPEG
+            camera_id (str): شناسه دوربین برای فایل متادیتا
+            copy_images (bool): کپی تصویر قبل از صف (برای فریم‌های حافظه مشترک)
+            source (str): منبع فریم‌ها برای متادیتا ("live" یا "buffer")
+            max_pending (int): حداکثر فریم‌های سری در انتظار صف ذخیره
+        """
+        if count < 1:
+            raise ValueError("تعداد عکس‌های سری باید حداقل 1 باشد")
+
+        self.writer = writer
+        self.count = count
+        self.interval = interval or 0.0
+        self.directory = directory
+        self.prefix = prefix
+        self.quality = quality
+        self.camera_id = camera_id
+        self.copy_images = copy_images
+        self.source = source
+
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._first_ts = None
+        self._last_seq = None
+        self.items = []
+        self.skipped = 0
+        self.missed_frames = 0
+        self.dropped = 0
+        self.started_at = time.monotonic()
+
+        # صف خود سری تا thread دریافت هرگز پشت صف پر SnapshotWriter نماند
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._dispatcher = None
+
+    @property
+    def done(self):
+        """آیا همه عکس‌های سری جمع‌آوری شده‌اند"""
+        return self._done.is_set()
+
+    def _is_due(self, frame):
+        """آیا زمان این فریم به عکس بعدی سری رسیده است"""
+        if self._first_ts is None or not self.interval:
+            return True
+        # هدف هر عکس از اولین عکس حساب می‌شود تا خطای زمان‌بندی جمع نشود
+        target = self._first_ts + len(self.items) * self.interval
+        return frame.timestamp >= target - self.interval * 0.25
+
+    def offer(self, frame):
+        """
+        پیشنهاد یک فریم دریافتی به سری
+
+        Args:
+            frame (Frame): فریم استریم یا بافر
+
+        Returns:
+            bool: True وقتی سری کامل شده است
+        """
+        if frame is None:
+            return self.done
+
+        with self._lock:
+            if self.done:
+                return True
+            if self._last_seq is not None and frame.seq and frame.seq > self._last_seq + 1:
+                # فریم‌هایی که به دست جمع‌آوری نرسیده‌اند (مثلاً grabber جلو افتاده)
+                self.missed_frames += frame.seq - self._last_seq - 1
+            if frame.seq:
+                self._last_seq = frame.seq
+
+            if not self._is_due(frame):
+                self.skipped += 1
+                return False
+
+            if self._first_ts is None:
+                self._first_ts = frame.timestamp
+            index = len(self.items) + 1
+            filename = burst_filename(self.directory, self.prefix, frame.wall_time, index)
+            if self.copy_images and frame.is_decoded:
+                frame = frame.with_image(frame.image.copy())
+
+            item = {
+                "index": index,
+                "path": filename,
+                "wall_time": frame.wall_time,
+                "offset_ms": (frame.timestamp - self._first_ts) * 1000,
+                "seq": frame.seq,
+                "source_url": frame.source_url,
+                "future": None
+            }
+            self.items.append(item)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+                self._dispatcher.start()
+            # فریم استخر تا سپردن به SnapshotWriter نگه داشته می‌شود
+            frame.retain()
+            try:
+                self._pending.put_nowait((frame, item))
+            except queue.Full:
+                frame.release()
+                item["dropped"] = True
+                self.dropped += 1
+
+            if len(self.items) >= self.count:
+                self._done.set()
+            return self.done
+
+    def _dispatch_loop(self):
+        """thread سری: دادن فریم‌های صف سری به SnapshotWriter با انتظار برای جای خالی"""
+        while True:
+            job = self._pending.get()
+            if job is None:
+                break
+            frame, item = job
+            try:
+                item["future"] = self.writer.submit(
+                    frame, item["path"], quality=self.quality, block=True, timeout=10.0
+                )
+            finally:
+                frame.release()
+
+    def finish(self, timeout=None):
+        """
+        پایان سری: انتظار برای ذخیره عکس‌ها و نوشتن فایل متادیتا
+
+        اگر سری کامل نشده باشد (مثلاً پایان مهلت) همان عکس‌های گرفته شده ثبت می‌شوند.
+
+        Args:
+            timeout (float): حداکثر انتظار برای ذخیره هر عکس
+
+        Returns:
+            dict: خلاصه سری شامل مسیر عکس‌ها، فاصله‌های واقعی و مسیر فایل متادیتا
+        """
+        with self._lock:
+            self._done.set()
+            items = list(self.items)
+            dispatcher, self._dispatcher = self._dispatcher, None
+        if dispatcher is not None:
+            # همه فریم‌های صف سری قبل از خواندن نتیجه‌ها به SnapshotWriter داده می‌شوند
+            self._pending.put(None)
+            dispatcher.join()
+
+        frames = []
+        for item in items:
+            entry = {key: value for key, value in item.items() if key != "future"}
+            entry["captured_at"] = datetime.fromtimestamp(item["wall_time"]).isoformat(timespec="milliseconds")
+            future = item["future"]
+            if item.get("dropped"):
+                entry["error"] = "صف سری پر بود؛ فریم رد شد"
+            elif future is None:
+                entry["error"] = "صف ذخیره پر بود"
+            else:
+                try:
+                    result = future.result(timeout)
+                    entry["bytes"] = result["bytes"]
+                    entry["encode_ms"] = result["encode_ms"]
+                    entry["write_ms"] = result["write_ms"]
+                except Exception as e:
+                    entry["error"] = str(e)
+            frames.append(entry)
+
+        offsets = [entry["offset_ms"] for entry in frames]
+        gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+        summary = {
+            "camera": self.camera_id,
+            "source": self.source,
+            "requested_count": self.count,
+            "count": len(frames),
+            "saved": sum(1 for entry in frames if "error" not in entry),
+            "interval_ms": self.interval * 1000 if self.interval else None,
+            "span_ms": offsets[-1] if offsets else 0.0,
+            "mean_gap_ms": sum(gaps) / len(gaps) if gaps else None,
+            "max_gap_ms": max(gaps) if gaps else None,
+            "frames_skipped": self.skipped,
+            "frames_missed": self.missed_frames,
+            "frames_dropped": self.dropped,
+            "elapsed_s": time.monotonic() - self.started_at,
+            "frames": frames
+        }
+
+        if frames:
+            first = frames[0]
+            metadata_path = burst_filename(self.directory, self.prefix, first["wall_time"], 0, ext=".json")
+            metadata_path = metadata_path[:-len("_0.json")] + ".json"
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(metadata_path, "w", encoding="utf-8") as f:
+                    json.dump(summary, f, ensure_ascii=False, indent=2)
+                summary["metadata"] = metadata_path
+            except Exception as e:
+                print(f"❌ خطا در ذخیره متادیتای سری: {str(e)}")
+        return summary
@@ -0,0 +1,92 @@
+import json
+import os
+
+
+DEFAULT_SETTINGS_PATH = "camera_settings.json"
+
+# متغیر محیطی برای رمز عبور تا روی سرورها در فایل تنظیمات نوشته نشود
+PASSWORD_ENV = "CAMERA_PASSWORD"
+
+DEFAULT_SETTINGS = {
+    "camera_ip": "192.168.1.108",
+    "username": "admin",
+    "password": "",
+    "port": 80,
+    "camera_model": "ITC231-RF1A-IR",
+    "stream_backend": "opencv",
+    "stream_urls": None,
+    "target_fps": 0,
+    "dual_stream": True,
+    "quality": 95,
+    "auto_naming": True,
+    "motion_detection": False,
+    "info_overlay": False,
+    "snapshot_dir": "snapshots",
+    "recording_dir": "recordings",
+    "record_segment_seconds": 300,
+    "record_quota_gb": 50,
+    "log_file": None
+}
+
+
+def load_settings(path=DEFAULT_SETTINGS_PATH):
+    """
+    خواندن تنظیمات از فایل JSON همراه با مقادیر پیش‌فرض
+
+    کلیدهای ناموجود از DEFAULT_SETTINGS پر می‌شوند و رمز عبور در صورت
+    تعیین متغیر محیطی CAMERA_PASSWORD از آن خوانده می‌شود. این ماژول
+    فقط کتابخانه‌های استاندارد را وارد می‌کند تا شروع برنامه سریع بماند.
+
+    Args:
+        path (str): مسیر فایل تنظیمات
+
+    Returns:
+        dict: تنظیمات کامل
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                settings.update(loaded)
+            else:
+                print(f"❌ قالب فایل تنظیمات نامعتبر است: {path}")
+        except (OSError, ValueError) as e:
+            print(f"❌ خطا در خواندن تنظیمات: {str(e)}")
+
+    password = os.environ.get(PASSWORD_ENV)
+    if password:
+        settings["password"] = password
+    return settings
+
+
+def save_settings(settings, path=DEFAULT_SETTINGS_PATH):
+    """
+    ذخیره تنظیمات با حفظ کلیدهایی که در settings نیستند (مثلاً رمز عبور)
+
+    Args:
+        settings (dict): کلیدهای تغییر کرده
+        path (str): مسیر فایل تنظیمات
+
+    Returns:
+        bool: True اگر ذخیره موفق باشد
+    """
+    current = {}
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            current = {}
+    current.update(settings)
+
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+        return True
+    except OSError as e:
+        print(f"❌ خطا در ذخیره تنظیمات: {str(e)}")
+        return False
@@ -2,17 +2,38 @@ import cv2
 import requests
 import time
 import base64
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin
-from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth, HTTPDigestAuth
 import numpy as np
 
+from frame_grabber import FrameGrabber
+from stream_prober import StreamProber
+from stream_cache import StreamCache, probe_with_cache
+from frame_buffer import FrameRingBuffer
+from snapshot_writer import SnapshotWriter
+from mjpeg_reader import mjpeg_urls, open_mjpeg
+from frame import Frame
+from frame_pacer import FramePacer
+from buffer_pool import BufferPool
+from metrics import metrics
+from stream_supervisor import StreamSupervisor
+
 
 class CameraController:
     """
     کنترل کننده دوربین ITC231-RF1A-IR
     """
     
-    def __init__(self, ip_address, username, password, port=80):
+    MODEL = "ITC231-RF1A-IR"
+    
+    def __init__(self, ip_address, username, password, port=80, use_grabber=False,
+                 probe_timeout=10.0, probe_workers=4, stream_cache=None,
+                 capture_backend="opencv", http_connections=4, target_fps=None,
+                 dual_stream=False, main_idle_timeout=30.0, registry=None, stream_urls=None):
         """
         مقداردهی اولیه کنترل کننده دوربین
         
@@ -21,6 +42,20 @@ class CameraController:
             username (str): نام کاربری
             password (str): رمز عبور
             port (int): پورت اتصال (پیش‌فرض 80)
+            use_grabber (bool): خواندن مداوم استریم در پس‌زمینه و برگرداندن آخرین فریم
+            probe_timeout (float): مهلت هر تلاش اتصال به استریم بر حسب ثانیه
+            probe_workers (int): تعداد آدرس‌هایی که همزمان امتحان می‌شوند
+            stream_cache (StreamCache): کش آدرس موفق استریم (پیش‌فرض stream_cache.json)
+            capture_backend (str): "opencv" برای دیکد در همین فرآیند،
+                "process" برای دیکد در فرآیند جداگانه با حافظه مشترک یا
+                "mjpeg" برای خواندن مستقیم MJPEG روی session بدون FFmpeg
+            http_connections (int): تعداد اتصال‌های keep-alive همزمان برای گرفتن عکس HTTP
+            target_fps (float): نرخ خروجی grabber؛ فریم‌های اضافه فقط grab می‌شوند (None یعنی همه)
+            dual_stream (bool): پیش‌نمایش روی substream با وضوح پایین؛ استریم اصلی
+                یا CGI عکس فقط برای عکس و ضبط باز می‌شود
+            main_idle_timeout (float): بستن استریم اصلی بعد از این مدت بدون استفاده
+            registry (MetricsRegistry): محل ثبت متریک‌های عملکرد (پیش‌فرض رجیستری مشترک)
+            stream_urls (list): آدرس‌های استریم به جای فهرست پیش‌فرض (مثلاً فایل ویدیو یا سرور آزمایشی)
         """
         self.ip_address = ip_address
         self.username = username
@@ -30,8 +65,62 @@ class CameraController:
         self.auth = HTTPBasicAuth(username, password)
         self.session = requests.Session()
         self.session.auth = self.auth
+        self.http_connections = http_connections
+        self.session.mount(
+            "http://",
+            HTTPAdapter(pool_connections=1, pool_maxsize=http_connections, pool_block=True)
+        )
+        self.snapshot_url = None
+        self.http_executor = None
         self.cap = None
         self.is_connected = False
+        self.use_grabber = use_grabber
+        self.grabber = None
+        self.probe_timeout = probe_timeout
+        self.probe_workers = probe_workers
+        self.stream_url = None
+        self.custom_stream_urls = stream_urls
+        self.last_probe_timings = []
+        self.stream_cache = stream_cache if stream_cache is not None else StreamCache()
+        self.capture_backend = capture_backend
+        self.frame_buffer = None
+        self.snapshot_writer = None
+        self.frame_seq = 0
+        self.pacer = FramePacer(target_fps=target_fps)
+        self.dual_stream = dual_stream
+        self.main_idle_timeout = main_idle_timeout
+        self.main_cap = None
+        self.main_grabber = None
+        self.main_stream_url = None
+        self._main_lock = threading.Lock()
+        self._main_idle_timer = None
+        self._http_snapshot_ok = None
+        self.supervisor = None
+        self.motion_detector = None
+        self.motion_action = None
+        self.motion_directory = "snapshots"
+        self._motion_callbacks = (None, None)
+        self._motion_frame = None
+        self._motion_recording = False
+        self.motion_record_options = {}
+        self.recorder = None
+        self.retention = None
+        self._record_main = False
+        # تعداد استفاده‌کننده‌هایی (مثل ضبط) که استریم اصلی را باز نگه می‌دارند
+        self._main_pins = 0
+        
+        # متریک‌ها با برچسب IP دوربین؛ از بیرون با metrics.snapshot() یا to_prometheus() خوانده می‌شوند
+        self.metrics = registry if registry is not None else metrics
+        self._connect_hist = self.metrics.histogram("connect", camera=ip_address)
+        self._http_snapshot_hist = self.metrics.histogram("http_snapshot", camera=ip_address)
+        self._connects = self.metrics.counter("connects", camera=ip_address)
+        self._reconnects = self.metrics.counter("reconnects", camera=ip_address)
+        self._connect_failures = self.metrics.counter("connect_failures", camera=ip_address)
+        self._connected_once = False
+        
+        # دیکد فریم‌ها در آرایه‌های تکراری؛ استریم اصلی ابعاد دیگری دارد و استخر جدا می‌گیرد
+        self.buffer_pool = BufferPool(name="frames", registry=self.metrics, camera=ip_address)
+        self.main_buffer_pool = BufferPool(name="main", registry=self.metrics, camera=ip_address)
         
     def test_connection(self):
         """
@@ -65,57 +154,156 @@ class CameraController:
             print(f"❌ خطای غیرمنتظره: {str(e)}")
             return False
     
+    def get_stream_urls(self, subtype=0):
+        """
+        فهرست آدرس‌های ممکن برای استریم (RTSP و HTTP) به ترتیب اولویت
+        
+        Args:
+            subtype (int): 0 برای استریم اصلی، 1 برای substream با وضوح پایین
+        
+        Returns:
+            list: آدرس‌های استریم
+        """
+        if self.custom_stream_urls:
+            return list(self.custom_stream_urls)
+            
+        profile = "sub" if subtype else "main"
+        return [
+            # RTSP URLs (معمولاً موثرتر)
+            f"rtsp://{self.username}:{self.password}@{self.ip_address}:554/cam/realmonitor?channel=1&subtype={subtype}",
+            f"rtsp://{self.username}:{self.password}@{self.ip_address}/video1",
+            f"rtsp://{self.username}:{self.password}@{self.ip_address}/ch1/{profile}",
+            f"rtsp://{self.username}:{self.password}@{self.ip_address}/stream1",
+            
+            # HTTP MJPEG URLs
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/videostream.cgi",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/mjpeg",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/video.mjpg",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/cam/realmonitor?channel=1&subtype={subtype}",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/snapshot.cgi",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/cgi-bin/snapshot.cgi",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/axis-cgi/mjpg/video.cgi",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/video",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/video1.mjpg",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/live.htm",
+            f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/videostream.asf"
+        ]
+    
+    def _cache_model(self, subtype):
+        """کلید مدل در کش آدرس‌ها؛ substream جدا از استریم اصلی ذخیره می‌شود"""
+        return f"{self.MODEL}/sub" if subtype else self.MODEL
+    
+    def _probe_stream(self, subtype):
+        """امتحان آدرس کش شده و سپس همه آدرس‌های یک استریم"""
+        stream_urls = self.get_stream_urls(subtype)
+        print(f"🔄 تلاش برای اتصال به استریم ({len(stream_urls)} آدرس ممکن)...")
+        
+        prober = StreamProber(timeout=self.probe_timeout, max_workers=self.probe_workers)
+        result = probe_with_cache(
+            prober, self.stream_cache, self.ip_address, self._cache_model(subtype),
+            self.username, self.password, stream_urls
+        )
+        self.last_probe_timings = prober.timings
+        
+        for line in prober.format_timings():
+            print(line)
+        return result
+    
     def connect_stream(self):
         """
         اتصال به استریم ویدیویی دوربین
         
+        ابتدا آدرس ذخیره شده در کش امتحان می‌شود؛ در صورت شکست همه آدرس‌ها
+        به صورت موازی امتحان می‌شوند و اولین آدرسی که فریم معتبر برگرداند
+        انتخاب می‌شود. در حالت dual_stream به substream وصل می‌شود.
+        
         Returns:
             bool: True اگر اتصال موفق باشد
         """
+        started = time.perf_counter()
+        if self.capture_backend == "mjpeg":
+            connected = self.connect_mjpeg()
+        else:
+            connected = self._connect_probed()
+        self._connect_hist.observe((time.perf_counter() - started) * 1000)
+        
+        if not connected:
+            self._connect_failures.inc()
+        elif self._connected_once:
+            self._reconnects.inc()
+        else:
+            self._connects.inc()
+            self._connected_once = True
+        return connected
+    
+    def _connect_probed(self):
+        """اتصال از طریق prober (OpenCV یا فرآیند جداگانه)"""
         try:
-            # آدرس‌های مختلف برای استریم (RTSP و HTTP)
-            stream_urls = [
-                # RTSP URLs (معمولاً موثرتر)
-                f"rtsp://{self.username}:{self.password}@{self.ip_address}:554/cam/realmonitor?channel=1&subtype=0",
-                f"rtsp://{self.username}:{self.password}@{self.ip_address}/video1",
-                f"rtsp://{self.username}:{self.password}@{self.ip_address}/ch1/main",
-                f"rtsp://{self.username}:{self.password}@{self.ip_address}/stream1",
-                
-                # HTTP MJPEG URLs
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/videostream.cgi",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/mjpeg",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/video.mjpg",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/cam/realmonitor?channel=1&subtype=0",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/snapshot.cgi",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/cgi-bin/snapshot.cgi",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/axis-cgi/mjpg/video.cgi",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/video",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/video1.mjpg",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/live.htm",
-                f"http://{self.username}:{self.password}@{self.ip_address}:{self.port}/videostream.asf"
-            ]
-            
-            for url in stream_urls:
-                print(f"🔄 تلاش برای اتصال به: {url}")
-                self.cap = cv2.VideoCapture(url)
-                
-                if self.cap.isOpened():
-                    # تست خواندن یک فریم
-                    ret, frame = self.cap.read()
-                    if ret and frame is not None:
-                        print(f"✅ اتصال به استریم موفق بود: {url}")
-                        self.is_connected = True
-                        return True
-                    else:
-                        self.cap.release()
-                        
-            print("❌ هیچ یک از آدرس‌های استریم کار نکرد")
-            return False
+            result = self._probe_stream(1 if self.dual_stream else 0)
+                
+            if result is None:
+                print("❌ هیچ یک از آدرس‌های استریم کار نکرد")
+                return False
+                
+            self.cap = result["cap"]
+            self.stream_url = result["url"]
+            source = "کش" if result["from_cache"] else "جستجو"
+            print(f"✅ اتصال به استریم موفق بود ({source}): {result['url']} ({result['elapsed']:.2f}s)")
+            first_frame = result["frame"]
+            
+            if self.capture_backend == "process":
+                # دیکد در فرآیند جداگانه؛ capture آزمایشی آزاد می‌شود
+                from process_capture import ProcessCapture
+                self.cap.release()
+                self.cap = ProcessCapture(result["url"], result["backend"], result["params"])
+                if not self.cap.isOpened():
+                    print(f"❌ خطا در شروع فرآیند دیکد: {self.cap.error}")
+                    self.cap = None
+                    return False
+                first_frame = None
+                print("✅ دیکد در فرآیند جداگانه شروع شد")
+            
+            self.is_connected = True
+            if self.use_grabber:
+                self.start_grabber(first_frame=first_frame)
+            return True
             
         except Exception as e:
             print(f"❌ خطا در اتصال به استریم: {str(e)}")
             return False
     
+    def connect_mjpeg(self):
+        """
+        اتصال به استریم MJPEG با خواننده داخلی روی session دائمی (بدون بافر FFmpeg)
+        
+        Returns:
+            bool: True اگر اتصال موفق باشد
+        """
+        try:
+            urls = mjpeg_urls(self.base_url)
+            if self.stream_url in urls:
+                urls.remove(self.stream_url)
+                urls.insert(0, self.stream_url)
+                
+            print(f"🔄 تلاش برای اتصال به استریم MJPEG ({len(urls)} آدرس ممکن)...")
+            reader, frame = open_mjpeg(self.session, urls, timeout=self.probe_timeout)
+            if reader is None:
+                print("❌ هیچ یک از آدرس‌های MJPEG کار نکرد")
+                return False
+                
+            self.cap = reader
+            self.stream_url = reader.url
+            print(f"✅ اتصال به استریم MJPEG موفق بود: {reader.url}")
+            
+            self.is_connected = True
+            if self.use_grabber:
+                self.start_grabber(first_frame=frame)
+            return True
+            
+        except Exception as e:
+            print(f"❌ خطا در اتصال به استریم MJPEG: {str(e)}")
+            return False
+    
     def open_camera(self):
         """
         باز کردن دوربین (تست اتصال + اتصال به استریم)
@@ -141,10 +329,25 @@ class CameraController:
         بستن اتصال دوربین
         """
         try:
+            self.stop_recording()
+            self.stop_grabber()
+            self.close_main_stream()
+            
             if self.cap is not None:
                 self.cap.release()
                 self.cap = None
                 
+            if self.http_executor is not None:
+                self.http_executor.shutdown(wait=True)
+                self.http_executor = None
+                
+            if self.snapshot_writer is not None:
+                self.snapshot_writer.shutdown(wait=True)
+                self.snapshot_writer = None
+                
+            if self.frame_buffer is not None:
+                self.frame_buffer.close()
+                
             self.session.close()
             self.is_connected = False
             print("✅ اتصال دوربین بسته شد")
@@ -152,46 +355,491 @@ class CameraController:
         except Exception as e:
             print(f"❌ خطا در بستن دوربین: {str(e)}")
     
-    def capture_frame(self):
+    def start_grabber(self, first_frame=None):
         """
-        گرفتن یک فریم از دوربین
+        شروع thread پس‌زمینه برای نگه داشتن آخرین فریم استریم
         
+        Args:
+            first_frame (numpy.ndarray): فریمی که هنگام اتصال خوانده شده (اختیاری)
+            
         Returns:
-            numpy.ndarray: تصویر گرفته شده یا None در صورت خطا
+            bool: True اگر grabber در حال اجرا باشد
+        """
+        if self.cap is None:
+            print("❌ دوربین متصل نیست")
+            return False
+            
+        if self.grabber is not None and self.grabber.is_alive():
+            return True
+            
+        self.pacer.set_source_fps(self.cap.get(cv2.CAP_PROP_FPS))
+        self.grabber = FrameGrabber(
+            self.cap, on_frame=self._on_grabbed_frame,
+            camera_id=self.ip_address, source_url=self.stream_url, pacer=self.pacer,
+            registry=self.metrics, stream="sub" if self.dual_stream else "main",
+            buffer_pool=self.buffer_pool
+        )
+        if first_frame is not None:
+            self.grabber.seed(first_frame)
+        self.grabber.start()
+        print("✅ دریافت پس‌زمینه فریم‌ها شروع شد")
+        return True
+    
+    def enable_supervisor(self, stall_timeout=5.0, **kwargs):
+        """
+        نظارت بر استریم grabber و اتصال مجدد خودکار در صورت قطع یا توقف فریم‌ها
+        
+        capture جدید بدون توقف grabber جایگزین می‌شود؛ فریم‌های بافر و
+        مصرف‌کننده‌های get_latest_frame دست نمی‌خورند.
+        
+        Args:
+            stall_timeout (float): حداکثر فاصله مجاز بین دو فریم (ثانیه)
+            **kwargs: تنظیمات تاخیر نمایی StreamSupervisor (initial_backoff، max_backoff، ...)
+            
+        Returns:
+            bool: True اگر نگهبان در حال اجرا باشد
+        """
+        if self.grabber is None or not self.grabber.is_alive():
+            print("❌ نگهبان اتصال فقط همراه grabber فعال می‌شود")
+            return False
+            
+        if self.supervisor is not None and self.supervisor.is_alive():
+            return True
+            
+        self.supervisor = StreamSupervisor(
+            connect=self._reconnect_capture, on_swap=self._swap_capture,
+            stall_timeout=stall_timeout, on_status=self._print_supervisor_status,
+            registry=self.metrics, camera=self.ip_address, connected=True, **kwargs
+        )
+        self.grabber.on_error = self.supervisor.report_failure
+        self.supervisor.start()
+        print(f"✅ نگهبان اتصال فعال شد (توقف بعد از {stall_timeout:.0f} ثانیه بدون فریم)")
+        return True
+    
+    def _print_supervisor_status(self, connected, message):
+        """چاپ وضعیت نگهبان اتصال"""
+        self.is_connected = connected
+        print(message)
+    
+    def _reconnect_capture(self):
+        """ساخت capture جدید برای نگهبان اتصال؛ آدرس قبلی (کش) اول امتحان می‌شود"""
+        with self._connect_hist.time():
+            if self.capture_backend == "mjpeg":
+                urls = mjpeg_urls(self.base_url)
+                if self.stream_url in urls:
+                    urls.remove(self.stream_url)
+                    urls.insert(0, self.stream_url)
+                reader, _ = open_mjpeg(self.session, urls, timeout=self.probe_timeout)
+                if reader is not None:
+                    self.stream_url = reader.url
+                return reader
+                
+            result = self._probe_stream(1 if self.dual_stream else 0)
+            if result is None:
+                return None
+                
+            self.stream_url = result["url"]
+            if self.capture_backend != "process":
+                return result["cap"]
+                
+            from process_capture import ProcessCapture
+            result["cap"].release()
+            cap = ProcessCapture(result["url"], result["backend"], result["params"])
+            if not cap.isOpened():
+                print(f"❌ خطا در شروع فرآیند دیکد: {cap.error}")
+                return None
+            return cap
+    
+    def _swap_capture(self, cap):
+        """نصب capture جدید؛ grabber قبلی را بعد از برگشتن read جاری آزاد می‌کند"""
+        self.cap = cap
+        self.is_connected = True
+        self.pacer.set_source_fps(cap.get(cv2.CAP_PROP_FPS))
+        if self.grabber is not None and self.grabber.is_alive():
+            self.grabber.source_url = self.stream_url
+            self.grabber.replace_capture(cap)
+        print(f"✅ اتصال مجدد به استریم: {self.stream_url}")
+    
+    def stop_supervisor(self):
+        """
+        توقف نگهبان اتصال
+        """
+        if self.supervisor is not None:
+            self.supervisor.stop()
+            if self.grabber is not None:
+                self.grabber.on_error = None
+            self.supervisor = None
+    
+    def stop_grabber(self):
+        """
+        توقف thread پس‌زمینه دریافت فریم
+        """
+        self.stop_supervisor()
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+    
+    def _on_grabbed_frame(self, frame):
+        """پردازش هر فریم دریافتی روی thread grabber"""
+        if self.supervisor is not None:
+            self.supervisor.frame_received()
+        self._check_motion(frame)
+        recorder = self.recorder
+        if recorder is not None and not self._record_main and hasattr(recorder, "write"):
+            if self.capture_backend == "process":
+                frame = frame.with_image(frame.image.copy())
+            recorder.write(frame)
+        if self.frame_buffer is not None:
+            if self.capture_backend == "process" and (not self.frame_buffer.store_jpeg or frame.jpeg is None):
+                # فریم‌های حافظه مشترک بعد از چند فریم بازنویسی می‌شوند (encode هم روی thread دیگری است)
+                frame = frame.with_image(frame.image.copy())
+            self.frame_buffer.append(frame)
+    
+    def enable_motion_detection(self, action="snapshot", directory="snapshots",
+                                on_motion=None, on_motion_end=None, **kwargs):
+        """
+        تشخیص حرکت روی فریم‌های دریافتی و عکس خودکار فقط هنگام حرکت
+        
+        تشخیص روی thread grabber (یا read_frame) و روی نسخه کوچک خاکستری
+        انجام می‌شود؛ فریم‌های MJPEG با دیکد کاهش یافته خوانده می‌شوند.
+        
+        Args:
+            action (str): "snapshot" برای ذخیره عکس در شروع هر رویداد، "record" برای ضبط
+                در طول رویداد (تنظیمات در motion_record_options) یا None فقط برای callback
+            directory (str): پوشه عکس‌های خودکار
+            on_motion (callable): با dict رویداد هنگام شروع حرکت صدا زده می‌شود
+            on_motion_end (callable): با dict رویداد هنگام پایان حرکت صدا زده می‌شود
+            **kwargs: تنظیمات MotionDetector (zones، area_threshold، cooldown، ...)
+            
+        Returns:
+            MotionDetector: تشخیص‌دهنده ساخته شده
+        """
+        if action not in (None, "snapshot", "record"):
+            raise ValueError(f"عملیات نامعتبر برای حرکت: {action}")
+            
+        self.motion_action = action
+        self.motion_directory = directory
+        self._motion_callbacks = (on_motion, on_motion_end)
+        from motion_detector import MotionDetector
+        self.motion_detector = MotionDetector(
+            on_motion=self._on_motion, on_motion_end=self._on_motion_end,
+            registry=self.metrics, camera=self.ip_address, **kwargs
+        )
+        print(f"✅ تشخیص حرکت فعال شد ({len(self.motion_detector.zones)} ناحیه)")
+        return self.motion_detector
+    
+    def disable_motion_detection(self):
+        """
+        غیرفعال کردن تشخیص حرکت
+        """
+        self.motion_detector = None
+        previous, self._motion_frame = self._motion_frame, None
+        if previous is not None:
+            previous.release()
+    
+    def _check_motion(self, frame):
+        """بررسی حرکت در یک فریم دریافتی"""
+        detector = self.motion_detector
+        if detector is None:
+            return
+        if frame.is_decoded:
+            image = frame.image
+        else:
+            # JPEG با یک چهارم وضوح و خاکستری دیکد می‌شود؛ بسیار ارزان‌تر از دیکد کامل
+            image = cv2.imdecode(np.frombuffer(frame.jpeg, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        # فریم تا فریم بعدی برای عکس رویداد حرکت نگه داشته می‌شود
+        previous, self._motion_frame = self._motion_frame, frame.retain()
+        if previous is not None:
+            previous.release()
+        detector.process(image)
+    
+    def _on_motion(self, event):
+        """شروع رویداد حرکت: عکس خودکار و callback کاربر"""
+        if self.motion_action == "snapshot":
+            os.makedirs(self.motion_directory, exist_ok=True)
+            from burst_capture import burst_filename
+            # میلی‌ثانیه و شماره رویداد: دو رویداد در یک ثانیه روی هم نوشته نمی‌شوند
+            filename = burst_filename(self.motion_directory, "auto", event["wall_time"], event["index"])
+            event["snapshot"] = filename
+            
+            if self.dual_stream:
+                # فریم وضوح کامل از شبکه گرفته می‌شود؛ thread grabber منتظر نمی‌ماند
+                self._get_http_executor().submit(self.save_snapshot_async, filename)
+            else:
+                frame = self._motion_frame
+                if self.capture_backend == "process" and frame.is_decoded:
+                    frame = frame.with_image(frame.image.copy())
+                if self.snapshot_writer is None:
+                    self.snapshot_writer = SnapshotWriter(registry=self.metrics, camera=self.ip_address)
+                self.snapshot_writer.submit(frame, filename)
+            print(f"🏃 حرکت در {', '.join(event['zones'])}: {filename}")
+            
+        elif self.motion_action == "record" and self.recorder is None:
+            # شروع ضبط ممکن است استریم اصلی را باز کند؛ thread grabber منتظر نمی‌ماند
+            self._motion_recording = True
+            self._get_http_executor().submit(self.start_recording, **self.motion_record_options)
+            print(f"🏃 حرکت در {', '.join(event['zones'])}: شروع ضبط")
+            
+        if self._motion_callbacks[0] is not None:
+            self._motion_callbacks[0](event)
+    
+    def _on_motion_end(self, event):
+        """پایان رویداد حرکت"""
+        if self._motion_recording:
+            self._motion_recording = False
+            self._get_http_executor().submit(self.stop_recording)
+        if self._motion_callbacks[1] is not None:
+            self._motion_callbacks[1](event)
+    
+    def enable_pre_event_buffer(self, seconds=10.0, max_bytes=None, store_jpeg=False, jpeg_quality=90):
+        """
+        فعال کردن بافر فریم‌های اخیر برای عکس‌گیری از «چند ثانیه قبل»
+        
+        بافر توسط grabber پر می‌شود، پس grabber هم در صورت نیاز شروع می‌شود.
+        
+        Args:
+            seconds (float): مدت زمان نگه داشته شده
+            max_bytes (int): بودجه حافظه بافر (اختیاری)
+            store_jpeg (bool): نگه داشتن فریم‌ها به صورت JPEG
+            jpeg_quality (int): کیفیت JPEG در حالت فشرده
+            
+        Returns:
+            FrameRingBuffer: بافر ساخته شده
+        """
+        self.frame_buffer = FrameRingBuffer(
+            seconds=seconds, max_bytes=max_bytes,
+            store_jpeg=store_jpeg, jpeg_quality=jpeg_quality
+        )
+        self.use_grabber = True
+        if self.is_connected:
+            self.start_grabber()
+        return self.frame_buffer
+    
+    def get_latest_frame(self, timeout=2.0):
+        """
+        دریافت آخرین فریم grabber
+        
+        Args:
+            timeout (float): حداکثر زمان انتظار اگر هنوز فریمی دریافت نشده باشد
+            
+        Returns:
+            Frame: آخرین فریم یا None در صورت خطا
+        """
+        if self.grabber is None:
+            return None
+        return self.grabber.get_latest(timeout=timeout)
+    
+    def read_frame(self):
+        """
+        گرفتن یک فریم از دوربین به همراه زمان دریافت، شماره ترتیب و منبع
+        
+        در حالت grabber بلافاصله آخرین فریم دریافت شده برگردانده می‌شود.
+        فریم‌های MJPEG تا زمان خواندن پیکسل‌ها دیکد نمی‌شوند. تصویر در آرایه
+        استخر است و فریم متعلق به فراخواننده است: با frame.release() بعد از
+        پایان استفاده آرایه دوباره استفاده می‌شود؛ بدون آن فقط استفاده دوباره
+        از دست می‌رود.
+        
+        Returns:
+            Frame: فریم گرفته شده یا None در صورت خطا
         """
         if not self.is_connected or self.cap is None:
             print("❌ دوربین متصل نیست")
             return None
             
-        ret, frame = self.cap.read()
+        if self.grabber is not None:
+            frame = self.get_latest_frame()
+            if frame is None:
+                print("❌ خطا در خواندن فریم")
+            return frame
+            
+        if hasattr(self.cap, "read_jpeg"):
+            jpeg = self.cap.read_jpeg()
+            ret, image = jpeg is not None, None
+        else:
+            jpeg = None
+            ret, image = self.buffer_pool.read(self.cap)
+            
         if ret:
+            self.frame_seq += 1
+            frame = Frame(
+                image=image, jpeg=jpeg, seq=self.frame_seq,
+                camera_id=self.ip_address, source_url=self.stream_url,
+                lease=self.buffer_pool.lease(image)
+            )
+            self._check_motion(frame)
             return frame
         else:
             print("❌ خطا در خواندن فریم")
             return None
     
-    def show_live_stream(self, window_name="Camera Stream"):
+    def capture_frame(self):
+        """
+        گرفتن یک فریم از دوربین
+        
+        در حالت grabber بلافاصله آخرین فریم دریافت شده برگردانده می‌شود.
+        
+        Returns:
+            numpy.ndarray: تصویر گرفته شده یا None در صورت خطا
+        """
+        frame = self.read_frame()
+        return frame.image if frame is not None else None
+    
+    def iter_frames(self, stride=1, max_fps=None, batch=None, resize=None, timeout=5.0):
+        """
+        جریان پیوسته فریم‌ها برای پردازش‌های تحلیلی
+        
+        فریم‌هایی که به دلیل stride یا max_fps کنار گذاشته می‌شوند بدون grabber
+        فقط grab می‌شوند (بدون دیکد). با batch، تصاویر داخل یک آرایه از پیش
+        ساخته شده (N, H, W, 3) کپی یا مستقیماً در آن کوچک می‌شوند و همان آرایه
+        برای دسته‌های بعدی دوباره استفاده می‌شود؛ اگر دسته‌ای باید بعد از
+        دریافت دسته بعدی نگه داشته شود، باید از آن کپی گرفت. در حالت فریم به
+        فریم هم آرایه استخر هر فریم بعد از درخواست فریم بعدی آزاد می‌شود؛
+        فریمی که باید نگه داشته شود با frame.retain() (و بعداً release) یا کپی
+        نگه داشته می‌شود.
+        
+        Args:
+            stride (int): فقط یکی از هر stride فریم برگردانده می‌شود
+            max_fps (float): حداکثر نرخ خروجی (None یعنی بدون محدودیت)
+            batch (int): تعداد فریم هر دسته (None یعنی فریم به فریم)
+            resize (tuple): (عرض، ارتفاع) خروجی (در حالت دسته‌ای پیش‌فرض ابعاد اولین فریم)
+            timeout (float): پایان جریان اگر این مدت فریمی دریافت نشود
+            
+        Yields:
+            Frame: در حالت فریم به فریم
+            tuple: (images, frames) در حالت دسته‌ای؛ images آرایه (n, H, W, 3) و
+                frames فهرست Frame هر تصویر (فقط برای زمان دریافت و شماره ترتیب؛
+                پیکسل‌ها از images خوانده شوند)؛ دسته آخر ممکن است کوچک‌تر از batch باشد
+        """
+        if stride < 1:
+            raise ValueError("stride باید حداقل 1 باشد")
+        if not self.is_connected or self.cap is None:
+            print("❌ دوربین متصل نیست")
+            return
+            
+        interval = 1.0 / max_fps if max_fps else 0.0
+        next_due = 0.0
+        # تعداد فریم‌های رد شده از آخرین خروجی؛ اولین فریم همیشه برگردانده می‌شود
+        skipped = stride - 1
+        buffer = None
+        frames = []
+        grabber_seq = self.grabber.get_stats()["sequence"] if self.grabber is not None else None
+        last_frame_at = time.monotonic()
+        
+        while self.is_connected:
+            now = time.monotonic()
+            if self.grabber is not None:
+                frame = self.grabber.get_latest(timeout=0.5, newer_than=grabber_seq)
+                if frame is not None:
+                    grabber_seq = frame.seq
+                    now = time.monotonic()
+            skip = skipped < stride - 1 or now < next_due
+            
+            if self.grabber is not None:
+                if frame is not None and skip:
+                    # فریم‌های MJPEG تا پیکسل‌هایشان خوانده نشود دیکد نمی‌شوند
+                    frame.release()
+                    skipped += 1
+                    last_frame_at = now
+                    continue
+            elif skip:
+                frame = None
+                if self._skip_frame():
+                    skipped += 1
+                    last_frame_at = now
+                    continue
+            else:
+                frame = self.read_frame()
+                
+            if frame is None:
+                if time.monotonic() - last_frame_at > timeout:
+                    print(f"❌ {timeout:.0f} ثانیه فریمی دریافت نشد؛ پایان جریان فریم‌ها")
+                    break
+                continue
+                
+            last_frame_at = now
+            skipped = 0
+            if interval:
+                # هدف بعدی از زمان فعلی عقب نمی‌ماند تا بعد از وقفه فریم‌ها پشت سر هم نیایند
+                next_due = max(next_due + interval, now)
+                
+            if batch is None:
+                if resize is not None:
+                    resized = frame.with_image(cv2.resize(frame.image, resize, interpolation=cv2.INTER_AREA))
+                    frame.release()
+                    frame = resized
+                yield frame
+                frame.release()
+                continue
+                
+            image = frame.image
+            if buffer is None:
+                width, height = resize if resize is not None else (image.shape[1], image.shape[0])
+                buffer = np.empty((batch, height, width, 3), dtype=np.uint8)
+            slot = buffer[len(frames)]
+            if image.shape == slot.shape:
+                np.copyto(slot, image)
+            else:
+                cv2.resize(image, (slot.shape[1], slot.shape[0]), dst=slot, interpolation=cv2.INTER_AREA)
+            frame.release()
+            frames.append(frame)
+            
+            if len(frames) == batch:
+                yield buffer, frames
+                frames = []
+                
+        if frames:
+            yield buffer[:len(frames)], frames
+    
+    def _skip_frame(self):
+        """رد کردن فریم بعدی استریم بدون دیکد (grab) در حالت بدون grabber"""
+        cap = self.cap
+        if cap is None:
+            return False
+        if hasattr(cap, "grab"):
+            ok = cap.grab()
+        else:
+            # ProcessCapture: دیکد در فرآیند دیگر انجام شده است
+            ok, _ = cap.read()
+        if ok:
+            self.frame_seq += 1
+        return bool(ok)
+    
+    def show_live_stream(self, window_name="Camera Stream", overlay=None):
         """
         نمایش استریم زنده دوربین
         
+        زمان و اطلاعات روی یک کپی نمایش رسم می‌شوند؛ فریم دریافتی (که ممکن است
+        همزمان برای عکس، ضبط یا تحلیل استفاده شود) تغییر نمی‌کند.
+        
         Args:
             window_name (str): نام پنجره نمایش
+            overlay (OverlayCompositor): لایه‌های نمایشی (پیش‌فرض زمان دریافت و IP دوربین)
         """
         if not self.is_connected:
             print("❌ ابتدا به دوربین متصل شوید")
             return
             
+        from overlay import OverlayCompositor, TimestampLayer, TextLayer
+        if overlay is None:
+            overlay = OverlayCompositor(
+                [TimestampLayer(), TextLayer("camera", self.ip_address)],
+                registry=self.metrics, camera=self.ip_address
+            )
+            
         print("🎥 نمایش استریم زنده شروع شد. برای خروج ESC را فشار دهید")
         
+        display = None
         while True:
-            frame = self.capture_frame()
+            frame = self.read_frame()
             if frame is not None:
-                # نمایش تاریخ و زمان روی تصویر
-                timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                cv2.putText(frame, timestamp, (10, 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                image = frame.image
+                if display is None or display.shape != image.shape:
+                    display = np.empty_like(image)
+                np.copyto(display, image)
+                overlay.apply(display, frame, motion_detector=self.motion_detector)
+                frame.release()
                 
-                cv2.imshow(window_name, frame)
+                cv2.imshow(window_name, display)
                 
                 # خروج با کلید ESC
                 key = cv2.waitKey(1) & 0xFF
@@ -203,12 +851,171 @@ class CameraController:
                 
         cv2.destroyAllWindows()
     
-    def save_snapshot(self, filename=None):
+    def open_main_stream(self):
+        """
+        باز کردن استریم اصلی (وضوح کامل) در کنار substream برای عکس یا ضبط
+        
+        استریم با یک grabber جداگانه خوانده می‌شود تا فریم‌ها کهنه نشوند و
+        بعد از main_idle_timeout ثانیه بدون استفاده خودکار بسته می‌شود.
+        
+        Returns:
+            FrameGrabber: grabber استریم اصلی یا None در صورت خطا
+        """
+        with self._main_lock:
+            if self.main_grabber is None or not self.main_grabber.is_alive():
+                self._release_main_stream()
+                result = self._probe_stream(0)
+                if result is None:
+                    print("❌ اتصال به استریم اصلی ممکن نشد")
+                    return None
+                
+                self.main_cap = result["cap"]
+                self.main_stream_url = result["url"]
+                self.main_grabber = FrameGrabber(
+                    self.main_cap, on_frame=self._on_main_frame, camera_id=self.ip_address,
+                    source_url=self.main_stream_url, registry=self.metrics, stream="main",
+                    buffer_pool=self.main_buffer_pool
+                )
+                self.main_grabber.seed(result["frame"])
+                self.main_grabber.start()
+                print(f"✅ استریم اصلی باز شد: {self.main_stream_url}")
+            
+            self._schedule_main_close()
+            return self.main_grabber
+    
+    def _schedule_main_close(self):
+        """زمان‌بندی مجدد بستن استریم اصلی بی‌استفاده (باید با قفل فراخوانی شود)"""
+        if self._main_idle_timer is not None:
+            self._main_idle_timer.cancel()
+            self._main_idle_timer = None
+        if self.main_idle_timeout is not None and not self._main_pins:
+            self._main_idle_timer = threading.Timer(self.main_idle_timeout, self.close_main_stream)
+            self._main_idle_timer.daemon = True
+            self._main_idle_timer.start()
+    
+    def _release_main_stream(self):
+        """آزاد کردن grabber و capture استریم اصلی (باید با قفل فراخوانی شود)"""
+        if self.main_grabber is not None:
+            self.main_grabber.stop()
+            self.main_grabber = None
+        if self.main_cap is not None:
+            self.main_cap.release()
+            self.main_cap = None
+    
+    def _pin_main_stream(self):
+        """باز نگه داشتن استریم اصلی تا فراخوانی _unpin_main_stream (مثلاً در طول ضبط)"""
+        with self._main_lock:
+            self._main_pins += 1
+            self._schedule_main_close()
+    
+    def _unpin_main_stream(self):
+        """پایان نیاز به استریم اصلی؛ تایمر بیکاری دوباره فعال می‌شود"""
+        with self._main_lock:
+            self._main_pins = max(0, self._main_pins - 1)
+            if self.main_grabber is not None:
+                self._schedule_main_close()
+    
+    def _on_main_frame(self, frame):
+        """پردازش هر فریم استریم اصلی روی thread grabber آن"""
+        recorder = self.recorder
+        if recorder is not None and self._record_main:
+            recorder.write(frame)
+    
+    def close_main_stream(self):
+        """
+        بستن استریم اصلی (حالت dual_stream)
+        """
+        with self._main_lock:
+            if self._main_idle_timer is not None:
+                self._main_idle_timer.cancel()
+                self._main_idle_timer = None
+            if self.main_cap is not None:
+                print("ℹ️ استریم اصلی بسته شد")
+            self._release_main_stream()
+    
+    def get_full_frame(self, timeout=5.0):
+        """
+        گرفتن یک فریم با وضوح کامل
+        
+        در حالت عادی همان read_frame است. در حالت dual_stream ابتدا CGI عکس
+        دوربین (JPEG آماده بدون دیکد) و در صورت نبود آن استریم اصلی امتحان می‌شود.
+        
+        Args:
+            timeout (float): مهلت دریافت عکس یا فریم
+        
+        Returns:
+            Frame: فریم با وضوح کامل یا None در صورت خطا
+        """
+        if not self.dual_stream:
+            return self.read_frame()
+        
+        if self._http_snapshot_ok is not False:
+            jpeg = self.fetch_snapshot_jpeg(timeout=timeout)
+            if jpeg is not None:
+                self._http_snapshot_ok = True
+                return Frame(jpeg=jpeg, camera_id=self.ip_address, source_url=self.snapshot_url)
+            if self._http_snapshot_ok is None:
+                # دوربین CGI عکس ندارد؛ دفعات بعد مستقیم از استریم اصلی
+                self._http_snapshot_ok = False
+        
+        grabber = self.open_main_stream()
+        if grabber is None:
+            return None
+        # فریمی که بعد از درخواست رسیده باشد، نه فریم مانده از قبل
+        frame = grabber.get_latest(timeout=timeout, newer_than=grabber.get_stats()["sequence"])
+        if frame is None:
+            print("❌ خطا در خواندن فریم استریم اصلی")
+        return frame
+    
+    def _select_snapshot_frame(self, seconds_before):
+        """انتخاب فریم عکس: آخرین فریم یا فریم چند ثانیه قبل از بافر"""
+        if seconds_before > 0:
+            if self.frame_buffer is None:
+                print("❌ بافر فریم‌های اخیر فعال نیست")
+                return None
+            return self.frame_buffer.get_frame_before(seconds_before)
+        return self.get_full_frame()
+    
+    def save_snapshot_async(self, filename=None, seconds_before=0, quality=95, callback=None):
+        """
+        ذخیره یک عکس در پس‌زمینه؛ encode و نوشتن روی دیسک منتظر نمی‌ماند
+        
+        Args:
+            filename (str): نام فایل (اختیاری)
+            seconds_before (float): گرفتن فریم چند ثانیه قبل از بافر فریم‌های اخیر
+            quality (int): کیفیت JPEG
+            callback (callable): تابعی که با Future تکمیل شده صدا زده می‌شود
+            
+        Returns:
+            Future: نتیجه شامل مسیر فایل و زمان‌بندی یا None در صورت خطا یا پر بودن صف
+        """
+        if filename is None:
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filename = f"snapshot_{timestamp}.jpg"
+            
+        frame = self._select_snapshot_frame(seconds_before)
+        if frame is None:
+            print("❌ خطا در گرفتن عکس")
+            return None
+            
+        if self.capture_backend == "process" and frame.is_decoded:
+            # فریم‌های حافظه مشترک بعد از چند فریم بازنویسی می‌شوند
+            frame = frame.with_image(frame.image.copy())
+            
+        if self.snapshot_writer is None:
+            self.snapshot_writer = SnapshotWriter(registry=self.metrics, camera=self.ip_address)
+        # صف ذخیره ارجاع خودش را نگه می‌دارد
+        future = self.snapshot_writer.submit(frame, filename, quality=quality, callback=callback)
+        frame.release()
+        return future
+    
+    def save_snapshot(self, filename=None, seconds_before=0):
         """
         ذخیره یک عکس از دوربین
         
         Args:
             filename (str): نام فایل (اختیاری)
+            seconds_before (float): گرفتن فریم چند ثانیه قبل از بافر فریم‌های اخیر (اختیاری)
             
         Returns:
             str: مسیر فایل ذخیره شده یا None در صورت خطا
@@ -217,15 +1024,365 @@ class CameraController:
             timestamp = time.strftime("%Y%m%d_%H%M%S")
             filename = f"snapshot_{timestamp}.jpg"
             
-        frame = self.capture_frame()
+        frame = self._select_snapshot_frame(seconds_before)
         if frame is not None:
-            cv2.imwrite(filename, frame)
+            if frame.jpeg is not None and filename.lower().endswith((".jpg", ".jpeg")):
+                # JPEG اصلی دوربین بدون دیکد و encode مجدد ذخیره می‌شود
+                with open(filename, "wb") as f:
+                    f.write(frame.jpeg)
+            else:
+                cv2.imwrite(filename, frame.image)
+            frame.release()
             print(f"✅ عکس ذخیره شد: {filename}")
             return filename
         else:
             print("❌ خطا در گرفتن عکس")
             return None
     
+    def _recording_url(self):
+        """آدرس استریم با وضوح کامل برای ضبط بدون دیکد (در صورت وجود)"""
+        if not self.dual_stream:
+            return self.stream_url
+        if self.main_stream_url is not None:
+            return self.main_stream_url
+        entry = self.stream_cache.get(self.ip_address, self.MODEL, self.username, self.password)
+        return entry["url"] if entry is not None else None
+    
+    def start_recording(self, directory="recordings", segment_seconds=300.0, max_segment_bytes=None,
+                        mode="auto", fps=None, quota_bytes=None, min_free_bytes=None,
+                        retention_dirs=None, retention_patterns=None, on_delete=None):
+        """
+        شروع ضبط مداوم در فایل‌های بخش‌بندی شده
+        
+        در حالت "copy" بسته‌های RTSP دوربین با ffmpeg بدون دیکد ذخیره می‌شوند
+        (یک اتصال RTSP اضافه). در حالت "encode" فریم‌های grabber (در حالت
+        dual_stream استریم اصلی که در طول ضبط باز می‌ماند) روی thread جداگانه
+        با VideoWriter نوشته می‌شوند. با تعیین سهمیه، قدیمی‌ترین بخش‌ها حذف
+        می‌شوند؛ عکس‌ها فقط با دادن پوشه و الگوی آن‌ها مشمول سهمیه هستند.
+        
+        Args:
+            directory (str): پوشه فایل‌های ضبط
+            segment_seconds (float): مدت هر بخش
+            max_segment_bytes (int): حداکثر حجم هر بخش (None یعنی بدون محدودیت)
+            mode (str): "auto" (copy اگر ffmpeg و RTSP موجود باشد)، "copy" یا "encode"
+            fps (float): نرخ فایل در حالت encode (پیش‌فرض نرخ هدف یا نرخ دوربین)
+            quota_bytes (int): حداکثر حجم کل فایل‌های ضبط
+            min_free_bytes (int): حداقل فضای آزاد دیسک
+            retention_dirs (list): پوشه‌های تحت سهمیه (پیش‌فرض فقط پوشه ضبط)
+            retention_patterns (tuple): الگوی فایل‌های قابل حذف (پیش‌فرض فقط ویدیو؛
+                برای حذف عکس‌ها SNAPSHOT_PATTERNS هم اضافه شود)
+            on_delete (callable): برای هر فایل حذف شده با (path, size) صدا زده می‌شود
+            
+        Returns:
+            bool: True اگر ضبط در حال اجرا باشد
+        """
+        if self.recorder is not None and self.recorder.running:
+            return True
+            
+        # ماژول‌های ضبط فقط هنگام نیاز وارد می‌شوند تا شروع برنامه سریع بماند
+        from recorder import SegmentedRecorder, FFmpegRecorder
+        from retention_manager import DEFAULT_PATTERNS, RetentionManager
+        
+        url = self._recording_url()
+        if mode == "auto":
+            mode = "copy" if url and url.startswith("rtsp://") and FFmpegRecorder.available() else "encode"
+            
+        if mode == "copy":
+            if url is None:
+                print("❌ آدرس استریم برای ضبط بدون دیکد مشخص نیست")
+                return False
+            recorder = FFmpegRecorder(
+                url, directory, segment_seconds=segment_seconds, max_segment_bytes=max_segment_bytes,
+                registry=self.metrics, camera=self.ip_address
+            )
+            if not recorder.start():
+                return False
+        elif mode == "encode":
+            if self.dual_stream:
+                if self.open_main_stream() is None:
+                    return False
+                self._pin_main_stream()
+                source_fps = self.main_cap.get(cv2.CAP_PROP_FPS)
+            else:
+                if not self.start_grabber():
+                    return False
+                source_fps = self.pacer.target_fps or self.pacer.input_fps or self.cap.get(cv2.CAP_PROP_FPS)
+            recorder = SegmentedRecorder(
+                directory, fps=fps or source_fps, segment_seconds=segment_seconds,
+                max_segment_bytes=max_segment_bytes, registry=self.metrics, camera=self.ip_address
+            )
+            recorder.start()
+            self._record_main = self.dual_stream
+        else:
+            raise ValueError(f"حالت ضبط نامعتبر: {mode}")
+            
+        self.recorder = recorder
+        if quota_bytes or min_free_bytes:
+            self.retention = RetentionManager(
+                retention_dirs or [directory], max_bytes=quota_bytes,
+                min_free_bytes=min_free_bytes, patterns=retention_patterns or DEFAULT_PATTERNS,
+                protect=self._active_recording_paths, on_delete=on_delete, registry=self.metrics
+            )
+            self.retention.start()
+        print(f"⏺️ ضبط شروع شد ({mode}): {directory}")
+        return True
+    
+    def _active_recording_paths(self):
+        """فایل در حال ضبط که پاکسازی نباید حذف کند"""
+        recorder = self.recorder
+        return [recorder.current_path] if recorder is not None else []
+    
+    def stop_recording(self):
+        """
+        توقف ضبط و بستن بخش جاری
+        """
+        recorder, self.recorder = self.recorder, None
+        if recorder is None:
+            return
+        recorder.stop()
+        if self._record_main:
+            self._record_main = False
+            self._unpin_main_stream()
+        if self.retention is not None:
+            self.retention.stop()
+            self.retention = None
+        print("⏹️ ضبط متوقف شد")
+    
+    def capture_burst(self, count=10, interval=None, directory="snapshots", prefix="series",
+                      quality=95, seconds_before=None, timeout=None):
+        """
+        گرفتن یک سری عکس با فاصله دقیق از استریم زنده یا بافر فریم‌های اخیر
+        
+        فریم‌ها مستقیماً از grabber (در حالت dual_stream از استریم اصلی) برداشته
+        می‌شوند و encode و نوشتن روی SnapshotWriter موازی انجام می‌شود، پس یک
+        سری 30 تایی از هر فریم در حدود یک ثانیه استریم تمام می‌شود. نام هر فایل
+        زمان دقیق دریافت را دارد و یک فایل JSON کنار عکس‌ها ذخیره می‌شود.
+        
+        Args:
+            count (int): تعداد عکس‌ها
+            interval (float): فاصله بین عکس‌ها بر حسب ثانیه (None یعنی همه فریم‌ها)
+            directory (str): پوشه خروجی
+            prefix (str): پیشوند نام فایل‌ها
+            quality (int): کیفیت JPEG
+            seconds_before (float): سری از بافر فریم‌های اخیر با شروع از چند ثانیه قبل
+            timeout (float): حداکثر زمان جمع‌آوری (پیش‌فرض مدت سری + 5 ثانیه)
+            
+        Returns:
+            dict: خلاصه سری (مسیر عکس‌ها، فاصله‌های واقعی، مسیر متادیتا) یا None در صورت خطا
+        """
+        if self.snapshot_writer is None:
+            self.snapshot_writer = SnapshotWriter(registry=self.metrics, camera=self.ip_address)
+        from burst_capture import BurstCapture
+        burst = BurstCapture(
+            self.snapshot_writer, count, interval=interval, directory=directory, prefix=prefix,
+            quality=quality, camera_id=self.ip_address,
+            copy_images=self.capture_backend == "process",
+            source="buffer" if seconds_before else "live"
+        )
+        
+        if seconds_before:
+            if self.frame_buffer is None:
+                print("❌ بافر فریم‌های اخیر فعال نیست")
+                return None
+            for frame in self.frame_buffer.get_frames(time.time() - seconds_before):
+                # سری ارجاع فریم‌هایی که لازم دارد را خودش نگه می‌دارد
+                burst.offer(frame)
+                frame.release()
+        else:
+            if timeout is None:
+                timeout = count * (interval or 0.2) + 5.0
+            if not self._collect_burst(burst, timeout):
+                return None
+                
+        summary = burst.finish(timeout=10.0)
+        print(
+            f"✅ سری {summary['saved']}/{count} عکس در {summary['span_ms'] / 1000:.2f} ثانیه استریم "
+            f"({summary.get('metadata', '-')})"
+        )
+        if summary["frames_dropped"]:
+            print(f"⚠️ {summary['frames_dropped']} فریم سری به دلیل پر بودن صف ذخیره رد شد")
+        return summary
+    
+    def _collect_burst(self, burst, timeout):
+        """دادن فریم‌های زنده به سری تا کامل شدن یا پایان مهلت"""
+        deadline = time.monotonic() + timeout
+        
+        if self.dual_stream:
+            grabber = self.open_main_stream()
+            if grabber is None:
+                return False
+        else:
+            grabber = self.grabber
+            
+        if grabber is None:
+            # بدون grabber هر read_frame فریم بعدی استریم را می‌خواند
+            if not self.is_connected:
+                print("❌ دوربین متصل نیست")
+                return False
+            while not burst.done and time.monotonic() < deadline:
+                frame = self.read_frame()
+                burst.offer(frame)
+                if frame is not None:
+                    frame.release()
+            return True
+            
+        # در طول سری همه فریم‌ها دیکد می‌شوند، نه فقط نرخ هدف
+        paced = grabber is self.grabber and self.pacer.target_fps
+        if paced:
+            target_fps, self.pacer.target_fps = self.pacer.target_fps, None
+        try:
+            seq = grabber.get_stats()["sequence"]
+            last_refresh = time.monotonic()
+            while not burst.done and time.monotonic() < deadline:
+                frame = grabber.get_latest(timeout=0.5, newer_than=seq)
+                if frame is None:
+                    continue
+                seq = frame.seq
+                burst.offer(frame)
+                frame.release()
+                
+                if grabber is self.main_grabber and time.monotonic() - last_refresh > 1.0:
+                    # سری طولانی نباید با تایمر بیکاری استریم اصلی قطع شود
+                    with self._main_lock:
+                        self._schedule_main_close()
+                    last_refresh = time.monotonic()
+        finally:
+            if paced:
+                self.pacer.target_fps = target_fps
+        return True
+    
+    def get_snapshot_urls(self):
+        """
+        فهرست آدرس‌های ممکن CGI عکس دوربین به ترتیب اولویت
+        
+        Returns:
+            list: آدرس‌های عکس
+        """
+        return [
+            f"{self.base_url}/cgi-bin/snapshot.cgi?channel=1",
+            f"{self.base_url}/cgi-bin/snapshot.cgi",
+            f"{self.base_url}/snapshot.cgi",
+            f"{self.base_url}/snapshot.jpg"
+        ]
+    
+    def fetch_snapshot_jpeg(self, timeout=5):
+        """
+        دریافت مستقیم JPEG از CGI عکس دوربین روی session دائمی (بدون باز کردن استریم)
+        
+        آدرس موفق به خاطر سپرده می‌شود و در صورت نیاز احراز هویت به Digest تغییر می‌کند.
+        
+        Args:
+            timeout (float): مهلت درخواست
+            
+        Returns:
+            bytes: محتوای JPEG یا None در صورت خطا
+        """
+        with self._http_snapshot_hist.time():
+            return self._fetch_snapshot_jpeg(timeout)
+    
+    def _fetch_snapshot_jpeg(self, timeout):
+        """امتحان آدرس‌های CGI عکس (آدرس موفق قبلی در اولویت)"""
+        urls = [self.snapshot_url] if self.snapshot_url else self.get_snapshot_urls()
+        
+        for url in urls:
+            try:
+                response = self.session.get(url, timeout=timeout, verify=False)
+                
+                # برخی دوربین‌ها فقط احراز هویت Digest را می‌پذیرند
+                if response.status_code == 401 and \
+                        "digest" in response.headers.get("WWW-Authenticate", "").lower() and \
+                        not isinstance(self.session.auth, HTTPDigestAuth):
+                    self.session.auth = HTTPDigestAuth(self.username, self.password)
+                    response = self.session.get(url, timeout=timeout, verify=False)
+                    
+                data = response.content
+                if response.status_code == 200 and data[:2] == b"\xff\xd8":
+                    self.snapshot_url = url
+                    return data
+                    
+            except requests.exceptions.RequestException as e:
+                print(f"❌ خطا در دریافت عکس از {url}: {str(e)}")
+                
+        if self.snapshot_url:
+            # آدرس ذخیره شده دیگر کار نمی‌کند؛ دفعه بعد همه امتحان می‌شوند
+            self.snapshot_url = None
+        else:
+            print("❌ هیچ یک از آدرس‌های عکس دوربین کار نکرد")
+        return None
+    
+    def save_http_snapshot(self, filename=None, timeout=5):
+        """
+        ذخیره عکس مستقیم از CGI دوربین؛ بایت‌های JPEG بدون دیکد و encode مجدد ذخیره می‌شوند
+        
+        Args:
+            filename (str): نام فایل (اختیاری)
+            timeout (float): مهلت درخواست
+            
+        Returns:
+            str: مسیر فایل ذخیره شده یا None در صورت خطا
+        """
+        if filename is None:
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filename = f"snapshot_{timestamp}.jpg"
+            
+        data = self.fetch_snapshot_jpeg(timeout=timeout)
+        if data is None:
+            print("❌ خطا در گرفتن عکس")
+            return None
+            
+        with open(filename, "wb") as f:
+            f.write(data)
+        print(f"✅ عکس ذخیره شد: {filename}")
+        return filename
+    
+    def _get_http_executor(self):
+        """thread های پس‌زمینه درخواست‌های عکس (با اولین استفاده ساخته می‌شوند)"""
+        if self.http_executor is None:
+            self.http_executor = ThreadPoolExecutor(
+                max_workers=self.http_connections, thread_name_prefix="http-snapshot"
+            )
+        return self.http_executor
+    
+    def save_http_snapshot_async(self, filename=None, timeout=5, callback=None):
+        """
+        دریافت و ذخیره عکس HTTP در پس‌زمینه
+        
+        تا http_connections درخواست به صورت همزمان روی اتصال‌های keep-alive
+        اجرا می‌شوند و نوشتن فایل به SnapshotWriter سپرده می‌شود.
+        
+        Args:
+            filename (str): نام فایل (اختیاری)
+            timeout (float): مهلت درخواست
+            callback (callable): تابعی که با Future تکمیل شده صدا زده می‌شود
+            
+        Returns:
+            Future: نتیجه شامل مسیر فایل و زمان‌بندی
+        """
+        if filename is None:
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filename = f"snapshot_{timestamp}.jpg"
+            
+        executor = self._get_http_executor()
+        if self.snapshot_writer is None:
+            self.snapshot_writer = SnapshotWriter(registry=self.metrics, camera=self.ip_address)
+            
+        def fetch_and_write():
+            started = time.perf_counter()
+            data = self.fetch_snapshot_jpeg(timeout=timeout)
+            if data is None:
+                raise IOError("خطا در دریافت عکس از دوربین")
+            fetch_ms = (time.perf_counter() - started) * 1000
+            
+            write_future = self.snapshot_writer.submit_bytes(data, filename, block=True)
+            result = dict(write_future.result())
+            result["fetch_ms"] = fetch_ms
+            return result
+            
+        future = executor.submit(fetch_and_write)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+    
     def get_camera_info(self):
         """
         دریافت اطلاعات دوربین
@@ -237,7 +1394,7 @@ class CameraController:
             "ip_address": self.ip_address,
             "username": self.username,
             "port": self.port,
-            "model": "ITC231-RF1A-IR",
+            "model": self.MODEL,
             "is_connected": self.is_connected
         }
         
@@ -251,4 +1408,40 @@ class CameraController:
                 "fps": fps
             })
             
+        if self.grabber is not None:
+            info["grabber"] = self.grabber.get_stats()
+            info["pacing"] = self.pacer.get_stats()
+            
+        if self.supervisor is not None:
+            info["supervisor"] = self.supervisor.get_stats()
+            
+        if self.motion_detector is not None:
+            info["motion"] = self.motion_detector.get_stats()
+            
+        if self.recorder is not None:
+            info["recording"] = self.recorder.get_stats()
+            
+        if self.retention is not None:
+            info["retention"] = self.retention.get_stats()
+            
+        if self.main_grabber is not None:
+            info["main_stream"] = dict(self.main_grabber.get_stats(), url=self.main_stream_url)
+            
+        if self.frame_buffer is not None:
+            info["frame_buffer"] = self.frame_buffer.get_stats()
+            
+        info["buffer_pool"] = self.buffer_pool.get_stats()
+            
+        if self.snapshot_writer is not None:
+            info["snapshot_writer"] = self.snapshot_writer.get_stats()
+            
         return info
+    
+    def get_metrics(self):
+        """
+        متریک‌های عملکرد این دوربین (زمان اتصال، grab، دیکد، عکس و شمارنده‌ها)
+        
+        Returns:
+            dict: خروجی MetricsRegistry.snapshot برای برچسب این دوربین
+        """
+        return self.metrics.snapshot(camera=self.ip_address)
@@ -0,0 +1,259 @@
+"""
+اجرای بدون رابط گرافیکی برای سرور و سرویس‌های پس‌زمینه
+
+تنظیمات از camera_settings.json (همان فایلی که برنامه گرافیکی ذخیره می‌کند)
+خوانده می‌شود و PyQt5 هرگز وارد نمی‌شود. ماژول‌های سنگین (OpenCV، numpy،
+requests و کنترل کننده دوربین) فقط بعد از بررسی آرگومان‌ها و فقط برای
+کارهایی که به دوربین نیاز دارند وارد می‌شوند.
+
+نمونه‌ها:
+    python camera_daemon.py frame                 # زمان شروع تا اولین فریم
+    python camera_daemon.py snapshot -o gate.jpg
+    python camera_daemon.py snapshot --count 10 --interval 0.5
+    python camera_daemon.py run --record --motion --relay-port 8090
+"""
+import time
+
+# زمان شروع پیش از هر import برای اندازه‌گیری شروع سرد
+_STARTED = time.perf_counter()
+
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+
+from burst_capture import burst_filename
+from camera_config import DEFAULT_SETTINGS_PATH, load_settings
+
+
+def _elapsed_ms():
+    """زمان گذشته از شروع فرآیند (میلی‌ثانیه)"""
+    return (time.perf_counter() - _STARTED) * 1000
+
+
+def build_controller(settings, use_grabber=False):
+    """
+    ساخت کنترل کننده دوربین از تنظیمات
+
+    Args:
+        settings (dict): تنظیمات خوانده شده با load_settings
+        use_grabber (bool): خواندن مداوم استریم در پس‌زمینه
+
+    Returns:
+        CameraController: کنترل کننده (هنوز متصل نشده)
+    """
+    from camera_controller import CameraController
+
+    return CameraController(
+        settings["camera_ip"], settings["username"], settings["password"],
+        port=settings["port"], use_grabber=use_grabber,
+        capture_backend=settings["stream_backend"],
+        target_fps=settings["target_fps"] or None,
+        dual_stream=settings["dual_stream"],
+        stream_urls=settings["stream_urls"]
+    )
+
+
+def cmd_frame(settings, args):
+    """اتصال، خواندن اولین فریم و گزارش زمان‌بندی شروع"""
+    import_started = _elapsed_ms()
+    controller = build_controller(settings)
+    imported = _elapsed_ms()
+    try:
+        if not controller.open_camera():
+            return 1
+        connected = _elapsed_ms()
+        frame = controller.read_frame()
+        if frame is None:
+            return 1
+        first_frame = _elapsed_ms()
+
+        height, width = frame.image.shape[:2]
+        report = {
+            "url": controller.stream_url,
+            "resolution": f"{width}x{height}",
+            "startup_ms": round(import_started, 1),
+            "import_ms": round(imported - import_started, 1),
+            "connect_ms": round(connected - imported, 1),
+            "read_ms": round(first_frame - connected, 1),
+            "first_frame_ms": round(first_frame, 1)
+        }
+        if args.output:
+            import cv2
+            cv2.imwrite(args.output, frame.image)
+            report["output"] = args.output
+        print(json.dumps(report, ensure_ascii=False))
+        return 0
+    finally:
+        controller.close_camera()
+
+
+def cmd_snapshot(settings, args):
+    """گرفتن یک عکس یا یک سری عکس و خروج"""
+    controller = build_controller(settings)
+    try:
+        if not controller.open_camera():
+            return 1
+        quality = args.quality or settings["quality"]
+        directory = args.directory or settings["snapshot_dir"]
+
+        if args.count > 1:
+            summary = controller.capture_burst(
+                args.count, interval=args.interval, directory=directory, quality=quality
+            )
+            return 0 if summary and summary["saved"] == args.count else 1
+
+        filename = args.output
+        if filename is None:
+            os.makedirs(directory, exist_ok=True)
+            filename = os.path.join(directory, f"snapshot_{time.strftime('%Y%m%d_%H%M%S')}.jpg")
+        future = controller.save_snapshot_async(filename, quality=quality)
+        if future is None:
+            return 1
+        try:
+            result = future.result(timeout=10.0)
+        except Exception as e:
+            print(f"❌ خطا در ذخیره عکس: {str(e)}")
+            return 1
+        print(f"✅ عکس ذخیره شد: {result['path']}")
+        return 0
+    finally:
+        controller.close_camera()
+
+
+def cmd_run(settings, args):
+    """اجرای مداوم: ضبط، تشخیص حرکت، عکس دوره‌ای و بازپخش تا دریافت سیگنال توقف"""
+    controller = build_controller(settings, use_grabber=True)
+    stop_event = threading.Event()
+
+    def handle_signal(signum, _frame):
+        print(f"⚠️ سیگنال {signum} دریافت شد؛ در حال توقف...")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    relay = None
+    try:
+        if not controller.open_camera() or not controller.start_grabber():
+            return 1
+        controller.enable_supervisor()
+
+        snapshot_dir = settings["snapshot_dir"]
+        if args.motion or settings["motion_detection"]:
+            controller.enable_motion_detection(
+                action="record" if args.motion_record else "snapshot", directory=snapshot_dir
+            )
+        if args.record:
+            quota_gb = settings["record_quota_gb"]
+            if not controller.start_recording(
+                directory=settings["recording_dir"],
+                segment_seconds=settings["record_segment_seconds"],
+                quota_bytes=int(quota_gb * 1024 ** 3) if quota_gb else None,
+                on_delete=lambda path, size: print(f"🧹 حذف شد: {path} ({size / (1024 * 1024):.1f} MB)")
+            ):
+                return 1
+        if args.relay_port:
+            from relay_server import RelayServer
+            relay = RelayServer(controller, args.relay_host, args.relay_port)
+            if not relay.start():
+                return 1
+
+        print(f"🎉 اجرا بدون رابط گرافیکی شروع شد ({_elapsed_ms():.0f} ms)")
+        now = time.monotonic()
+        next_snapshot = now + args.snapshot_interval if args.snapshot_interval else None
+        next_stats = now + args.stats_interval if args.stats_interval else None
+        periodic_count = 0
+        while not stop_event.wait(0.5):
+            now = time.monotonic()
+            if next_snapshot is not None and now >= next_snapshot:
+                next_snapshot += args.snapshot_interval
+                os.makedirs(snapshot_dir, exist_ok=True)
+                periodic_count += 1
+                filename = burst_filename(snapshot_dir, "periodic", time.time(), periodic_count)
+                controller.save_snapshot_async(filename, quality=settings["quality"])
+            if next_stats is not None and now >= next_stats:
+                next_stats += args.stats_interval
+                info = controller.get_camera_info()
+                if relay is not None:
+                    info["relay"] = relay.get_stats()
+                print(json.dumps(info, ensure_ascii=False, default=str))
+        return 0
+    finally:
+        if relay is not None:
+            relay.stop()
+        controller.close_camera()
+
+
+def parse_args(argv=None):
+    """خواندن آرگومان‌های خط فرمان"""
+    parser = argparse.ArgumentParser(description="کنترل دوربین بدون رابط گرافیکی")
+    parser.add_argument("--config", default=DEFAULT_SETTINGS_PATH, help="مسیر فایل تنظیمات")
+    parser.add_argument("--ip", help="آدرس دوربین (به جای مقدار فایل تنظیمات)")
+    parser.add_argument("--username")
+    parser.add_argument("--password", help="بهتر است از متغیر محیطی CAMERA_PASSWORD استفاده شود")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--backend", choices=("opencv", "process", "mjpeg"))
+    parser.add_argument("--stream-url", action="append", help="آدرس استریم (قابل تکرار)")
+    parser.add_argument("--target-fps", type=float)
+    parser.add_argument("--single-stream", action="store_true", help="بدون substream؛ همه چیز از استریم اصلی")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    frame = subparsers.add_parser("frame", help="اتصال و گزارش زمان رسیدن اولین فریم")
+    frame.add_argument("-o", "--output", help="ذخیره اولین فریم")
+    frame.set_defaults(handler=cmd_frame)
+
+    snapshot = subparsers.add_parser("snapshot", help="گرفتن عکس یا سری عکس")
+    snapshot.add_argument("-o", "--output", help="مسیر فایل عکس")
+    snapshot.add_argument("-d", "--directory", help="پوشه خروجی")
+    snapshot.add_argument("-q", "--quality", type=int)
+    snapshot.add_argument("--count", type=int, default=1, help="تعداد عکس‌های سری")
+    snapshot.add_argument("--interval", type=float, help="فاصله عکس‌های سری (ثانیه)")
+    snapshot.set_defaults(handler=cmd_snapshot)
+
+    run = subparsers.add_parser("run", help="اجرای مداوم تا دریافت SIGINT یا SIGTERM")
+    run.add_argument("--record", action="store_true", help="ضبط مداوم بخش‌بندی شده")
+    run.add_argument("--motion", action="store_true", help="عکس خودکار هنگام حرکت")
+    run.add_argument("--motion-record", action="store_true", help="ضبط به جای عکس هنگام حرکت")
+    run.add_argument("--snapshot-interval", type=float, default=0, help="عکس دوره‌ای هر چند ثانیه")
+    run.add_argument("--relay-port", type=int, help="بازپخش MJPEG روی این پورت")
+    run.add_argument("--relay-host", default="127.0.0.1")
+    run.add_argument("--stats-interval", type=float, default=0, help="چاپ آمار JSON هر چند ثانیه")
+    run.set_defaults(handler=cmd_run)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "motion_record", False):
+        args.motion = True
+    return args
+
+
+def apply_overrides(settings, args):
+    """اعمال آرگومان‌های خط فرمان روی تنظیمات فایل"""
+    overrides = {
+        "camera_ip": args.ip,
+        "username": args.username,
+        "password": args.password,
+        "port": args.port,
+        "stream_backend": args.backend,
+        "stream_urls": args.stream_url,
+        "target_fps": args.target_fps
+    }
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    if args.single_stream:
+        settings["dual_stream"] = False
+    return settings
+
+
+def main(argv=None):
+    """نقطه ورود خط فرمان"""
+    args = parse_args(argv)
+    settings = apply_overrides(load_settings(args.config), args)
+    if not settings["password"]:
+        print("⚠️ رمز عبور تعیین نشده است (camera_settings.json یا CAMERA_PASSWORD)")
+    return args.handler(settings, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
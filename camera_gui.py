@@ -7,35 +7,223 @@
 import sys
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import cv2
 import numpy as np
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QPushButton, 
                              QVBoxLayout, QHBoxLayout, QWidget, QGridLayout,
-                             QGroupBox, QTextEdit, QProgressBar, QStatusBar,
+                             QGroupBox, QPlainTextEdit, QProgressBar, QStatusBar,
                              QMessageBox, QFileDialog, QComboBox, QSpinBox,
-                             QCheckBox, QSlider, QFrame)
+                             QDoubleSpinBox, QCheckBox, QSlider, QFrame)
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QPixmap, QImage, QFont, QPalette, QColor, QIcon
 
+from stream_prober import StreamProber
+from stream_cache import StreamCache, probe_with_cache
+from frame_buffer import FrameRingBuffer
+from snapshot_writer import SnapshotWriter
+from mjpeg_reader import mjpeg_urls, open_mjpeg
+from frame import Frame
+from frame_pacer import FramePacer
+from buffer_pool import BufferPool
+from overlay import OverlayCompositor, TimestampLayer, TextLayer, FpsLayer, ZonesLayer
+from camera_controller import CameraController
+from camera_config import load_settings, save_settings
+from event_log import EventLog
+from metrics import metrics
+from stream_supervisor import StreamSupervisor
+from motion_detector import MotionDetector
+from burst_capture import BurstCapture, burst_filename
+
+
+class FrameRenderer:
+    """
+    آماده‌سازی فریم برای نمایش روی thread استریم
+    
+    تصویر ابتدا به اندازه نمایش کوچک می‌شود و تبدیل رنگ فقط در همان
+    رزولوشن انجام می‌شود. حداکثر یک تصویر آماده در انتظار نگه داشته
+    می‌شود؛ تصویر جدیدتر جایگزین قبلی می‌شود و تعداد رد شده‌ها شمرده می‌شود.
+    """
+    
+    def __init__(self, width=640, height=480, registry=None, camera=None):
+        self._lock = threading.Lock()
+        self._target_size = (width, height)
+        self._pending = None
+        self._signaled_at = None
+        self.rendered = 0
+        self.skipped = 0
+        
+        registry = registry if registry is not None else metrics
+        self._scale_hist = registry.histogram("scale", camera=camera)
+        self._color_hist = registry.histogram("color_convert", camera=camera)
+        self._skipped_counter = registry.counter("display_frames_skipped", camera=camera)
+        # آرایه کوچک شده بعد از تبدیل رنگ و آرایه RGB بعد از تبدیل به QPixmap (یا
+        # جایگزین شدن با تصویر جدیدتر) صریحاً به استخر برمی‌گردند
+        self.pool = BufferPool(max_buffers=4, name="display", registry=registry, camera=camera)
+        # زمان همیشه نمایش داده می‌شود؛ بقیه لایه‌ها با set_info_overlay
+        self.overlay = OverlayCompositor([
+            TimestampLayer(),
+            TextLayer("camera", camera or "", enabled=False),
+            FpsLayer(enabled=False),
+            ZonesLayer(enabled=False)
+        ], channel_order="rgb", registry=registry, camera=camera)
+    
+    def set_target_size(self, width, height):
+        """تنظیم اندازه ناحیه نمایش (از thread رابط کاربری)"""
+        with self._lock:
+            self._target_size = (max(1, width), max(1, height))
+    
+    def set_info_overlay(self, enabled):
+        """نمایش IP دوربین، FPS و نواحی حرکت روی تصویر"""
+        for name in ("camera", "fps", "zones"):
+            self.overlay.set_enabled(name, enabled)
+    
+    def render(self, frame, **values):
+        """
+        کوچک کردن، تبدیل رنگ و افزودن لایه‌های نمایشی یک فریم
+        
+        Args:
+            frame (Frame): فریم دریافتی (تغییر نمی‌کند)
+            **values: مقادیر لحظه‌ای لایه‌ها (fps، motion_detector)
+            
+        Returns:
+            bool: True اگر قبلاً تصویری در انتظار نبوده (یعنی باید به GUI اطلاع داده شود)
+        """
+        started = time.perf_counter()
+        image = frame.image
+        with self._lock:
+            target_w, target_h = self._target_size
+        
+        h, w = image.shape[:2]
+        scale = min(target_w / w, target_h / h)
+        display_w, display_h = max(1, int(w * scale)), max(1, int(h * scale))
+        
+        scale_start = time.perf_counter()
+        if (display_w, display_h) != (w, h):
+            interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+            scaled = self.pool.acquire((display_h, display_w) + image.shape[2:])
+            image = cv2.resize(image, (display_w, display_h), dst=scaled, interpolation=interpolation)
+        else:
+            scaled = None
+        
+        # تبدیل رنگ فقط در رزولوشن نمایش؛ خروجی در آرایه استخر است و فریم اصلی تغییر نمی‌کند
+        color_start = time.perf_counter()
+        rgb_frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=self.pool.acquire(image.shape))
+        color_end = time.perf_counter()
+        if scaled is not None:
+            self.pool.release(scaled)
+        self._scale_hist.observe((color_start - scale_start) * 1000)
+        self._color_hist.observe((color_end - color_start) * 1000)
+        
+        # زمان و اطلاعات فقط روی تصویر نمایش؛ کاشی‌ها فقط با تغییر متن دوباره رسم می‌شوند
+        self.overlay.apply(rgb_frame, frame, **values)
+        
+        qt_image = QImage(rgb_frame.data, display_w, display_h, 3 * display_w, QImage.Format_RGB888)
+        render_ms = (time.perf_counter() - started) * 1000
+        
+        with self._lock:
+            replaced = self._pending
+            was_empty = replaced is None
+            if was_empty:
+                # زمان ارسال سیگنال برای اندازه‌گیری تاخیر تحویل به GUI
+                self._signaled_at = time.perf_counter()
+            else:
+                self.skipped += 1
+                self._skipped_counter.inc()
+            # rgb_frame تا زمان تبدیل به QPixmap و frame تا جایگزینی current_frame نگه داشته می‌شوند
+            self._pending = (frame.retain(), qt_image, rgb_frame, render_ms, self._signaled_at)
+            self.rendered += 1
+        if replaced is not None:
+            self.release(replaced)
+        return was_empty
+    
+    def take(self):
+        """
+        برداشتن تصویر آماده در انتظار (از thread رابط کاربری)
+        
+        Returns:
+            tuple: (frame, qt_image, rgb_frame, render_ms, signaled_at) یا None؛ بعد از
+                تبدیل qt_image به QPixmap، rgb_frame با pool.release و frame با release برگردانده شوند
+        """
+        with self._lock:
+            pending, self._pending = self._pending, None
+        return pending
+    
+    def release(self, pending):
+        """برگرداندن تصویر در انتظاری که نمایش داده نشد (فریم و آرایه RGB)"""
+        frame, _, rgb_frame, _, _ = pending
+        self.pool.release(rgb_frame)
+        frame.release()
+
 
 class CameraStream(QThread):
     """Thread برای دریافت استریم دوربین"""
-    frame_ready = pyqtSignal(np.ndarray)
+    # کپی فریم بدون lease (گیرنده‌ها بعد از برگشتن آرایه به استخر اجرا می‌شوند)
+    frame_ready = pyqtSignal(object)
+    image_ready = pyqtSignal()
     connection_status = pyqtSignal(bool, str)
+    motion_detected = pyqtSignal(object)
+    burst_captured = pyqtSignal(object)
     
-    def __init__(self, ip, username, password):
+    def __init__(self, ip, username, password, probe_timeout=10.0,
+                 model="ITC231-RF1A-IR", stream_cache=None, frame_buffer=None,
+                 backend="opencv", target_fps=None, subtype=0, registry=None,
+                 stall_timeout=5.0):
         super().__init__()
         self.ip = ip
         self.username = username
         self.password = password
+        self.probe_timeout = probe_timeout
+        self.model = model
+        self.stream_cache = stream_cache
+        self.frame_buffer = frame_buffer
+        # "opencv" یا "mjpeg" (خواننده داخلی MJPEG روی requests)
+        self.backend = backend
+        # یک session برای همه اتصال‌های مجدد MJPEG؛ در stop_stream بسته می‌شود
+        self.session = None
         self.running = False
         self.cap = None
+        self.stream_url = None
+        self.frame_seq = 0
+        # نگهبان اتصال: بعد از stall_timeout ثانیه بدون فریم، اتصال مجدد در پس‌زمینه
+        self.stall_timeout = stall_timeout
+        self.supervisor = None
+        self._cap_lock = threading.Lock()
+        self._cap_ready = threading.Event()
+        self._last_probe = None
+        
+        # متریک‌های مسیر دریافت تا نمایش با برچسب IP دوربین
+        self.metrics = registry if registry is not None else metrics
+        labels = {"camera": ip, "stream": "sub" if subtype else "main"}
+        self.renderer = FrameRenderer(registry=self.metrics, camera=ip)
+        self.buffer_pool = BufferPool(name="frames", registry=self.metrics, camera=ip)
+        self.connect_hist = self.metrics.histogram("connect", **labels)
+        self.grab_hist = self.metrics.histogram("grab", **labels)
+        self.decode_hist = self.metrics.histogram("decode", **labels)
+        self.signal_hist = self.metrics.histogram("signal", camera=ip)
+        self.paint_hist = self.metrics.histogram("paint", camera=ip)
+        self.grab_rate = self.metrics.rate("frames_grabbed", **labels)
+        self.output_rate = self.metrics.rate("frames_output", **labels)
+        self.display_rate = self.metrics.rate("frames_displayed", camera=ip)
+        self.connect_failures = self.metrics.counter("connect_failures", **labels)
+        self.read_errors = self.metrics.counter("read_errors", **labels)
+        # نرخ خروجی مطلوب؛ فریم‌های اضافه فقط grab می‌شوند و دیکد نمی‌شوند
+        self.pacer = FramePacer(target_fps=target_fps)
+        # 1 یعنی substream با وضوح پایین برای پیش‌نمایش
+        self.subtype = subtype
+        self.decode_cpu_seconds = 0.0
+        self._started_at = None
+        # تشخیص حرکت روی فریم‌های پیش‌نمایش (None یعنی غیرفعال)
+        self.motion_detector = None
+        self._motion_frame = None
+        # سری عکس در حال جمع‌آوری از فریم‌های همین استریم
+        self.burst = None
         
         # آدرس‌های ممکن برای استریم
         self.stream_urls = [
-            f"rtsp://{username}:{password}@{ip}:554/cam/realmonitor?channel=1&subtype=0",
+            f"rtsp://{username}:{password}@{ip}:554/cam/realmonitor?channel=1&subtype={subtype}",
             f"rtsp://{username}:{password}@{ip}/video1",
             f"http://{username}:{password}@{ip}/videostream.cgi",
             f"http://{username}:{password}@{ip}/mjpeg"
@@ -49,74 +237,328 @@ class CameraStream(QThread):
     def stop_stream(self):
         """توقف استریم"""
         self.running = False
-        if self.cap:
-            self.cap.release()
+        if self.supervisor is not None:
+            self.supervisor.stop()
+        self._cap_ready.set()
+        with self._cap_lock:
+            cap = self.cap
+        if cap:
+            cap.release()
         self.quit()
         self.wait()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+    
+    def connect_mjpeg(self):
+        """اتصال با خواننده داخلی MJPEG روی session مشترک همین استریم"""
+        if self.session is None:
+            self.session = requests.Session()
+            self.session.auth = (self.username, self.password)
+        
+        urls = mjpeg_urls(f"http://{self.ip}")
+        if self.stream_url in urls:
+            # آدرس قبلی در اتصال مجدد اول امتحان می‌شود
+            urls.remove(self.stream_url)
+            urls.insert(0, self.stream_url)
+        self.connection_status.emit(False, f"تلاش برای اتصال MJPEG ({len(urls)} آدرس ممکن)...")
+        
+        reader, _ = open_mjpeg(self.session, urls, timeout=self.probe_timeout)
+        if reader is None:
+            self.connection_status.emit(False, "هیچ استریم MJPEG در دسترس نیست")
+            return None
+        
+        self.connection_status.emit(True, f"اتصال موفق (MJPEG): {reader.url}")
+        self.stream_url = reader.url
+        return reader
+    
+    def connect_stream(self):
+        """اتصال با امتحان آدرس کش شده و سپس همه آدرس‌ها"""
+        self.connection_status.emit(False, f"تلاش برای اتصال ({len(self.stream_urls)} آدرس ممکن)...")
+        
+        prober = StreamProber(timeout=self.probe_timeout, max_workers=len(self.stream_urls))
+        try:
+            # substream جدا از استریم اصلی در کش ذخیره می‌شود
+            cache_model = f"{self.model}/sub" if self.subtype else self.model
+            result = probe_with_cache(
+                prober, self.stream_cache, self.ip, cache_model,
+                self.username, self.password, self.stream_urls
+            )
+        except Exception as e:
+            self.connection_status.emit(False, f"خطا: {str(e)}")
+            result = None
+        
+        for line in prober.format_timings():
+            self.connection_status.emit(False, line)
+        
+        if result is None:
+            self.connection_status.emit(False, "هیچ استریمی در دسترس نیست")
+            return None
+        
+        source = "کش" if result["from_cache"] else "جستجو"
+        self.connection_status.emit(True, f"اتصال موفق ({source}): {result['url']} ({result['elapsed']:.2f}s)")
+        self.stream_url = result["url"]
+        self._last_probe = (result["url"], result["backend"], result["params"])
+        return result["cap"]
+    
+    def _reconnect_last(self):
+        """امتحان مستقیم آخرین آدرس موفق وقتی کش آدرس‌ها فعال نیست (کش خودش همین کار را می‌کند)"""
+        if self._last_probe is None or self.backend == "mjpeg" or self.stream_cache is not None:
+            return None
+        url, backend, params = self._last_probe
+        result = StreamProber(timeout=self.probe_timeout).probe_one(url, backend, params)
+        if result is None:
+            return None
+        self.connection_status.emit(True, f"اتصال مجدد به آدرس قبلی: {url} ({result['elapsed']:.2f}s)")
+        return result["cap"]
+    
+    def _open_capture(self):
+        """ساخت capture جدید برای نگهبان (اولین اتصال و اتصال‌های مجدد)"""
+        with self.connect_hist.time():
+            cap = self._reconnect_last()
+            if cap is None:
+                cap = self.connect_mjpeg() if self.backend == "mjpeg" else self.connect_stream()
+        if cap is None:
+            self.connect_failures.inc()
+        return cap
+    
+    def _install_capture(self, cap):
+        """
+        نصب capture جدید بدون توقف thread؛ capture قبلی (اگر حلقه هنوز روی read
+        آن مسدود است) بعد از برگشتن read توسط خود حلقه آزاد می‌شود
+        """
+        # نرخ اعلام شده منبع فقط مقدار اولیه است؛ نرخ واقعی از فاصله فریم‌ها اندازه‌گیری می‌شود
+        self.pacer.set_source_fps(cap.get(cv2.CAP_PROP_FPS))
+        self.pacer.realtime = "://" not in (self.stream_url or "")
+        with self._cap_lock:
+            self.cap = cap
+            self._cap_ready.set()
+    
+    def _drop_capture(self, cap, reason):
+        """کنار گذاشتن capture خراب و درخواست اتصال مجدد از نگهبان"""
+        with self._cap_lock:
+            if self.cap is cap:
+                self.cap = None
+                self._cap_ready.clear()
+        cap.release()
+        self.read_errors.inc()
+        if self.running:
+            self.connection_status.emit(False, reason)
+            self.supervisor.report_failure(reason)
     
     def run(self):
         """اجرای thread"""
-        connected = False
+        # اتصال، تشخیص توقف و اتصال مجدد توسط نگهبان انجام می‌شود؛ این حلقه فقط می‌خواند
+        self.supervisor = StreamSupervisor(
+            connect=self._open_capture, on_swap=self._install_capture,
+            stall_timeout=self.stall_timeout, on_status=self.connection_status.emit,
+            registry=self.metrics, camera=self.ip
+        )
+        self.supervisor.start()
+        self._started_at = time.monotonic()
         
-        for url in self.stream_urls:
+        # حلقه دریافت فریم: grab با نرخ خود دوربین بلاک می‌شود و نیازی به خواب ثابت نیست
+        while self.running:
+            with self._cap_lock:
+                cap = self.cap
+            if cap is None:
+                self._cap_ready.wait(0.5)
+                continue
+            
             try:
-                self.connection_status.emit(False, f"تلاش برای اتصال به: {url}")
+                self.pacer.throttle()
+                cpu_start = time.thread_time()
+                grab_start = time.perf_counter()
+                grabbed = cap.grab()
+                self.grab_hist.observe((time.perf_counter() - grab_start) * 1000)
+                self.decode_cpu_seconds += time.thread_time() - cpu_start
+                
+                if cap is not self.cap:
+                    # نگهبان در حین انتظار capture را عوض کرده است
+                    cap.release()
+                    continue
+                if not grabbed:
+                    self._drop_capture(cap, "خطا در دریافت فریم")
+                    continue
+                self.grab_rate.mark()
+                self.supervisor.frame_received()
+                
+                jpeg = getattr(cap, "last_jpeg", None)
+                # در طول سری عکس همه فریم‌ها دیکد می‌شوند
+                decode = self.burst is not None or self.pacer.on_frame()
+                if decode:
+                    cpu_start = time.thread_time()
+                    decode_start = time.perf_counter()
+                    ret, image = self.buffer_pool.retrieve(cap)
+                    self.decode_hist.observe((time.perf_counter() - decode_start) * 1000)
+                    self.decode_cpu_seconds += time.thread_time() - cpu_start
+                    if not ret or image is None:
+                        self._drop_capture(cap, "خطا در دیکد فریم")
+                        continue
                 
-                self.cap = cv2.VideoCapture(url)
-                if self.cap.isOpened():
-                    ret, frame = self.cap.read()
-                    if ret and frame is not None:
-                        connected = True
-                        self.connection_status.emit(True, f"اتصال موفق: {url}")
-                        break
-                    else:
-                        self.cap.release()
-                        
             except Exception as e:
-                self.connection_status.emit(False, f"خطا: {str(e)}")
+                self._drop_capture(cap, f"خطا در استریم: {str(e)}")
                 continue
-        
-        if not connected:
-            self.connection_status.emit(False, "هیچ استریمی در دسترس نیست")
-            return
-        
-        # حلقه دریافت فریم
-        while self.running and self.cap.isOpened():
+            
+            # از اینجا خطاها مربوط به پردازش فریم است و اتصال سالم را قطع نمی‌کند
+            if not decode:
+                # فریم رد شده دیکد نمی‌شود؛ اگر JPEG خام داریم فقط در بافر قبل از رویداد می‌ماند
+                if jpeg is not None and self.frame_buffer is not None:
+                    self.frame_seq += 1
+                    try:
+                        self.frame_buffer.append(Frame(
+                            jpeg=jpeg, seq=self.frame_seq, camera_id=self.ip, source_url=self.stream_url
+                        ))
+                    except Exception as e:
+                        print(f"❌ خطا در پردازش فریم: {str(e)}")
+                continue
+            
+            self.output_rate.mark()
+            self.frame_seq += 1
+            frame = Frame(
+                image=image, jpeg=jpeg,
+                seq=self.frame_seq, camera_id=self.ip, source_url=self.stream_url,
+                lease=self.buffer_pool.lease(image)
+            )
             try:
-                ret, frame = self.cap.read()
-                if ret and frame is not None:
-                    self.frame_ready.emit(frame)
-                else:
-                    self.connection_status.emit(False, "خطا در دریافت فریم")
-                    break
-                    
-                self.msleep(33)  # ~30 FPS
-                
+                self._process_frame(frame)
             except Exception as e:
-                self.connection_status.emit(False, f"خطا در استریم: {str(e)}")
-                break
+                print(f"❌ خطا در پردازش فریم: {str(e)}")
+            finally:
+                # ارجاع این حلقه؛ بافر، سری و renderer ارجاع خودشان را گرفته‌اند
+                frame.release()
+        
+        self.supervisor.stop()
+        with self._cap_lock:
+            cap, self.cap = self.cap, None
+        if cap:
+            cap.release()
+        if self._motion_frame is not None:
+            self._motion_frame.release()
+            self._motion_frame = None
+        if self.burst is not None:
+            # سری ناتمام با همان عکس‌های گرفته شده بسته می‌شود
+            burst, self.burst = self.burst, None
+            self.burst_captured.emit(burst)
+    
+    def _process_frame(self, frame):
+        """
+        سپردن فریم دیکد شده به بافر، گیرنده‌ها، تشخیص حرکت، سری عکس و نمایش
+        
+        Args:
+            frame (Frame): فریم؛ هر مصرف‌کننده‌ای که آن را نگه می‌دارد retain می‌کند
+        """
+        if self.frame_buffer is not None:
+            self.frame_buffer.append(frame)
+        if self.receivers(self.frame_ready) > 0:
+            # کپی فقط وقتی گیرنده‌ای وصل است؛ آرایه استخر بعد از همین حلقه بازنویسی می‌شود
+            self.frame_ready.emit(frame.with_image(frame.image.copy()))
         
-        if self.cap:
-            self.cap.release()
+        detector = self.motion_detector
+        if detector is not None:
+            previous, self._motion_frame = self._motion_frame, frame.retain()
+            if previous is not None:
+                previous.release()
+            detector.process(frame.image)
+        
+        burst = self.burst
+        if burst is not None and burst.offer(frame):
+            self.burst = None
+            self.burst_captured.emit(burst)
+        
+        # آماده‌سازی تصویر نمایش روی همین thread؛ فقط اگر GUI منتظر نیست سیگنال می‌دهیم
+        if self.renderer.render(frame, fps=self.pacer.output_fps, motion_detector=detector):
+            self.image_ready.emit()
+    
+    def start_burst(self, burst):
+        """
+        شروع جمع‌آوری سری عکس از فریم‌های بعدی استریم
+        
+        Args:
+            burst (BurstCapture): سری؛ بعد از کامل شدن با سیگنال burst_captured برگردانده می‌شود
+        """
+        self.burst = burst
+    
+    def set_motion_detection(self, enabled, **kwargs):
+        """
+        فعال یا غیرفعال کردن تشخیص حرکت روی فریم‌های دیکد شده
+        
+        Args:
+            enabled (bool): وضعیت
+            **kwargs: تنظیمات MotionDetector (zones، area_threshold، cooldown، ...)
+        """
+        if not enabled:
+            self.motion_detector = None
+            return
+        self.motion_detector = MotionDetector(
+            on_motion=self._on_motion, registry=self.metrics, camera=self.ip, **kwargs
+        )
+    
+    def _on_motion(self, event):
+        """شروع رویداد حرکت روی thread استریم؛ فریم همان لحظه (با ارجاع جدا) به رابط کاربری داده می‌شود"""
+        frame = self._motion_frame
+        event["frame"] = frame.retain() if frame is not None else None
+        self.motion_detected.emit(event)
+    
+    def get_supervisor_stats(self):
+        """آمار نگهبان اتصال (قطعی‌ها و زمان بازیابی) یا None قبل از شروع"""
+        return self.supervisor.get_stats() if self.supervisor is not None else None
+    
+    def get_decode_cpu_percent(self):
+        """درصد یک هسته CPU که صرف grab و دیکد این استریم شده است"""
+        if self._started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started_at
+        return self.decode_cpu_seconds / elapsed * 100 if elapsed > 0 else 0.0
 
 
 class CameraGUI(QMainWindow):
     """کلاس اصلی برنامه گرافیکی"""
+    snapshot_saved = pyqtSignal(object)
+    status_message = pyqtSignal(str)
+    burst_saved = pyqtSignal(object)
+    recording_changed = pyqtSignal(bool)
     
     def __init__(self):
         super().__init__()
         
-        # تنظیمات دوربین
-        self.camera_ip = "192.168.1.108"
-        self.username = "admin"
-        self.password = "ArashArash"
+        # تنظیمات دوربین از camera_settings.json (رمز عبور از CAMERA_PASSWORD هم خوانده می‌شود)
+        self.settings = load_settings()
+        self.camera_ip = self.settings["camera_ip"]
+        self.username = self.settings["username"]
+        self.password = self.settings["password"]
+        self.camera_model = self.settings["camera_model"]
+        self.stream_backend = self.settings["stream_backend"]  # "opencv" یا "mjpeg"
+        self.target_fps = float(self.settings["target_fps"] or 0)  # 0 یعنی همه فریم‌های دوربین
+        # پیش‌نمایش روی substream؛ عکس با وضوح کامل از CGI عکس یا استریم اصلی
+        self.dual_stream = self.settings["dual_stream"]
+        # ضبط مداوم: مدت هر بخش و سهمیه دیسک فایل‌های ویدیو (null یعنی بدون سهمیه)
+        self.record_segment_seconds = self.settings["record_segment_seconds"]
+        quota_gb = self.settings["record_quota_gb"]
+        self.record_quota_bytes = int(quota_gb * 1024 ** 3) if quota_gb else None
         
         # متغیرهای داخلی
         self.stream_thread = None
+        self.stream_cache = StreamCache()
+        # بافر 30 ثانیه اخیر به صورت JPEG برای عکس‌گیری از «چند ثانیه قبل»
+        self.frame_buffer = FrameRingBuffer(seconds=30, max_bytes=256 * 1024 * 1024, store_jpeg=True)
+        # encode و ذخیره عکس‌ها خارج از thread رابط کاربری؛ صف برای یک سری 30 تایی جا دارد
+        self.snapshot_writer = SnapshotWriter(workers=2, max_queue=48, camera=self.camera_ip)
+        # لاگ با محدودیت نرخ؛ پنل لاگ با تایمر و به صورت دسته‌ای به‌روز می‌شود
+        self.event_log = EventLog(capacity=500, file_path=self.settings["log_file"])
+        self.snapshot_saved.connect(self.handle_snapshot_saved)
+        self.burst_saved.connect(self.handle_burst_saved)
+        self.recording_changed.connect(self.handle_recording_changed)
+        self.status_message.connect(self.log_message)
+        # دریافت فریم وضوح کامل (شبکه) خارج از thread رابط کاربری
+        self.main_source = None
+        self.full_res_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="full-res")
         self.current_frame = None
         self.is_streaming = False
         self.frame_count = 0
         self.start_time = time.time()
+        self.display_latency_ms = None
+        self.render_ms = None
         
         # راه‌اندازی رابط
         self.init_ui()
@@ -127,6 +569,10 @@ class CameraGUI(QMainWindow):
         self.info_timer.timeout.connect(self.update_info)
         self.info_timer.start(1000)  # هر ثانیه
         
+        self.log_timer = QTimer()
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(250)
+        
         # شروع خودکار استریم بعد از راه‌اندازی کامل UI
         QTimer.singleShot(500, self.auto_start_streaming)
     
@@ -186,7 +632,12 @@ class CameraGUI(QMainWindow):
         self.snapshot_btn.clicked.connect(self.take_snapshot)
         self.snapshot_btn.setEnabled(False)
         
+        self.burst_btn = QPushButton("🎞️ سری عکس")
+        self.burst_btn.clicked.connect(self.take_burst)
+        self.burst_btn.setEnabled(False)
+        
         video_controls.addWidget(self.snapshot_btn)
+        video_controls.addWidget(self.burst_btn)
         
         layout.addLayout(video_controls)
         group.setLayout(layout)
@@ -211,21 +662,49 @@ class CameraGUI(QMainWindow):
         info_layout.addWidget(self.user_label, 1, 1)
         
         info_layout.addWidget(QLabel("مدل:"), 2, 0)
-        self.model_label = QLabel("ITC231-RF1A-IR")
+        self.model_label = QLabel(self.camera_model)
         info_layout.addWidget(self.model_label, 2, 1)
         
         info_layout.addWidget(QLabel("وضعیت:"), 3, 0)
         self.status_label = QLabel("❌ قطع")
         info_layout.addWidget(self.status_label, 3, 1)
         
-        info_layout.addWidget(QLabel("FPS:"), 4, 0)
-        self.fps_label = QLabel("0.0")
+        info_layout.addWidget(QLabel("FPS (ورودی/خروجی):"), 4, 0)
+        self.fps_label = QLabel("-")
         info_layout.addWidget(self.fps_label, 4, 1)
         
         info_layout.addWidget(QLabel("فریم‌ها:"), 5, 0)
         self.frame_label = QLabel("0")
         info_layout.addWidget(self.frame_label, 5, 1)
         
+        info_layout.addWidget(QLabel("صف ذخیره:"), 6, 0)
+        self.writer_queue_label = QLabel("0")
+        info_layout.addWidget(self.writer_queue_label, 6, 1)
+        
+        info_layout.addWidget(QLabel("تاخیر نمایش:"), 7, 0)
+        self.latency_label = QLabel("-")
+        info_layout.addWidget(self.latency_label, 7, 1)
+        
+        info_layout.addWidget(QLabel("فریم رد شده:"), 8, 0)
+        self.skipped_label = QLabel("0")
+        info_layout.addWidget(self.skipped_label, 8, 1)
+        
+        info_layout.addWidget(QLabel("CPU دیکد:"), 9, 0)
+        self.decode_cpu_label = QLabel("-")
+        info_layout.addWidget(self.decode_cpu_label, 9, 1)
+        
+        info_layout.addWidget(QLabel("اتصال مجدد:"), 10, 0)
+        self.reconnect_label = QLabel("0")
+        info_layout.addWidget(self.reconnect_label, 10, 1)
+        
+        info_layout.addWidget(QLabel("حرکت:"), 11, 0)
+        self.motion_label = QLabel("-")
+        info_layout.addWidget(self.motion_label, 11, 1)
+        
+        info_layout.addWidget(QLabel("تخصیص حافظه:"), 12, 0)
+        self.allocation_label = QLabel("-")
+        info_layout.addWidget(self.allocation_label, 12, 1)
+        
         info_group.setLayout(info_layout)
         layout.addWidget(info_group)
         
@@ -238,8 +717,8 @@ class CameraGUI(QMainWindow):
         quality_layout.addWidget(QLabel("کیفیت:"))
         self.quality_slider = QSlider(Qt.Horizontal)
         self.quality_slider.setRange(1, 100)
-        self.quality_slider.setValue(95)
-        self.quality_label_val = QLabel("95%")
+        self.quality_slider.setValue(int(self.settings["quality"]))
+        self.quality_label_val = QLabel(f"{self.quality_slider.value()}%")
         self.quality_slider.valueChanged.connect(
             lambda v: self.quality_label_val.setText(f"{v}%")
         )
@@ -249,9 +728,44 @@ class CameraGUI(QMainWindow):
         
         # نام‌گذاری خودکار
         self.auto_naming = QCheckBox("نام‌گذاری خودکار با زمان")
-        self.auto_naming.setChecked(True)
+        self.auto_naming.setChecked(self.settings["auto_naming"])
         photo_layout.addWidget(self.auto_naming)
         
+        # عکس از چند ثانیه قبل (از بافر فریم‌های اخیر)
+        before_layout = QHBoxLayout()
+        before_layout.addWidget(QLabel("ثانیه قبل:"))
+        self.seconds_before_spin = QSpinBox()
+        self.seconds_before_spin.setRange(0, 30)
+        self.seconds_before_spin.setValue(0)
+        before_layout.addWidget(self.seconds_before_spin)
+        photo_layout.addLayout(before_layout)
+        
+        # سری عکس: تعداد و فاصله (0 یعنی همه فریم‌ها)
+        burst_layout = QHBoxLayout()
+        burst_layout.addWidget(QLabel("سری:"))
+        self.burst_count_spin = QSpinBox()
+        self.burst_count_spin.setRange(2, 300)
+        self.burst_count_spin.setValue(10)
+        burst_layout.addWidget(self.burst_count_spin)
+        burst_layout.addWidget(QLabel("فاصله (ms):"))
+        self.burst_interval_spin = QSpinBox()
+        self.burst_interval_spin.setRange(0, 10000)
+        self.burst_interval_spin.setSingleStep(50)
+        self.burst_interval_spin.setValue(0)
+        burst_layout.addWidget(self.burst_interval_spin)
+        photo_layout.addLayout(burst_layout)
+        
+        # عکس خودکار فقط هنگام حرکت (به جای عکس زمان‌بندی شده)
+        self.motion_checkbox = QCheckBox("عکس خودکار هنگام حرکت")
+        self.motion_checkbox.setChecked(self.settings["motion_detection"])
+        self.motion_checkbox.toggled.connect(self.set_motion_detection)
+        photo_layout.addWidget(self.motion_checkbox)
+        
+        self.overlay_checkbox = QCheckBox("نمایش IP، FPS و نواحی حرکت روی تصویر")
+        self.overlay_checkbox.setChecked(self.settings["info_overlay"])
+        self.overlay_checkbox.toggled.connect(self.set_info_overlay)
+        photo_layout.addWidget(self.overlay_checkbox)
+        
         photo_group.setLayout(photo_layout)
         layout.addWidget(photo_group)
         
@@ -259,17 +773,38 @@ class CameraGUI(QMainWindow):
         extra_group = QGroupBox("⚙️ عملیات")
         extra_layout = QVBoxLayout()
         
+        # نرخ خروجی؛ فریم‌های اضافه دیکد نمی‌شوند
+        fps_layout = QHBoxLayout()
+        fps_layout.addWidget(QLabel("FPS هدف (0 = همه):"))
+        # نرخ اعشاری (مثلاً 12.5) هم در تنظیمات مجاز است
+        self.target_fps_spin = QDoubleSpinBox()
+        self.target_fps_spin.setDecimals(1)
+        self.target_fps_spin.setRange(0, 60)
+        self.target_fps_spin.setValue(self.target_fps)
+        self.target_fps_spin.valueChanged.connect(self.set_target_fps)
+        fps_layout.addWidget(self.target_fps_spin)
+        extra_layout.addLayout(fps_layout)
+        
         self.test_btn = QPushButton("🔍 تست اتصال")
         self.test_btn.clicked.connect(self.test_connection)
         
         self.save_settings_btn = QPushButton("💾 ذخیره تنظیمات")
         self.save_settings_btn.clicked.connect(self.save_settings)
         
+        self.record_btn = QPushButton("⏺️ شروع ضبط")
+        self.record_btn.setCheckable(True)
+        self.record_btn.toggled.connect(self.toggle_recording)
+        
+        self.export_metrics_btn = QPushButton("📊 خروجی متریک‌ها")
+        self.export_metrics_btn.clicked.connect(self.export_metrics)
+        
         self.about_btn = QPushButton("ℹ️ درباره برنامه")
         self.about_btn.clicked.connect(self.show_about)
         
         extra_layout.addWidget(self.test_btn)
         extra_layout.addWidget(self.save_settings_btn)
+        extra_layout.addWidget(self.record_btn)
+        extra_layout.addWidget(self.export_metrics_btn)
         extra_layout.addWidget(self.about_btn)
         
         extra_group.setLayout(extra_layout)
@@ -279,7 +814,10 @@ class CameraGUI(QMainWindow):
         log_group = QGroupBox("📝 لاگ رویدادها")
         log_layout = QVBoxLayout()
         
-        self.log_text = QTextEdit()
+        self.log_text = QPlainTextEdit()
+        self.log_text.setReadOnly(True)
+        # حذف خطوط قدیمی توسط خود Qt، بدون جابه‌جایی cursor برای هر پیام
+        self.log_text.setMaximumBlockCount(200)
         self.log_text.setMaximumHeight(150)
         self.log_text.setStyleSheet("background-color: #2b2b2b; color: #00ff00; font-family: Consolas;")
         
@@ -332,38 +870,48 @@ class CameraGUI(QMainWindow):
             }
         """)
     
-    def log_message(self, message):
-        """اضافه کردن پیام به لاگ"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        self.log_text.append(log_entry)
+    def log_message(self, message, level="info", key=None):
+        """
+        اضافه کردن پیام به لاگ (از هر thread)
         
-        # نگه داشتن حداکثر 100 خط
-        if self.log_text.document().blockCount() > 100:
-            cursor = self.log_text.textCursor()
-            cursor.movePosition(cursor.Start)
-            cursor.movePosition(cursor.Down, cursor.KeepAnchor)
-            cursor.removeSelectedText()
+        پیام‌های تکراری با همان کلید در هر 5 ثانیه حداکثر 3 بار نمایش داده
+        می‌شوند و بقیه در یک خط خلاصه جمع می‌شوند.
+        
+        Args:
+            message (str): متن پیام
+            level (str): سطح ("info"، "warning" یا "error")
+            key (str): کلید محدودیت نرخ (پیش‌فرض متن پیام بدون اعداد)
+        """
+        self.event_log.log(message, level, key)
+    
+    def flush_log(self):
+        """افزودن دسته‌ای پیام‌های جدید به پنل لاگ"""
+        entries = self.event_log.drain()
+        if entries:
+            self.log_text.appendPlainText("\n".join(entry.format() for entry in entries))
     
     def auto_start_streaming(self):
         """شروع خودکار استریم هنگام راه‌اندازی برنامه"""
         self.log_message("شروع خودکار استریم...")
         self.start_streaming()
         
-        # اگر اتصال برقرار نشد، هر 10 ثانیه دوباره سعی کن
+        # اتصال مجدد را نگهبان داخل thread انجام می‌دهد؛ این تایمر فقط thread متوقف شده را دوباره می‌سازد
         self.retry_timer = QTimer()
         self.retry_timer.timeout.connect(self.retry_connection)
         self.retry_timer.start(10000)  # هر 10 ثانیه
     
     def retry_connection(self):
-        """تلاش مجدد برای اتصال"""
-        if not self.is_streaming:
-            self.log_message("تلاش مجدد برای اتصال...")
-            self.start_streaming()
-        else:
-            # اگر استریم فعال است، تایمر را متوقف کن
-            if hasattr(self, 'retry_timer'):
-                self.retry_timer.stop()
+        """ساخت دوباره thread استریم اگر به هر دلیلی متوقف شده باشد"""
+        # is_streaming از لحظه درخواست True است، پس وضعیت واقعی thread بررسی می‌شود
+        if self.stream_thread is not None and self.stream_thread.isRunning():
+            return
+        
+        self.log_message("تلاش مجدد برای اتصال...")
+        if self.stream_thread is not None:
+            self.stream_thread.stop_stream()
+            self.stream_thread = None
+        self.is_streaming = False
+        self.start_streaming()
     
     def start_streaming(self):
         """شروع استریم"""
@@ -374,26 +922,59 @@ class CameraGUI(QMainWindow):
         self.status_bar.showMessage("در حال اتصال...")
         
         # ایجاد thread استریم
-        self.stream_thread = CameraStream(self.camera_ip, self.username, self.password)
-        self.stream_thread.frame_ready.connect(self.update_frame)
+        self.stream_thread = CameraStream(
+            self.camera_ip, self.username, self.password,
+            model=self.camera_model, stream_cache=self.stream_cache,
+            frame_buffer=self.frame_buffer, backend=self.stream_backend,
+            target_fps=self.target_fps or None, subtype=1 if self.dual_stream else 0
+        )
+        self.stream_thread.renderer.set_target_size(
+            self.video_label.width(), self.video_label.height()
+        )
+        self.stream_thread.image_ready.connect(self.update_frame)
         self.stream_thread.connection_status.connect(self.handle_connection_status)
+        self.stream_thread.motion_detected.connect(self.handle_motion)
+        self.stream_thread.burst_captured.connect(self.handle_burst_captured)
+        self.stream_thread.set_motion_detection(self.motion_checkbox.isChecked())
+        self.stream_thread.renderer.set_info_overlay(self.overlay_checkbox.isChecked())
         
         # شروع استریم
         self.stream_thread.start_stream()
         
         # فعال کردن دکمه عکس‌گیری
         self.snapshot_btn.setEnabled(True)
+        self.burst_btn.setEnabled(True)
         
         self.is_streaming = True
         self.frame_count = 0
         self.start_time = time.time()
     
+    def set_target_fps(self, value):
+        """تغییر نرخ خروجی استریم در حال اجرا"""
+        self.target_fps = value
+        if self.stream_thread is not None:
+            self.stream_thread.pacer.target_fps = value or None
+        self.log_message(f"FPS هدف: {f'{value:g}' if value else 'همه فریم‌ها'}")
+    
+    def set_motion_detection(self, enabled):
+        """فعال یا غیرفعال کردن عکس خودکار با حرکت"""
+        if self.stream_thread is not None:
+            self.stream_thread.set_motion_detection(enabled)
+        self.log_message(f"تشخیص حرکت {'فعال' if enabled else 'غیرفعال'} شد")
+    
+    def set_info_overlay(self, enabled):
+        """نمایش یا پنهان کردن اطلاعات روی تصویر"""
+        if self.stream_thread is not None:
+            self.stream_thread.renderer.set_info_overlay(enabled)
+    
     def stop_streaming(self):
         """توقف استریم - فقط برای بستن برنامه"""
         if not self.is_streaming:
             return
         
         self.log_message("توقف استریم...")
+        if hasattr(self, 'retry_timer'):
+            self.retry_timer.stop()
         
         if self.stream_thread:
             self.stream_thread.stop_stream()
@@ -401,40 +982,47 @@ class CameraGUI(QMainWindow):
         
         # غیرفعال کردن دکمه عکس‌گیری
         self.snapshot_btn.setEnabled(False)
+        self.burst_btn.setEnabled(False)
         
         self.is_streaming = False
         self.status_label.setText("❌ قطع")
     
-    def update_frame(self, frame):
-        """به‌روزرسانی فریم نمایش"""
+    def update_frame(self):
+        """نمایش آخرین تصویر آماده شده توسط thread استریم"""
         try:
-            self.current_frame = frame.copy()
-            self.frame_count += 1
+            if self.stream_thread is None:
+                return
             
-            # اضافه کردن timestamp
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cv2.putText(frame, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            renderer = self.stream_thread.renderer
+            pending = renderer.take()
+            if pending is None:
+                return
             
-            # تبدیل BGR به RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            frame, qt_image, rgb_frame, render_ms, signaled_at = pending
+            # ارجاع گرفته شده در render به current_frame منتقل می‌شود
+            previous, self.current_frame = self.current_frame, frame
+            if previous is not None:
+                previous.release()
+            self.frame_count += 1
             
-            # ایجاد QImage
-            h, w, ch = rgb_frame.shape
-            bytes_per_line = ch * w
-            qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
+            paint_start = time.perf_counter()
+            self.stream_thread.signal_hist.observe((paint_start - signaled_at) * 1000)
+            self.video_label.setPixmap(QPixmap.fromImage(qt_image))
+            # QPixmap داده‌ها را کپی کرده است
+            renderer.pool.release(rgb_frame)
+            self.stream_thread.paint_hist.observe((time.perf_counter() - paint_start) * 1000)
+            self.stream_thread.display_rate.mark()
             
-            # مقیاس‌بندی برای نمایش
-            pixmap = QPixmap.fromImage(qt_image)
-            scaled_pixmap = pixmap.scaled(
-                self.video_label.size(), 
-                Qt.KeepAspectRatio, 
-                Qt.SmoothTransformation
-            )
+            # تاخیر سرتاسری از دریافت تا نمایش
+            self.display_latency_ms = frame.age() * 1000
+            self.render_ms = render_ms
             
-            self.video_label.setPixmap(scaled_pixmap)
+            # اندازه نمایش برای فریم‌های بعدی
+            label_size = self.video_label.size()
+            renderer.set_target_size(label_size.width(), label_size.height())
             
         except Exception as e:
-            self.log_message(f"خطا در نمایش فریم: {str(e)}")
+            self.log_message(f"خطا در نمایش فریم: {str(e)}", level="error", key="update_frame")
     
     def handle_connection_status(self, connected, message):
         """مدیریت وضعیت اتصال"""
@@ -450,14 +1038,30 @@ class CameraGUI(QMainWindow):
     
     def take_snapshot(self):
         """گرفتن عکس"""
-        if self.current_frame is None:
+        seconds_before = self.seconds_before_spin.value()
+        # در حالت dual_stream عکس لحظه‌ای با وضوح کامل در پس‌زمینه گرفته می‌شود
+        full_res = self.dual_stream and seconds_before == 0
+        
+        if seconds_before > 0:
+            # فریم چند ثانیه قبل از بافر فریم‌های اخیر
+            frame = self.frame_buffer.get_frame_before(seconds_before)
+        elif self.current_frame is not None:
+            frame = self.current_frame.retain()
+        else:
+            frame = None
+        
+        if frame is None:
             QMessageBox.warning(self, "خطا", "هیچ فریمی برای ذخیره موجود نیست!")
             return
         
+        capture_time = datetime.now() if full_res else datetime.fromtimestamp(frame.wall_time)
+        
+        # ارجاع frame اینجا آزاد می‌شود مگر به ذخیره وضوح کامل سپرده شود
+        handed_off = False
         try:
             # تعیین نام فایل
             if self.auto_naming.isChecked():
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                timestamp = capture_time.strftime("%Y%m%d_%H%M%S")
                 filename = f"snapshots/gui_capture_{timestamp}.jpg"
             else:
                 filename, _ = QFileDialog.getSaveFileName(
@@ -466,21 +1070,211 @@ class CameraGUI(QMainWindow):
                 if not filename:
                     return
             
-            # ایجاد پوشه در صورت نیاز
-            import os
-            os.makedirs("snapshots", exist_ok=True)
-            
-            # ذخیره عکس
+            # ذخیره عکس در پس‌زمینه
             quality = self.quality_slider.value()
-            cv2.imwrite(filename, self.current_frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if full_res:
+                self.full_res_executor.submit(self._save_full_res_snapshot, frame, filename, quality)
+                handed_off = True
+                return
             
-            self.log_message(f"عکس ذخیره شد: {filename}")
-            QMessageBox.information(self, "موفقیت", f"عکس با موفقیت ذخیره شد:\n{filename}")
+            future = self.snapshot_writer.submit(
+                frame, filename, quality=quality,
+                callback=self._on_snapshot_done
+            )
+            
+            if future is None:
+                stats = self.snapshot_writer.get_stats()
+                self.log_message(f"⚠️ صف ذخیره پر است ({stats['queue_depth']}/{stats['queue_capacity']})، عکس رد شد")
+                self.status_bar.showMessage("صف ذخیره عکس پر است", 3000)
             
         except Exception as e:
             error_msg = f"خطا در ذخیره عکس: {str(e)}"
             self.log_message(error_msg)
             QMessageBox.critical(self, "خطا", error_msg)
+        finally:
+            if not handed_off:
+                frame.release()
+    
+    def handle_motion(self, event):
+        """ذخیره عکس خودکار در شروع هر رویداد حرکت"""
+        self.log_message(f"🏃 حرکت تشخیص داده شد ({', '.join(event['zones'])}، {event['score'] * 100:.1f}%)")
+        frame = event["frame"]
+        if frame is None:
+            return
+        
+        filename = burst_filename("snapshots", "auto", event["wall_time"], event["index"])
+        quality = self.quality_slider.value()
+        if self.dual_stream:
+            # ارجاع رویداد به ذخیره وضوح کامل سپرده می‌شود
+            self.full_res_executor.submit(self._save_full_res_snapshot, frame, filename, quality)
+            return
+        
+        future = self.snapshot_writer.submit(
+            frame, filename, quality=quality,
+            callback=self._on_snapshot_done
+        )
+        frame.release()
+        if future is None:
+            stats = self.snapshot_writer.get_stats()
+            self.log_message(f"⚠️ صف ذخیره پر است ({stats['queue_depth']}/{stats['queue_capacity']})، عکس رد شد")
+    
+    def take_burst(self):
+        """گرفتن سری عکس با فاصله دقیق؛ encode و نوشتن به صورت موازی"""
+        count = self.burst_count_spin.value()
+        interval = self.burst_interval_spin.value() / 1000 or None
+        seconds_before = self.seconds_before_spin.value()
+        quality = self.quality_slider.value()
+        
+        spacing = f"هر {interval * 1000:.0f}ms" if interval else "همه فریم‌ها"
+        self.log_message(f"🎞️ شروع سری {count} عکس ({spacing})")
+        self.burst_btn.setEnabled(False)
+        
+        if seconds_before > 0:
+            # سری از بافر فریم‌های اخیر
+            burst = BurstCapture(
+                self.snapshot_writer, count, interval=interval, quality=quality,
+                camera_id=self.camera_ip, source="buffer"
+            )
+            self.full_res_executor.submit(self._run_buffer_burst, burst, seconds_before)
+        elif self.dual_stream:
+            # وضوح کامل از استریم اصلی
+            self.full_res_executor.submit(self._run_full_res_burst, count, interval, quality)
+        elif self.stream_thread is not None:
+            self.stream_thread.start_burst(BurstCapture(
+                self.snapshot_writer, count, interval=interval, quality=quality,
+                camera_id=self.camera_ip
+            ))
+        else:
+            self.burst_btn.setEnabled(True)
+    
+    def _run_buffer_burst(self, burst, seconds_before):
+        """جمع‌آوری سری از بافر فریم‌های اخیر (روی thread پس‌زمینه)"""
+        for frame in self.frame_buffer.get_frames(time.time() - seconds_before):
+            # سری ارجاع خودش را می‌گیرد؛ فریم‌های اضافه هم باید آزاد شوند
+            burst.offer(frame)
+            frame.release()
+        self.burst_saved.emit(burst.finish(timeout=10.0))
+    
+    def _run_full_res_burst(self, count, interval, quality):
+        """سری عکس از استریم اصلی با وضوح کامل (روی thread پس‌زمینه)"""
+        try:
+            summary = self._get_main_source().capture_burst(count, interval=interval, quality=quality)
+        except Exception as e:
+            self.status_message.emit(f"خطا در سری عکس: {str(e)}")
+            summary = None
+        self.burst_saved.emit(summary)
+    
+    def handle_burst_captured(self, burst):
+        """جمع‌آوری سری تمام شد؛ انتظار برای ذخیره و نوشتن متادیتا خارج از thread رابط کاربری"""
+        self.full_res_executor.submit(lambda: self.burst_saved.emit(burst.finish(timeout=10.0)))
+    
+    def handle_burst_saved(self, summary):
+        """نمایش نتیجه سری عکس"""
+        self.burst_btn.setEnabled(self.is_streaming)
+        if summary is None:
+            self.log_message("❌ سری عکس ناموفق بود")
+            return
+        
+        gap = f"، فاصله میانگین {summary['mean_gap_ms']:.0f}ms" if summary["mean_gap_ms"] is not None else ""
+        self.log_message(
+            f"✅ سری {summary['saved']}/{summary['requested_count']} عکس در "
+            f"{summary['span_ms'] / 1000:.2f} ثانیه{gap}: {summary.get('metadata', '-')}"
+        )
+        if summary["frames_dropped"]:
+            self.log_message(f"⚠️ {summary['frames_dropped']} فریم سری به دلیل پر بودن صف ذخیره رد شد", level="warning")
+        self.status_bar.showMessage(f"سری عکس ذخیره شد ({summary['saved']} عکس)", 3000)
+    
+    def toggle_recording(self, checked):
+        """شروع یا توقف ضبط مداوم (اتصال و ضبط روی thread پس‌زمینه)"""
+        self.record_btn.setEnabled(False)
+        if checked:
+            self.log_message("⏺️ شروع ضبط...")
+            self.full_res_executor.submit(self._start_recording)
+        else:
+            self.full_res_executor.submit(self._stop_recording)
+    
+    def _start_recording(self):
+        """شروع ضبط از استریم اصلی با سهمیه دیسک"""
+        try:
+            ok = self._get_main_source().start_recording(
+                segment_seconds=self.record_segment_seconds,
+                quota_bytes=self.record_quota_bytes,
+                on_delete=self._on_retention_delete
+            )
+        except Exception as e:
+            self.status_message.emit(f"خطا در شروع ضبط: {str(e)}")
+            ok = False
+        self.recording_changed.emit(ok)
+    
+    def _on_retention_delete(self, path, size):
+        """ثبت هر فایل حذف شده توسط سهمیه دیسک در لاگ (از thread پاکسازی)"""
+        self.log_message(f"🧹 فایل قدیمی حذف شد: {path} ({size / (1024 * 1024):.1f} MB)", key="retention")
+    
+    def _stop_recording(self):
+        """توقف ضبط"""
+        if self.main_source is not None:
+            self.main_source.stop_recording()
+        self.recording_changed.emit(False)
+    
+    def handle_recording_changed(self, recording):
+        """به‌روزرسانی دکمه ضبط"""
+        self.record_btn.blockSignals(True)
+        self.record_btn.setChecked(recording)
+        self.record_btn.blockSignals(False)
+        self.record_btn.setEnabled(True)
+        self.record_btn.setText("⏹️ توقف ضبط" if recording else "⏺️ شروع ضبط")
+        self.log_message("⏺️ ضبط فعال است" if recording else "⏹️ ضبط متوقف است")
+    
+    def _get_main_source(self):
+        """کنترل کننده‌ای که فقط برای عکس وضوح کامل (CGI عکس یا استریم اصلی) استفاده می‌شود"""
+        if self.main_source is None:
+            self.main_source = CameraController(
+                self.camera_ip, self.username, self.password,
+                stream_cache=self.stream_cache, dual_stream=True
+            )
+        return self.main_source
+    
+    def _save_full_res_snapshot(self, preview_frame, filename, quality):
+        """گرفتن فریم وضوح کامل و سپردن آن به صف ذخیره (روی thread پس‌زمینه)؛ ارجاع preview_frame آزاد می‌شود"""
+        try:
+            frame = self._get_main_source().get_full_frame(timeout=5.0)
+        except Exception as e:
+            self.status_message.emit(f"خطا در دریافت فریم وضوح کامل: {str(e)}")
+            frame = None
+        
+        if frame is None:
+            self.status_message.emit("⚠️ فریم وضوح کامل در دسترس نیست، فریم پیش‌نمایش ذخیره می‌شود")
+            frame = preview_frame.retain()
+        
+        future = self.snapshot_writer.submit(
+            frame, filename, quality=quality,
+            callback=self._on_snapshot_done
+        )
+        frame.release()
+        preview_frame.release()
+        if future is None:
+            stats = self.snapshot_writer.get_stats()
+            self.status_message.emit(f"⚠️ صف ذخیره پر است ({stats['queue_depth']}/{stats['queue_capacity']})، عکس رد شد")
+    
+    def _on_snapshot_done(self, future):
+        """پایان ذخیره عکس (روی thread worker)؛ انتقال نتیجه به thread رابط کاربری"""
+        self.snapshot_saved.emit(future)
+    
+    def handle_snapshot_saved(self, future):
+        """نمایش نتیجه ذخیره عکس"""
+        error = future.exception()
+        if error is not None:
+            error_msg = f"خطا در ذخیره عکس: {str(error)}"
+            self.log_message(error_msg)
+            QMessageBox.critical(self, "خطا", error_msg)
+            return
+        
+        result = future.result()
+        self.log_message(
+            f"عکس ذخیره شد: {result['path']} "
+            f"(صف {result['queue_ms']:.0f}ms، encode {result['encode_ms']:.0f}ms، نوشتن {result['write_ms']:.0f}ms)"
+        )
+        self.status_bar.showMessage(f"عکس ذخیره شد: {result['path']}", 3000)
     
     def test_connection(self):
         """تست اتصال به دوربین"""
@@ -504,24 +1298,48 @@ class CameraGUI(QMainWindow):
         self.test_btn.setEnabled(True)
     
     def save_settings(self):
-        """ذخیره تنظیمات"""
+        """ذخیره تنظیمات (رمز عبور ذخیره شده در فایل دست نمی‌خورد)"""
         settings = {
             'camera_ip': self.camera_ip,
             'username': self.username,
+            'camera_model': self.camera_model,
+            'stream_backend': self.stream_backend,
+            'target_fps': self.target_fps,
+            'dual_stream': self.dual_stream,
             'quality': self.quality_slider.value(),
-            'auto_naming': self.auto_naming.isChecked()
+            'auto_naming': self.auto_naming.isChecked(),
+            'motion_detection': self.motion_checkbox.isChecked(),
+            'info_overlay': self.overlay_checkbox.isChecked()
         }
         
-        try:
-            import json
-            with open('camera_settings.json', 'w', encoding='utf-8') as f:
-                json.dump(settings, f, ensure_ascii=False, indent=2)
-            
+        if save_settings(settings):
+            self.settings.update(settings)
             self.log_message("تنظیمات ذخیره شد")
             QMessageBox.information(self, "موفقیت", "تنظیمات با موفقیت ذخیره شد!")
-            
+        else:
+            error_msg = "خطا در ذخیره تنظیمات"
+            self.log_message(error_msg)
+            QMessageBox.critical(self, "خطا", error_msg)
+    
+    def export_metrics(self):
+        """ذخیره متریک‌های عملکرد به صورت JSON یا متن Prometheus"""
+        filename, _ = QFileDialog.getSaveFileName(
+            self, "خروجی متریک‌ها", "metrics.json",
+            "JSON files (*.json);;Prometheus text (*.prom *.txt)"
+        )
+        if not filename:
+            return
+        
+        try:
+            if filename.lower().endswith(".json"):
+                content = metrics.to_json()
+            else:
+                content = metrics.to_prometheus()
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(content)
+            self.log_message(f"متریک‌ها ذخیره شد: {filename}")
         except Exception as e:
-            error_msg = f"خطا در ذخیره تنظیمات: {str(e)}"
+            error_msg = f"خطا در ذخیره متریک‌ها: {str(e)}"
             self.log_message(error_msg)
             QMessageBox.critical(self, "خطا", error_msg)
     
@@ -546,16 +1364,68 @@ class CameraGUI(QMainWindow):
     
     def update_info(self):
         """به‌روزرسانی اطلاعات"""
-        if self.is_streaming and self.frame_count > 0:
-            elapsed_time = time.time() - self.start_time
-            fps = self.frame_count / elapsed_time if elapsed_time > 0 else 0
-            self.fps_label.setText(f"{fps:.1f}")
+        if self.is_streaming and self.frame_count > 0 and self.stream_thread is not None:
+            # نرخ‌ها در پنجره چند ثانیه اخیر؛ افت ناگهانی دیده می‌شود
+            pacer = self.stream_thread.pacer
+            fps = self.stream_thread.display_rate.rate()
+            self.fps_label.setText(f"{pacer.input_fps:.1f} / {pacer.output_fps:.1f} (نمایش {fps:.1f})")
             self.frame_label.setText(str(self.frame_count))
+        
+        if self.display_latency_ms is not None:
+            self.latency_label.setText(f"{self.display_latency_ms:.0f} ms (آماده‌سازی {self.render_ms:.1f} ms)")
+        
+        if self.stream_thread is not None:
+            self.skipped_label.setText(str(self.stream_thread.renderer.skipped))
+            
+            # مصرف CPU دیکد هر استریم (درصد یک هسته)
+            preview = "زیر" if self.stream_thread.subtype else "اصلی"
+            cpu_text = f"{preview}: {self.stream_thread.get_decode_cpu_percent():.0f}%"
+            main_grabber = self.main_source.main_grabber if self.main_source is not None else None
+            if main_grabber is not None:
+                cpu_text += f" | اصلی: {main_grabber.get_stats()['cpu_percent']:.0f}%"
+            elif self.dual_stream:
+                cpu_text += " | اصلی: بسته"
+            self.decode_cpu_label.setText(cpu_text)
+            
+            supervisor = self.stream_thread.get_supervisor_stats()
+            if supervisor is not None:
+                text = str(supervisor["reconnects"])
+                if supervisor["current_outage_seconds"] is not None:
+                    text += f" (قطع از {supervisor['current_outage_seconds']:.0f} ثانیه قبل)"
+                elif supervisor["last_recovery_seconds"] is not None:
+                    text += f" (آخرین بازیابی {supervisor['last_recovery_seconds']:.1f} ثانیه)"
+                self.reconnect_label.setText(text)
+            
+            detector = self.stream_thread.motion_detector
+            if detector is not None:
+                state = "در جریان" if detector.in_motion else "آرام"
+                detect_ms = detector.get_stats()["detect_ms"]["p50_ms"]
+                timing = f"، {detect_ms:.2f} ms" if detect_ms is not None else ""
+                self.motion_label.setText(f"{state} ({detector.events} رویداد{timing})")
+            else:
+                self.motion_label.setText("-")
+            
+            # تخصیص آرایه جدید در ثانیه؛ در حالت پایدار باید نزدیک صفر باشد
+            frames = self.stream_thread.buffer_pool.get_stats()
+            display = self.stream_thread.renderer.pool.get_stats()
+            self.allocation_label.setText(
+                f"{frames['allocations_per_second']:.1f}/s دیکد | {display['allocations_per_second']:.1f}/s نمایش"
+            )
+        
+        stats = self.snapshot_writer.get_stats()
+        self.writer_queue_label.setText(f"{stats['queue_depth']}/{stats['queue_capacity']}")
     
     def closeEvent(self, event):
         """رویداد بستن برنامه"""
         if self.is_streaming:
             self.stop_streaming()
+        self.full_res_executor.shutdown(wait=True)
+        if self.main_source is not None:
+            self.main_source.close_camera()
+        self.snapshot_writer.shutdown(wait=True)
+        self.frame_buffer.close()
+        self.log_timer.stop()
+        self.event_log.close()
         event.accept()
 
 
@@ -0,0 +1,314 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from camera_controller import CameraController
+from stream_cache import StreamCache
+
+
+class PooledCamera:
+    """
+    وضعیت و سلامت یک دوربین داخل CameraPool
+    """
+
+    def __init__(self, camera_id, controller):
+        self.camera_id = camera_id
+        self.controller = controller
+        self.state = "idle"  # idle, connecting, connected, failed, closed
+        self.busy = False
+        self.last_frame_time = None
+        self.last_capture_ms = None
+        self.captures_ok = 0
+        self.captures_failed = 0
+        self.timeouts = 0
+        self.skipped_busy = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+
+    def get_health(self):
+        """
+        خلاصه سلامت دوربین
+
+        Returns:
+            dict: وضعیت، زمان آخرین فریم و شمارنده‌ها
+        """
+        age = time.time() - self.last_frame_time if self.last_frame_time else None
+        detector = getattr(self.controller, "motion_detector", None)
+        return {
+            "state": self.state,
+            "busy": self.busy,
+            "last_frame_age": age,
+            "last_capture_ms": self.last_capture_ms,
+            "captures_ok": self.captures_ok,
+            "captures_failed": self.captures_failed,
+            "timeouts": self.timeouts,
+            "skipped_busy": self.skipped_busy,
+            "consecutive_failures": self.consecutive_failures,
+            "in_motion": detector.in_motion if detector is not None else None,
+            "last_error": self.last_error
+        }
+
+
+class CameraPool:
+    """
+    مدیریت تعداد زیادی CameraController با یک مجموعه thread محدود
+
+    همه عملیات شبکه و خواندن فریم روی یک ThreadPoolExecutor با اندازه ثابت
+    اجرا می‌شود، پس تعداد thread ها با افزایش دوربین‌ها رشد نمی‌کند. دوربینی
+    که خواندن قبلی آن هنوز تمام نشده در دور بعد رد می‌شود تا بقیه را معطل نکند.
+    """
+
+    def __init__(self, max_workers=8, controller_factory=CameraController, stream_cache=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            max_workers (int): حداکثر تعداد thread های کاری
+            controller_factory (callable): سازنده کنترل کننده هر دوربین
+            stream_cache (StreamCache): کش آدرس استریم مشترک همه دوربین‌ها (پیش‌فرض stream_cache.json)
+        """
+        self.max_workers = max_workers
+        self.controller_factory = controller_factory
+        self.stream_cache = stream_cache if stream_cache is not None else StreamCache()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="camera-pool")
+        self.cameras = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def add_camera(self, camera_id, ip_address, username, password, port=80, **kwargs):
+        """
+        اضافه کردن یک دوربین به pool
+
+        Args:
+            camera_id (str): شناسه یکتای دوربین
+            ip_address (str): آدرس IP دوربین
+            username (str): نام کاربری
+            password (str): رمز عبور
+            port (int): پورت اتصال
+            **kwargs: پارامترهای اضافی CameraController (stream_cache پیش‌فرض کش مشترک pool است)
+
+        Returns:
+            CameraController: کنترل کننده ساخته شده
+        """
+        kwargs.setdefault("stream_cache", self.stream_cache)
+        controller = self.controller_factory(ip_address, username, password, port=port, **kwargs)
+        with self._lock:
+            if camera_id in self.cameras:
+                raise ValueError(f"دوربین تکراری: {camera_id}")
+            self.cameras[camera_id] = PooledCamera(camera_id, controller)
+        return controller
+
+    def remove_camera(self, camera_id):
+        """
+        حذف و بستن یک دوربین
+
+        Args:
+            camera_id (str): شناسه دوربین
+        """
+        with self._lock:
+            camera = self.cameras.pop(camera_id, None)
+        if camera is not None:
+            self.executor.submit(self._close_one, camera)
+
+    def _open_one(self, camera):
+        """باز کردن یک دوربین روی thread کاری"""
+        camera.state = "connecting"
+        try:
+            ok = camera.controller.open_camera()
+        except Exception as e:
+            camera.last_error = str(e)
+            ok = False
+
+        camera.state = "connected" if ok else "failed"
+        if not ok:
+            camera.consecutive_failures += 1
+        return ok
+
+    def _close_one(self, camera):
+        """بستن یک دوربین روی thread کاری"""
+        try:
+            camera.controller.close_camera()
+        finally:
+            camera.state = "closed"
+
+    def _capture_one(self, camera):
+        """خواندن یک فریم روی thread کاری"""
+        started = time.perf_counter()
+        try:
+            frame = camera.controller.read_frame()
+        except Exception as e:
+            camera.last_error = str(e)
+            frame = None
+        finally:
+            camera.busy = False
+
+        camera.last_capture_ms = (time.perf_counter() - started) * 1000
+        if frame is not None:
+            camera.captures_ok += 1
+            camera.consecutive_failures = 0
+            camera.last_frame_time = time.time()
+        else:
+            camera.captures_failed += 1
+            camera.consecutive_failures += 1
+        return frame
+
+    def _snapshot(self, camera_ids=None):
+        """کپی از فهرست دوربین‌ها برای پیمایش بدون قفل"""
+        with self._lock:
+            if camera_ids is None:
+                return list(self.cameras.values())
+            return [self.cameras[cid] for cid in camera_ids if cid in self.cameras]
+
+    def open_all(self, timeout=None, camera_ids=None):
+        """
+        باز کردن همه دوربین‌ها به صورت موازی
+
+        Args:
+            timeout (float): حداکثر زمان انتظار (None یعنی تا پایان همه)
+            camera_ids (list): فقط این دوربین‌ها (اختیاری)
+
+        Returns:
+            dict: {camera_id: True/False}؛ دوربین‌هایی که تا پایان مهلت باز نشوند False هستند
+        """
+        cameras = [c for c in self._snapshot(camera_ids) if c.state != "connecting"]
+        futures = {self.executor.submit(self._open_one, c): c for c in cameras}
+        done, _ = wait(futures, timeout=timeout)
+
+        results = {}
+        for future, camera in futures.items():
+            results[camera.camera_id] = future in done and future.result()
+        return results
+
+    def close_all(self, timeout=None):
+        """
+        بستن همه دوربین‌ها
+
+        Args:
+            timeout (float): حداکثر زمان انتظار
+        """
+        futures = [self.executor.submit(self._close_one, c) for c in self._snapshot()]
+        wait(futures, timeout=timeout)
+
+    def capture_all(self, timeout=1.0, camera_ids=None):
+        """
+        گرفتن فریم از همه دوربین‌های متصل با یک مهلت مشترک
+
+        Args:
+            timeout (float): مهلت کل بر حسب ثانیه
+            camera_ids (list): فقط این دوربین‌ها (اختیاری)
+
+        Returns:
+            dict: {camera_id: Frame یا None}
+        """
+        results = {}
+        futures = {}
+
+        for camera in self._snapshot(camera_ids):
+            if camera.state != "connected":
+                results[camera.camera_id] = None
+                continue
+            if camera.busy:
+                # خواندن قبلی هنوز تمام نشده؛ دوربین کند بقیه را معطل نمی‌کند
+                camera.skipped_busy += 1
+                results[camera.camera_id] = None
+                continue
+            camera.busy = True
+            futures[self.executor.submit(self._capture_one, camera)] = camera
+
+        done, not_done = wait(futures, timeout=timeout)
+
+        for future in done:
+            results[futures[future].camera_id] = future.result()
+        for future in not_done:
+            camera = futures[future]
+            camera.timeouts += 1
+            results[camera.camera_id] = None
+
+        return results
+
+    def enable_motion_detection(self, camera_ids=None, **kwargs):
+        """
+        فعال کردن تشخیص حرکت روی همه دوربین‌ها
+
+        تشخیص روی نسخه کوچک هر فریم انجام می‌شود و هزینه آن در هر خواندن
+        کمتر از یک میلی‌ثانیه است؛ capture_all یا grabber هر دوربین آن را اجرا می‌کند.
+
+        Args:
+            camera_ids (list): فقط این دوربین‌ها (اختیاری)
+            **kwargs: پارامترهای CameraController.enable_motion_detection
+
+        Returns:
+            dict: {camera_id: MotionDetector}
+        """
+        return {
+            camera.camera_id: camera.controller.enable_motion_detection(**kwargs)
+            for camera in self._snapshot(camera_ids)
+        }
+
+    def _fetch_still_one(self, camera):
+        """دریافت عکس HTTP یک دوربین روی thread کاری"""
+        try:
+            return camera.controller.fetch_snapshot_jpeg()
+        except Exception as e:
+            camera.last_error = str(e)
+            return None
+
+    def fetch_stills_all(self, timeout=5.0, camera_ids=None):
+        """
+        دریافت عکس JPEG مستقیم از CGI همه دوربین‌ها (بدون باز بودن استریم)
+
+        Args:
+            timeout (float): مهلت کل بر حسب ثانیه
+            camera_ids (list): فقط این دوربین‌ها (اختیاری)
+
+        Returns:
+            dict: {camera_id: بایت‌های JPEG یا None}
+        """
+        futures = {self.executor.submit(self._fetch_still_one, c): c for c in self._snapshot(camera_ids)}
+        done, _ = wait(futures, timeout=timeout)
+
+        return {
+            camera.camera_id: future.result() if future in done else None
+            for future, camera in futures.items()
+        }
+
+    def get_state(self, camera_id):
+        """
+        وضعیت یک دوربین
+
+        Returns:
+            str: idle, connecting, connected, failed یا closed
+        """
+        with self._lock:
+            camera = self.cameras.get(camera_id)
+        return camera.state if camera is not None else None
+
+    def get_health(self):
+        """
+        سلامت همه دوربین‌ها
+
+        Returns:
+            dict: {camera_id: health}
+        """
+        return {c.camera_id: c.get_health() for c in self._snapshot()}
+
+    def get_controller(self, camera_id):
+        """کنترل کننده یک دوربین"""
+        with self._lock:
+            camera = self.cameras.get(camera_id)
+        return camera.controller if camera is not None else None
+
+    def shutdown(self, timeout=None):
+        """
+        بستن همه دوربین‌ها و thread های کاری
+
+        Args:
+            timeout (float): حداکثر زمان انتظار برای بستن دوربین‌ها
+        """
+        self.close_all(timeout=timeout)
+        self.executor.shutdown(wait=False)
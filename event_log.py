@@ -0,0 +1,197 @@
+import collections
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueListener, RotatingFileHandler
+
+from metrics import metrics
+
+
+LEVELS = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+# اعداد متغیر (شماره تلاش، ثانیه، درصد) کلید پیام را عوض نمی‌کنند
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+class LogEntry:
+    """یک رویداد ثبت شده"""
+
+    __slots__ = ("wall_time", "level", "message", "key", "repeats")
+
+    def __init__(self, message, level="info", key=None, repeats=1, wall_time=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            message (str): متن پیام
+            level (str): سطح ("debug"، "info"، "warning" یا "error")
+            key (str): کلید محدودیت نرخ
+            repeats (int): تعداد تکرار جمع شده در این رویداد (برای خلاصه‌ها)
+            wall_time (float): زمان ثبت (پیش‌فرض اکنون)
+        """
+        self.wall_time = time.time() if wall_time is None else wall_time
+        self.level = level
+        self.message = message
+        self.key = key
+        self.repeats = repeats
+
+    def format(self):
+        """متن قابل نمایش با زمان"""
+        return f"[{datetime.fromtimestamp(self.wall_time).strftime('%H:%M:%S')}] {self.message}"
+
+
+class EventLog:
+    """
+    ثبت رویدادها با بافر حلقوی، محدودیت نرخ برای هر کلید و فایل چرخشی
+
+    از هر thread قابل صدا زدن است و هیچ کار رابط کاربری یا دیسکی روی
+    thread صدا زننده انجام نمی‌دهد. هر کلید پیام (پیش‌فرض متن پیام با
+    اعداد حذف شده) در هر پنجره window ثانیه حداکثر rate_limit بار ثبت
+    می‌شود؛ تکرارهای بیشتر شمرده و در پایان پنجره به صورت یک خط خلاصه
+    («×120 در 5 ثانیه اخیر») ثبت می‌شوند. رابط کاربری رویدادهای جدید را
+    با drain() به صورت دسته‌ای برمی‌دارد.
+    """
+
+    def __init__(self, capacity=500, window=5.0, rate_limit=3, file_path=None,
+                 max_file_bytes=1024 * 1024, backup_count=3, registry=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            capacity (int): تعداد رویدادهای نگه داشته شده در حافظه
+            window (float): طول پنجره محدودیت نرخ (ثانیه)
+            rate_limit (int): حداکثر ثبت هر کلید در هر پنجره
+            file_path (str): مسیر فایل لاگ (None یعنی بدون فایل)
+            max_file_bytes (int): حجم هر فایل قبل از چرخش
+            backup_count (int): تعداد فایل‌های قدیمی نگه داشته شده
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+        """
+        self.window = window
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._entries = collections.deque(maxlen=capacity)
+        self._pending = collections.deque(maxlen=capacity)
+        self._keys = {}
+        self.suppressed = 0
+
+        registry = registry if registry is not None else metrics
+        self._logged_counter = registry.counter("log_events")
+        self._suppressed_counter = registry.counter("log_suppressed")
+
+        self._file_queue = None
+        self._listener = None
+        if file_path:
+            handler = RotatingFileHandler(
+                file_path, maxBytes=max_file_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            # نوشتن فایل روی thread جداگانه؛ ثبت رویداد فقط یک put در صف است
+            self._file_queue = queue.Queue()
+            self._listener = QueueListener(self._file_queue, handler)
+            self._listener.start()
+
+    @staticmethod
+    def make_key(message):
+        """کلید پیش‌فرض یک پیام: متن با اعداد جایگزین شده"""
+        return _NUMBER_PATTERN.sub("#", message)
+
+    def log(self, message, level="info", key=None):
+        """
+        ثبت یک رویداد
+
+        Args:
+            message (str): متن پیام
+            level (str): سطح ("debug"، "info"، "warning" یا "error")
+            key (str): کلید محدودیت نرخ (پیش‌فرض متن پیام بدون اعداد)
+
+        Returns:
+            bool: False اگر به دلیل محدودیت نرخ فقط شمرده شده باشد
+        """
+        key = key if key is not None else self.make_key(message)
+        now = time.monotonic()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is None or now - state["started"] >= self.window:
+                if state is not None:
+                    self._summarize(key, state)
+                self._keys[key] = {"started": now, "count": 1, "suppressed": 0,
+                                   "message": message, "level": level}
+            else:
+                state["count"] += 1
+                if state["count"] > self.rate_limit:
+                    state["suppressed"] += 1
+                    state["message"] = message
+                    state["level"] = level
+                    self.suppressed += 1
+                    self._suppressed_counter.inc()
+                    return False
+            self._append(LogEntry(message, level, key))
+        return True
+
+    def _summarize(self, key, state):
+        """ثبت خط خلاصه تکرارهای رد شده یک پنجره (باید با قفل فراخوانی شود)"""
+        if state["suppressed"]:
+            message = f"{state['message']} (×{state['count']} در {self.window:g} ثانیه اخیر)"
+            self._append(LogEntry(message, state["level"], key, repeats=state["count"]))
+
+    def _append(self, entry):
+        """افزودن به بافر، صف رابط کاربری و فایل (باید با قفل فراخوانی شود)"""
+        self._entries.append(entry)
+        self._pending.append(entry)
+        self._logged_counter.inc()
+        if self._file_queue is not None:
+            self._file_queue.put(logging.makeLogRecord({
+                "msg": entry.message, "levelno": LEVELS.get(entry.level, logging.INFO),
+                "levelname": entry.level.upper(), "created": entry.wall_time
+            }))
+
+    def flush(self):
+        """ثبت خلاصه پنجره‌های تمام شده و حذف کلیدهای قدیمی"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, state in self._keys.items() if now - state["started"] >= self.window]
+            for key in expired:
+                self._summarize(key, self._keys.pop(key))
+
+    def drain(self):
+        """
+        برداشتن رویدادهای جدید از آخرین drain (برای به‌روزرسانی دسته‌ای رابط کاربری)
+
+        Returns:
+            list: LogEntry های جدید به ترتیب زمان
+        """
+        self.flush()
+        with self._lock:
+            entries = list(self._pending)
+            self._pending.clear()
+        return entries
+
+    def recent(self, count=None):
+        """
+        آخرین رویدادهای بافر
+
+        Args:
+            count (int): تعداد (None یعنی همه)
+
+        Returns:
+            list: LogEntry ها
+        """
+        with self._lock:
+            entries = list(self._entries)
+        return entries[-count:] if count else entries
+
+    def close(self):
+        """ثبت خلاصه‌های باقی‌مانده و بستن فایل لاگ"""
+        with self._lock:
+            for key, state in list(self._keys.items()):
+                self._summarize(key, state)
+            self._keys.clear()
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._file_queue = None
@@ -0,0 +1,135 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class Frame:
+    """
+    یک فریم دریافتی به همراه اطلاعات زمان و منبع آن
+
+    تصویر می‌تواند به صورت BGR خام، JPEG فشرده یا هر دو نگه داشته شود؛
+    اگر فقط JPEG موجود باشد، دیکد فقط اولین بار که پیکسل‌ها خوانده شوند
+    انجام می‌شود. timestamp زمان monotonic دریافت است و برای اندازه‌گیری
+    تاخیر سرتاسری استفاده می‌شود؛ wall_time برای نام فایل و نمایش است.
+
+    اگر تصویر از BufferPool امانت گرفته شده باشد، فریم یک lease دارد: هر
+    مصرف‌کننده‌ای که فریم را بعد از برگشتن فراخوانی نگه می‌دارد retain() و
+    در پایان release() صدا می‌زند تا آرایه بعد از آخرین release دوباره
+    استفاده شود. برای فریم‌های بدون lease این دو متد کاری نمی‌کنند.
+    """
+
+    __slots__ = ("_image", "_jpeg", "_lease", "timestamp", "wall_time", "seq", "camera_id", "source_url")
+
+    def __init__(self, image=None, jpeg=None, timestamp=None, wall_time=None,
+                 seq=0, camera_id=None, source_url=None, lease=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            image (numpy.ndarray): تصویر BGR (اختیاری)
+            jpeg (bytes): تصویر فشرده JPEG (اختیاری)
+            timestamp (float): زمان monotonic دریافت (پیش‌فرض اکنون)
+            wall_time (float): زمان واقعی دریافت (پیش‌فرض اکنون)
+            seq (int): شماره ترتیب فریم در استریم
+            camera_id (str): شناسه دوربین
+            source_url (str): آدرس استریم منبع
+            lease (BufferLease): شمارش ارجاع آرایه استخر (ارجاع سازنده به فریم منتقل می‌شود)
+        """
+        if image is None and jpeg is None:
+            raise ValueError("فریم باید تصویر یا JPEG داشته باشد")
+
+        self._image = image
+        self._jpeg = jpeg
+        self._lease = lease
+        self.timestamp = time.monotonic() if timestamp is None else timestamp
+        self.wall_time = time.time() if wall_time is None else wall_time
+        self.seq = seq
+        self.camera_id = camera_id
+        self.source_url = source_url
+
+    @property
+    def image(self):
+        """تصویر BGR؛ در صورت نیاز یک بار از JPEG دیکد می‌شود"""
+        if self._image is None:
+            self._image = cv2.imdecode(np.frombuffer(self._jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._image
+
+    @property
+    def jpeg(self):
+        """بایت‌های JPEG اصلی (اگر فریم به صورت فشرده دریافت شده باشد) یا None"""
+        return self._jpeg
+
+    @property
+    def is_decoded(self):
+        """آیا پیکسل‌ها در حافظه هستند"""
+        return self._image is not None
+
+    @property
+    def shape(self):
+        """ابعاد تصویر (ممکن است باعث دیکد شود)"""
+        return self.image.shape
+
+    @property
+    def lease(self):
+        """شمارش ارجاع آرایه استخر یا None"""
+        return self._lease
+
+    def retain(self):
+        """
+        نگه داشتن تصویر فریم بعد از برگشتن فراخوانی (بدون اثر برای فریم بدون lease)
+
+        Returns:
+            Frame: همین فریم
+        """
+        if self._lease is not None:
+            self._lease.retain()
+        return self
+
+    def release(self):
+        """پایان استفاده از تصویر؛ بعد از آخرین release آرایه ممکن است بازنویسی شود"""
+        if self._lease is not None:
+            self._lease.release()
+
+    def encode(self, quality=95):
+        """
+        JPEG فریم؛ اگر بایت‌های اصلی موجود باشند بدون encode مجدد برگردانده می‌شوند
+
+        Args:
+            quality (int): کیفیت JPEG در صورت نیاز به encode
+
+        Returns:
+            bytes: محتوای JPEG یا None در صورت خطا
+        """
+        if self._jpeg is not None:
+            return self._jpeg
+        ok, encoded = cv2.imencode(".jpg", self._image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        return encoded.tobytes() if ok else None
+
+    def age(self):
+        """
+        زمان گذشته از دریافت فریم
+
+        Returns:
+            float: ثانیه
+        """
+        return time.monotonic() - self.timestamp
+
+    def with_image(self, image):
+        """
+        فریم جدید با همان اطلاعات و تصویر دیگر (مثلاً کپی یا نسخه کوچک شده)
+
+        Args:
+            image (numpy.ndarray): تصویر جدید
+
+        Returns:
+            Frame: فریم جدید
+        """
+        return Frame(
+            image=image, timestamp=self.timestamp, wall_time=self.wall_time,
+            seq=self.seq, camera_id=self.camera_id, source_url=self.source_url
+        )
+
+    def __repr__(self):
+        state = "decoded" if self._image is not None else "jpeg"
+        return f"Frame(seq={self.seq}, camera_id={self.camera_id!r}, {state}, age={self.age():.3f}s)"
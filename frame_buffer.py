@@ -0,0 +1,369 @@
+import bisect
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame import Frame
+
+
+class FrameRingBuffer:
+    """
+    بافر حلقوی با حافظه ثابت برای نگه داشتن فریم‌های چند ثانیه اخیر
+
+    ظرفیت بر اساس مدت زمان و/یا بودجه بایت تعیین می‌شود. در حالت JPEG فریم‌ها
+    فشرده نگه داشته می‌شوند و فقط هنگام درخواست دیکد می‌شوند. فریم‌هایی که
+    JPEG اصلی ندارند روی thread جداگانه encode می‌شوند تا حلقه دریافت معطل
+    نماند؛ اگر encoder عقب بماند فریم‌های اضافه رد می‌شوند (نمونه‌برداری).
+    فریم‌های خام استخر (با lease) تا خروج از بافر یا پایان encode نگه داشته
+    (retain) می‌شوند؛ Frame های برگردانده شده ارجاع خودشان را دارند.
+    """
+
+    def __init__(self, seconds=10.0, max_bytes=None, store_jpeg=False, jpeg_quality=90, encode_queue=4):
+        """
+        مقداردهی اولیه
+
+        Args:
+            seconds (float): حداکثر بازه زمانی نگه داشته شده (None یعنی بدون محدودیت زمانی)
+            max_bytes (int): حداکثر حجم کل فریم‌ها (None یعنی بدون محدودیت حجم)
+            store_jpeg (bool): ذخیره فریم‌ها به صورت JPEG به جای BGR خام
+            jpeg_quality (int): کیفیت JPEG در حالت فشرده
+            encode_queue (int): حداکثر فریم‌های در انتظار encode در حالت فشرده
+        """
+        if seconds is None and max_bytes is None:
+            raise ValueError("حداقل یکی از seconds یا max_bytes باید تعیین شود")
+
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.store_jpeg = store_jpeg
+        self.jpeg_quality = jpeg_quality
+
+        self._lock = threading.Lock()
+        self._timestamps = []
+        self._items = []
+        self._sizes = []
+        self._leases = []
+        self._start = 0
+        self._bytes = 0
+
+        self._encode_queue = queue.Queue(maxsize=encode_queue)
+        self._encoder = None
+        self.encode_dropped = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._timestamps) - self._start
+
+    def append(self, frame, timestamp=None):
+        """
+        اضافه کردن یک فریم (از حلقه دریافت فریم)
+
+        Args:
+            frame (Frame | numpy.ndarray): فریم؛ تصویر کپی نمی‌شود و در حالت خام (یا تا پایان
+                encode در حالت فشرده) نباید تغییر کند
+            timestamp (float): زمان دریافت فریم (پیش‌فرض زمان Frame یا اکنون)
+        """
+        lease = None
+        if isinstance(frame, Frame):
+            if timestamp is None:
+                timestamp = frame.wall_time
+            jpeg = frame.jpeg
+            image = frame.image if not (self.store_jpeg and jpeg is not None) else None
+            lease = frame.lease
+        else:
+            jpeg = None
+            image = frame
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        if self.store_jpeg:
+            if jpeg is None:
+                self._submit_encode(image, timestamp, lease)
+                return
+            self._insert(timestamp, jpeg, len(jpeg))
+        else:
+            self._insert(timestamp, image, image.nbytes, lease.retain() if lease is not None else None)
+
+    def _insert(self, timestamp, item, size, lease=None):
+        """قرار دادن آیتم آماده در بافر و حذف آیتم‌های قدیمی"""
+        with self._lock:
+            # زمان‌ها باید صعودی بمانند تا جستجوی دودویی درست کار کند
+            if self._timestamps and timestamp < self._timestamps[-1]:
+                timestamp = self._timestamps[-1]
+
+            self._timestamps.append(timestamp)
+            self._items.append(item)
+            self._sizes.append(size)
+            self._leases.append(lease)
+            self._bytes += size
+            self._evict(timestamp)
+
+    def _submit_encode(self, image, timestamp, lease=None):
+        """فرستادن فریم خام به thread encoder؛ با صف پر فریم رد می‌شود"""
+        with self._lock:
+            if self._encoder is None:
+                self._encoder = threading.Thread(target=self._encode_loop, name="frame-buffer-encoder", daemon=True)
+                self._encoder.start()
+        if lease is not None:
+            lease.retain()
+        try:
+            self._encode_queue.put_nowait((timestamp, image, lease))
+        except queue.Full:
+            self.encode_dropped += 1
+            if lease is not None:
+                lease.release()
+
+    def _encode_loop(self):
+        """thread encoder: فشرده‌سازی فریم‌های خام به ترتیب دریافت"""
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        while True:
+            job = self._encode_queue.get()
+            if job is None:
+                break
+            timestamp, image, lease = job
+            try:
+                ok, encoded = cv2.imencode(".jpg", image, params)
+            except cv2.error as e:
+                print(f"❌ خطا در فشرده‌سازی فریم بافر: {str(e)}")
+                continue
+            finally:
+                if lease is not None:
+                    lease.release()
+            if ok:
+                jpeg = encoded.tobytes()
+                self._insert(timestamp, jpeg, len(jpeg))
+
+    def close(self, timeout=2.0):
+        """
+        توقف thread encoder (فریم‌های در صف قبل از توقف فشرده می‌شوند)
+
+        با append بعدی encoder دوباره شروع می‌شود.
+
+        Args:
+            timeout (float): حداکثر انتظار برای پایان thread
+        """
+        with self._lock:
+            encoder, self._encoder = self._encoder, None
+        if encoder is not None:
+            self._encode_queue.put(None)
+            encoder.join(timeout)
+
+    def _evict(self, now):
+        """حذف قدیمی‌ترین فریم‌ها تا رعایت محدودیت زمان و حجم (باید با قفل فراخوانی شود)"""
+        end = len(self._timestamps)
+
+        while end - self._start > 1:
+            too_old = self.seconds is not None and now - self._timestamps[self._start] > self.seconds
+            too_big = self.max_bytes is not None and self._bytes > self.max_bytes
+            if not (too_old or too_big):
+                break
+            self._bytes -= self._sizes[self._start]
+            self._items[self._start] = None
+            lease, self._leases[self._start] = self._leases[self._start], None
+            if lease is not None:
+                lease.release()
+            self._start += 1
+
+        # فشرده‌سازی فهرست‌ها وقتی نیمی از آن‌ها حذف شده باشد
+        if self._start > 64 and self._start * 2 > end:
+            del self._timestamps[:self._start]
+            del self._items[:self._start]
+            del self._sizes[:self._start]
+            del self._leases[:self._start]
+            self._start = 0
+
+    def _decode(self, item, lease=None):
+        """
+        تبدیل آیتم ذخیره شده به فریم BGR
+
+        آرایه‌های استخر کپی و ارجاع گرفته شده آزاد می‌شود، چون خروجی ndarray
+        نمی‌تواند ارجاع را با خود ببرد.
+        """
+        if self.store_jpeg:
+            return cv2.imdecode(np.frombuffer(item, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if lease is not None:
+            item = item.copy()
+            lease.release()
+        return item
+
+    def _retain(self, index):
+        """ارجاع جدید به آیتم شماره index برای فراخواننده (باید با قفل فراخوانی شود)"""
+        lease = self._leases[index]
+        return lease.retain() if lease is not None else None
+
+    def _find(self, timestamp):
+        """جستجوی دودویی نزدیک‌ترین آیتم به timestamp: (timestamp, item, lease)"""
+        with self._lock:
+            end = len(self._timestamps)
+            if end == self._start:
+                return None, None, None
+
+            index = bisect.bisect_left(self._timestamps, timestamp, self._start, end)
+            if index == end:
+                index = end - 1
+            elif index > self._start and \
+                    timestamp - self._timestamps[index - 1] <= self._timestamps[index] - timestamp:
+                index -= 1
+
+            return self._timestamps[index], self._items[index], self._retain(index)
+
+    def get_at(self, timestamp):
+        """
+        فریم نزدیک‌ترین زمان به timestamp
+
+        Args:
+            timestamp (float): زمان مورد نظر
+
+        Returns:
+            tuple: (timestamp, frame) یا (None, None) اگر بافر خالی باشد
+        """
+        found_ts, item, lease = self._find(timestamp)
+        if found_ts is None:
+            return None, None
+        return found_ts, self._decode(item, lease)
+
+    def get_frame_at(self, timestamp):
+        """
+        فریم نزدیک‌ترین زمان به timestamp به صورت Frame
+
+        در حالت JPEG فریم برگردانده شده تا زمان خواندن پیکسل‌ها دیکد نمی‌شود.
+
+        Args:
+            timestamp (float): زمان مورد نظر
+
+        Returns:
+            Frame: فریم پیدا شده یا None؛ در حالت خام فریم استخر تا release فراخواننده معتبر است
+        """
+        found_ts, item, lease = self._find(timestamp)
+        if found_ts is None:
+            return None
+
+        # زمان monotonic دریافت از روی زمان واقعی تخمین زده می‌شود
+        monotonic_ts = time.monotonic() - (time.time() - found_ts)
+        if self.store_jpeg:
+            return Frame(jpeg=item, timestamp=monotonic_ts, wall_time=found_ts)
+        return Frame(image=item, timestamp=monotonic_ts, wall_time=found_ts, lease=lease)
+
+    def get_frame_before(self, seconds):
+        """
+        فریم مربوط به چند ثانیه قبل به صورت Frame
+
+        Args:
+            seconds (float): چند ثانیه قبل از اکنون
+
+        Returns:
+            Frame: فریم پیدا شده یا None
+        """
+        return self.get_frame_at(time.time() - seconds)
+
+    def get_before(self, seconds):
+        """
+        فریم مربوط به چند ثانیه قبل
+
+        Args:
+            seconds (float): چند ثانیه قبل از اکنون
+
+        Returns:
+            tuple: (timestamp, frame) یا (None, None)
+        """
+        return self.get_at(time.time() - seconds)
+
+    def get_latest(self):
+        """
+        جدیدترین فریم بافر
+
+        Returns:
+            tuple: (timestamp, frame) یا (None, None)
+        """
+        with self._lock:
+            if len(self._timestamps) == self._start:
+                return None, None
+            found_ts = self._timestamps[-1]
+            item = self._items[-1]
+            lease = self._retain(-1)
+        return found_ts, self._decode(item, lease)
+
+    def get_range(self, start_time, end_time=None, decode=True):
+        """
+        همه فریم‌های یک بازه زمانی (برای خروجی گرفتن)
+
+        Args:
+            start_time (float): ابتدای بازه
+            end_time (float): انتهای بازه (پیش‌فرض اکنون)
+            decode (bool): در حالت JPEG، دیکد کردن یا برگرداندن بایت‌ها
+
+        Returns:
+            list: [(timestamp, frame_or_bytes), ...]
+        """
+        selected = self._select(start_time, end_time)
+        if self.store_jpeg and not decode:
+            return [(ts, item) for ts, item, _ in selected]
+        return [(ts, self._decode(item, lease)) for ts, item, lease in selected]
+
+    def _select(self, start_time, end_time=None):
+        """آیتم‌های یک بازه به همراه ارجاع جدید برای فراخواننده: [(timestamp, item, lease), ...]"""
+        if end_time is None:
+            end_time = time.time()
+
+        with self._lock:
+            end = len(self._timestamps)
+            lo = bisect.bisect_left(self._timestamps, start_time, self._start, end)
+            hi = bisect.bisect_right(self._timestamps, end_time, lo, end)
+            return [(self._timestamps[i], self._items[i], self._retain(i)) for i in range(lo, hi)]
+
+    def get_frames(self, start_time, end_time=None):
+        """
+        فریم‌های یک بازه زمانی به صورت Frame (در حالت JPEG بدون دیکد)
+
+        Args:
+            start_time (float): ابتدای بازه (زمان واقعی)
+            end_time (float): انتهای بازه (پیش‌فرض اکنون)
+
+        Returns:
+            list: فهرست Frame به ترتیب زمان؛ در حالت خام هر فریم استخر تا release فراخواننده معتبر است
+        """
+        offset = time.monotonic() - time.time()
+        frames = []
+        for wall_time, item, lease in self._select(start_time, end_time):
+            # زمان monotonic دریافت از روی زمان واقعی تخمین زده می‌شود
+            if self.store_jpeg:
+                frames.append(Frame(jpeg=item, timestamp=wall_time + offset, wall_time=wall_time))
+            else:
+                frames.append(Frame(image=item, timestamp=wall_time + offset, wall_time=wall_time, lease=lease))
+        return frames
+
+    def clear(self):
+        """خالی کردن بافر"""
+        with self._lock:
+            leases = self._leases[self._start:]
+            self._timestamps = []
+            self._items = []
+            self._sizes = []
+            self._leases = []
+            self._start = 0
+            self._bytes = 0
+        for lease in leases:
+            if lease is not None:
+                lease.release()
+
+    def get_stats(self):
+        """
+        آمار بافر
+
+        Returns:
+            dict: تعداد فریم، حجم و بازه زمانی پوشش داده شده
+        """
+        with self._lock:
+            count = len(self._timestamps) - self._start
+            span = self._timestamps[-1] - self._timestamps[self._start] if count else 0.0
+            return {
+                "frames": count,
+                "bytes": self._bytes,
+                "span_seconds": span,
+                "store_jpeg": self.store_jpeg,
+                "encode_pending": self._encode_queue.qsize(),
+                "encode_dropped": self.encode_dropped
+            }
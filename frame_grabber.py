@@ -0,0 +1,270 @@
+import threading
+import time
+
+from frame import Frame
+from metrics import metrics
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Thread پس‌زمینه برای خالی کردن مداوم بافر استریم
+
+    فقط جدیدترین فریم (Frame) به همراه شماره ترتیب و زمان دریافت آن
+    نگه داشته می‌شود؛ فریم‌هایی که قبل از خوانده شدن جایگزین شوند
+    به عنوان فریم از دست رفته شمرده می‌شوند. اگر منبع JPEG خام بدهد
+    (مثل MJPEGReader) دیکد تا زمان نیاز مصرف‌کننده به تعویق می‌افتد.
+    با buffer_pool، grabber ارجاع جدیدترین فریم را نگه می‌دارد و با رسیدن
+    فریم بعدی آزاد می‌کند؛ get_latest برای فراخواننده یک ارجاع جدا می‌گیرد.
+    """
+
+    def __init__(self, cap, max_read_errors=100, on_frame=None, camera_id=None, source_url=None,
+                 pacer=None, registry=None, stream="main", on_error=None, buffer_pool=None):
+        """
+        مقداردهی اولیه grabber
+
+        Args:
+            cap (cv2.VideoCapture): استریم باز شده
+            max_read_errors (int): تعداد خطای پشت سر هم قبل از توقف thread
+            on_frame (callable): تابعی که برای هر Frame روی همین thread صدا زده می‌شود
+            camera_id (str): شناسه دوربین برای ثبت در فریم‌ها
+            source_url (str): آدرس استریم برای ثبت در فریم‌ها
+            pacer (FramePacer): در صورت تعیین، فریم‌های اضافه فقط grab می‌شوند و دیکد نمی‌شوند
+            registry (MetricsRegistry): محل ثبت زمان grab/دیکد و شمارنده‌ها (پیش‌فرض رجیستری مشترک)
+            stream (str): برچسب استریم در متریک‌ها ("main" یا "sub")
+            on_error (callable): در صورت تعیین (مثلاً نگهبان اتصال)، به جای توقف بعد از
+                خطاهای پیاپی، capture کنار گذاشته و علت به این تابع داده می‌شود
+            buffer_pool (BufferPool): دیکد در آرایه‌های استخر به جای آرایه جدید برای هر فریم؛
+                on_frame برای نگه داشتن فریم باید frame.retain() صدا بزند
+        """
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.max_read_errors = max_read_errors
+        self.on_frame = on_frame
+        self.camera_id = camera_id
+        self.source_url = source_url
+        self.pacer = pacer
+        self.on_error = on_error
+        self.buffer_pool = buffer_pool
+        self.running = False
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._frame = None
+        self._seq = 0
+        self._consumed_seq = 0
+
+        self.frames_grabbed = 0
+        self.frames_dropped = 0
+        self.read_errors = 0
+        # زمان CPU مصرف شده روی این thread (خواندن و دیکد) برای مقایسه استریم‌ها
+        self.cpu_seconds = 0.0
+        self._started_at = None
+
+        registry = registry if registry is not None else metrics
+        labels = {"camera": camera_id, "stream": stream}
+        self._grab_hist = registry.histogram("grab", **labels)
+        self._decode_hist = registry.histogram("decode", **labels)
+        self._grab_rate = registry.rate("frames_grabbed", **labels)
+        self._dropped_counter = registry.counter("frames_dropped", **labels)
+        self._errors_counter = registry.counter("read_errors", **labels)
+
+    def seed(self, image):
+        """
+        قرار دادن یک فریم اولیه (مثلاً فریم تست اتصال) قبل از شروع thread
+
+        Args:
+            image (numpy.ndarray): تصویر اولیه
+        """
+        with self._lock:
+            self._seq += 1
+            self._frame = Frame(
+                image=image, seq=self._seq,
+                camera_id=self.camera_id, source_url=self.source_url
+            )
+            self._new_frame.notify_all()
+
+    def replace_capture(self, cap):
+        """
+        جایگزینی منبع بدون توقف thread (اتصال مجدد)
+
+        capture قبلی بعد از برگشتن read جاری روی همین thread آزاد می‌شود.
+
+        Args:
+            cap: capture جدید
+        """
+        with self._lock:
+            self.cap = cap
+            self._new_frame.notify_all()
+
+    def _read(self, cap):
+        """خواندن یک فریم از منبع؛ JPEG خام بدون دیکد نگه داشته می‌شود"""
+        if hasattr(cap, "read_jpeg"):
+            with self._grab_hist.time():
+                jpeg = cap.read_jpeg()
+            return (jpeg is not None), None, jpeg
+        if hasattr(cap, "grab"):
+            started = time.perf_counter()
+            grabbed = cap.grab()
+            self._grab_hist.observe((time.perf_counter() - started) * 1000)
+            if not grabbed:
+                return False, None, None
+            if self.pacer is not None and not self.pacer.on_frame():
+                # فریم از بافر منبع خارج شد ولی دیکد نمی‌شود
+                return True, None, None
+            started = time.perf_counter()
+            if self.buffer_pool is not None:
+                ret, image = self.buffer_pool.retrieve(cap)
+            else:
+                ret, image = cap.retrieve()
+            self._decode_hist.observe((time.perf_counter() - started) * 1000)
+            return ret and image is not None, image, None
+        # ProcessCapture: دیکد در فرآیند دیگر انجام شده و اینجا فقط انتظار است
+        with self._grab_hist.time():
+            ret, image = cap.read()
+        return ret and image is not None, image, None
+
+    def start(self):
+        """شروع thread دریافت فریم"""
+        self.running = True
+        super().start()
+
+    def stop(self, timeout=2.0):
+        """
+        توقف thread دریافت فریم
+
+        Args:
+            timeout (float): حداکثر زمان انتظار برای پایان thread
+        """
+        self.running = False
+        with self._lock:
+            self._new_frame.notify_all()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        """حلقه خواندن مداوم فریم‌ها"""
+        consecutive_errors = 0
+        self._started_at = time.monotonic()
+        cpu_start = time.thread_time()
+
+        while self.running:
+            with self._lock:
+                cap = self.cap
+                if cap is None:
+                    # منتظر capture جدید از نگهبان اتصال
+                    self._new_frame.wait(0.5)
+                    continue
+
+            try:
+                ret, image, jpeg = self._read(cap)
+            except Exception:
+                ret, image, jpeg = False, None, None
+            self.cpu_seconds = time.thread_time() - cpu_start
+
+            if cap is not self.cap:
+                # capture در حین خواندن عوض شده؛ نتیجه قدیمی دور ریخته می‌شود
+                if image is not None and self.buffer_pool is not None:
+                    self.buffer_pool.release(image)
+                cap.release()
+                consecutive_errors = 0
+                continue
+
+            if not ret:
+                self.read_errors += 1
+                self._errors_counter.inc()
+                if self.on_error is not None:
+                    with self._lock:
+                        if self.cap is cap:
+                            self.cap = None
+                    cap.release()
+                    try:
+                        self.on_error("خطا در خواندن فریم")
+                    except Exception as e:
+                        print(f"❌ خطا در گزارش خطای خواندن: {str(e)}")
+                    continue
+                consecutive_errors += 1
+                if consecutive_errors >= self.max_read_errors:
+                    print("❌ خطاهای پیاپی در خواندن فریم، grabber متوقف شد")
+                    break
+                time.sleep(0.01)
+                continue
+
+            consecutive_errors = 0
+            if image is None and jpeg is None:
+                continue
+
+            lease = self.buffer_pool.lease(image) if self.buffer_pool is not None else None
+            with self._lock:
+                # فریم قبلی قبل از خوانده شدن جایگزین می‌شود
+                if self._seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                    self._dropped_counter.inc()
+                self._seq += 1
+                frame = Frame(
+                    image=image, jpeg=jpeg, seq=self._seq,
+                    camera_id=self.camera_id, source_url=self.source_url, lease=lease
+                )
+                previous, self._frame = self._frame, frame
+                self.frames_grabbed += 1
+                self._new_frame.notify_all()
+            if previous is not None:
+                previous.release()
+            self._grab_rate.mark()
+
+            if self.on_frame is not None:
+                try:
+                    self.on_frame(frame)
+                except Exception as e:
+                    print(f"❌ خطا در پردازش فریم: {str(e)}")
+
+        self.running = False
+        with self._lock:
+            self._new_frame.notify_all()
+
+    def get_latest(self, timeout=None, newer_than=None):
+        """
+        دریافت جدیدترین فریم
+
+        Args:
+            timeout (float): حداکثر زمان انتظار اگر هنوز فریمی موجود نباشد
+            newer_than (int): فقط فریمی با شماره ترتیب بزرگتر از این مقدار برگردانده شود
+
+        Returns:
+            Frame: جدیدترین فریم یا None در صورت نبود فریم؛ فریم یک ارجاع برای
+                فراخواننده دارد که بعد از پایان استفاده با frame.release() آزاد می‌شود
+                (بدون آن فقط آرایه دوباره استفاده نمی‌شود)
+        """
+        min_seq = newer_than if newer_than is not None else 0
+
+        with self._lock:
+            if self._seq <= min_seq and timeout:
+                self._new_frame.wait_for(
+                    lambda: self._seq > min_seq or not self.running,
+                    timeout
+                )
+
+            if self._frame is None or self._seq <= min_seq:
+                return None
+
+            self._consumed_seq = self._seq
+            return self._frame.retain()
+
+    def get_stats(self):
+        """
+        آمار grabber
+
+        Returns:
+            dict: تعداد فریم‌های دریافتی، از دست رفته، خطاها و مصرف CPU
+        """
+        elapsed = time.monotonic() - self._started_at if self._started_at is not None else 0.0
+        with self._lock:
+            return {
+                "running": self.running,
+                "sequence": self._seq,
+                "frames_grabbed": self.frames_grabbed,
+                "frames_dropped": self.frames_dropped,
+                "read_errors": self.read_errors,
+                "cpu_seconds": self.cpu_seconds,
+                "cpu_percent": self.cpu_seconds / elapsed * 100 if elapsed > 0 else 0.0,
+                "last_frame_age": self._frame.age() if self._frame is not None else None
+            }
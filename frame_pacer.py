@@ -0,0 +1,135 @@
+import collections
+import threading
+import time
+
+
+class FramePacer:
+    """
+    زمان‌بندی فریم‌ها بر اساس نرخ واقعی منبع به جای خواب ثابت
+
+    حلقه دریافت هر فریم را با grab() از بافر خارج می‌کند (پس بافر FFmpeg پر
+    نمی‌شود) و فقط برای فریم‌هایی که pacer اجازه دهد retrieve() (دیکد) انجام
+    می‌دهد. نرخ ورودی از فاصله واقعی فریم‌ها و نرخ خروجی از فریم‌های عبور داده
+    شده اندازه‌گیری می‌شود.
+    """
+
+    def __init__(self, target_fps=None, window=90, realtime=False):
+        """
+        مقداردهی اولیه
+
+        Args:
+            target_fps (float): نرخ خروجی مطلوب (None یا 0 یعنی همه فریم‌ها)
+            window (int): تعداد فاصله‌های اخیر برای اندازه‌گیری نرخ
+            realtime (bool): برای منابع فایل، خواندن با سرعت واقعی منبع (خواب بین فریم‌ها)
+        """
+        self.target_fps = target_fps
+        self.realtime = realtime
+        self.source_fps = 0.0
+
+        self._lock = threading.Lock()
+        self._input_times = collections.deque(maxlen=window)
+        self._output_times = collections.deque(maxlen=window)
+        self._next_due = None
+
+        self.frames_in = 0
+        self.frames_out = 0
+        self.frames_skipped = 0
+
+    def set_source_fps(self, fps):
+        """
+        ثبت نرخ اعلام شده منبع (CAP_PROP_FPS)؛ مقادیر نامعتبر نادیده گرفته می‌شوند
+
+        Args:
+            fps (float): نرخ اعلام شده
+        """
+        if fps and 0 < fps <= 240:
+            self.source_fps = float(fps)
+
+    def throttle(self):
+        """
+        در حالت realtime تا زمان فریم بعدی منبع صبر می‌کند
+
+        برای استریم‌های زنده لازم نیست چون grab() خودش با نرخ دوربین بلاک می‌شود.
+        """
+        if not self.realtime or not self._input_times:
+            return
+        rate = self.source_fps or self.input_fps
+        if rate <= 0:
+            return
+        delay = self._input_times[-1] + 1.0 / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_frame(self, now=None):
+        """
+        ثبت دریافت یک فریم (بعد از grab) و تصمیم‌گیری برای دیکد آن
+
+        Args:
+            now (float): زمان monotonic (پیش‌فرض اکنون)
+
+        Returns:
+            bool: True اگر فریم باید دیکد و ارسال شود
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            self._input_times.append(now)
+            self.frames_in += 1
+
+            target = self.target_fps
+            if not target or (self.source_fps and target >= self.source_fps):
+                emit = True
+            else:
+                interval = 1.0 / target
+                if self._next_due is None or now >= self._next_due:
+                    emit = True
+                    # جلوگیری از انباشت عقب‌ماندگی بعد از توقف طولانی
+                    base = self._next_due if self._next_due is not None and now - self._next_due < interval else now
+                    self._next_due = base + interval
+                else:
+                    emit = False
+
+            if emit:
+                self._output_times.append(now)
+                self.frames_out += 1
+            else:
+                self.frames_skipped += 1
+            return emit
+
+    @staticmethod
+    def _rate(times):
+        """نرخ از روی زمان‌های ثبت شده"""
+        if len(times) < 2:
+            return 0.0
+        span = times[-1] - times[0]
+        return (len(times) - 1) / span if span > 0 else 0.0
+
+    @property
+    def input_fps(self):
+        """نرخ اندازه‌گیری شده ورودی (فریم‌های دریافتی از منبع)"""
+        with self._lock:
+            return self._rate(self._input_times)
+
+    @property
+    def output_fps(self):
+        """نرخ اندازه‌گیری شده خروجی (فریم‌های دیکد و ارسال شده)"""
+        with self._lock:
+            return self._rate(self._output_times)
+
+    def get_stats(self):
+        """
+        آمار زمان‌بندی
+
+        Returns:
+            dict: نرخ اعلام شده، نرخ ورودی و خروجی و شمارنده‌ها
+        """
+        return {
+            "source_fps": self.source_fps,
+            "target_fps": self.target_fps,
+            "input_fps": self.input_fps,
+            "output_fps": self.output_fps,
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+            "frames_skipped": self.frames_skipped
+        }
@@ -0,0 +1,380 @@
+import bisect
+import collections
+import json
+import threading
+import time
+
+
+# مرزهای پیش‌فرض هیستوگرام بر حسب میلی‌ثانیه
+DEFAULT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    """
+    هیستوگرام زمان (میلی‌ثانیه) با شمارش تجمعی bucket ها و نمونه‌های اخیر برای صدک‌ها
+
+    bucket ها برای خروجی Prometheus از ابتدا جمع می‌شوند؛ صدک‌ها (p50/p99)
+    از آخرین نمونه‌ها محاسبه می‌شوند تا وضعیت فعلی دوربین را نشان دهند.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS, recent=1024):
+        """
+        مقداردهی اولیه
+
+        Args:
+            buckets (tuple): مرزهای بالای bucket ها (صعودی)
+            recent (int): تعداد نمونه‌های اخیر برای محاسبه صدک
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = collections.deque(maxlen=recent)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        """
+        ثبت یک مقدار
+
+        Args:
+            value (float): مقدار بر حسب میلی‌ثانیه
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._recent.append(value)
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def time(self):
+        """
+        اندازه‌گیری مدت اجرای یک بلوک with
+
+        Returns:
+            _Timer: context manager
+        """
+        return _Timer(self)
+
+    def quantile(self, q):
+        """
+        صدک نمونه‌های اخیر
+
+        Args:
+            q (float): بین 0 و 1
+
+        Returns:
+            float: مقدار صدک یا None اگر نمونه‌ای نباشد
+        """
+        with self._lock:
+            values = sorted(self._recent)
+        if not values:
+            return None
+        index = min(len(values) - 1, int(q * len(values)))
+        return values[index]
+
+    def cumulative_counts(self):
+        """شمارش تجمعی هر bucket (شامل +Inf) برای خروجی Prometheus"""
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        result = []
+        for count in counts:
+            total += count
+            result.append(total)
+        return result
+
+    def snapshot(self):
+        """
+        خلاصه هیستوگرام
+
+        Returns:
+            dict: تعداد، میانگین، بیشینه و صدک‌های اخیر
+        """
+        return {
+            "count": self.count,
+            "sum_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else None,
+            "max_ms": self.max if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p90_ms": self.quantile(0.9),
+            "p99_ms": self.quantile(0.99)
+        }
+
+
+class _Timer:
+    """context manager برای ثبت مدت یک بلوک در هیستوگرام"""
+
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe((time.perf_counter() - self._start) * 1000)
+        return False
+
+
+class Counter:
+    """شمارنده افزایشی"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        """
+        افزایش شمارنده
+
+        Args:
+            amount (int): مقدار افزایش
+        """
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        """مقدار فعلی"""
+        return self.value
+
+
+class RateMeter:
+    """
+    نرخ رویدادها (مثلاً FPS) در یک پنجره زمانی لغزان
+
+    برخلاف میانگین کل از شروع برنامه، افت نرخ در چند ثانیه اخیر را نشان می‌دهد.
+    """
+
+    def __init__(self, window=5.0):
+        """
+        مقداردهی اولیه
+
+        Args:
+            window (float): طول پنجره بر حسب ثانیه
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._times = collections.deque()
+        self.total = 0
+
+    def mark(self, now=None):
+        """
+        ثبت یک رویداد
+
+        Args:
+            now (float): زمان monotonic (پیش‌فرض اکنون)
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._times.append(now)
+            self.total += 1
+            self._trim(now)
+
+    def _trim(self, now):
+        """حذف رویدادهای خارج از پنجره (باید با قفل فراخوانی شود)"""
+        limit = now - self.window
+        while self._times and self._times[0] < limit:
+            self._times.popleft()
+
+    def rate(self):
+        """
+        نرخ رویداد در ثانیه در پنجره اخیر
+
+        Returns:
+            float: رویداد در ثانیه
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._times) < 2:
+                return 0.0
+            span = now - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self):
+        """نرخ فعلی و تعداد کل"""
+        return {"rate": self.rate(), "total": self.total}
+
+
+class MetricsRegistry:
+    """
+    مجموعه متریک‌های نام‌دار با برچسب (مثلاً شناسه دوربین)
+
+    متریک‌ها با اولین درخواست ساخته می‌شوند و از هر thread قابل ثبت هستند.
+    خروجی به صورت dict، JSON یا متن Prometheus در دسترس است.
+    """
+
+    def __init__(self, prefix="camerareader"):
+        """
+        مقداردهی اولیه
+
+        Args:
+            prefix (str): پیشوند نام متریک‌ها در خروجی Prometheus
+        """
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    @staticmethod
+    def _label_key(labels):
+        """
+        برچسب‌ها به صورت tuple مرتب و قابل مقایسه
+
+        برچسب‌های None (مثلاً دوربین نامشخص) حذف و بقیه مقادیر به str تبدیل
+        می‌شوند تا متریک‌های هم‌نام با مقادیر از نوع‌های مختلف قابل مرتب
+        کردن بمانند.
+        """
+        return tuple(sorted((str(key), str(value)) for key, value in labels.items() if value is not None))
+
+    @staticmethod
+    def _sort_key(item):
+        """کلید مرتب‌سازی متریک‌ها بر اساس نام و برچسب‌ها"""
+        name, labels = item[0]
+        return (name, labels)
+
+    def _get(self, kind, factory, name, labels):
+        """پیدا کردن یا ساختن متریک با نام و برچسب‌ها"""
+        key = (name, self._label_key(labels))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = (kind, factory())
+                    self._metrics[key] = metric
+        return metric[1]
+
+    def histogram(self, name, buckets=DEFAULT_BUCKETS_MS, **labels):
+        """
+        هیستوگرام زمان با نام و برچسب‌ها
+
+        Returns:
+            Histogram: هیستوگرام
+        """
+        return self._get("histogram", lambda: Histogram(buckets), name, labels)
+
+    def counter(self, name, **labels):
+        """
+        شمارنده با نام و برچسب‌ها
+
+        Returns:
+            Counter: شمارنده
+        """
+        return self._get("counter", Counter, name, labels)
+
+    def rate(self, name, window=5.0, **labels):
+        """
+        نرخ لغزان با نام و برچسب‌ها
+
+        Returns:
+            RateMeter: نرخ‌سنج
+        """
+        return self._get("rate", lambda: RateMeter(window), name, labels)
+
+    def snapshot(self, **labels):
+        """
+        وضعیت فعلی متریک‌ها
+
+        Args:
+            **labels: فقط متریک‌هایی که این برچسب‌ها را دارند (مثلاً camera="192.168.1.108")
+
+        Returns:
+            dict: {"histograms": [...], "counters": [...], "rates": [...]}
+        """
+        wanted = set(self._label_key(labels))
+        with self._lock:
+            items = [item for item in self._metrics.items() if wanted.issubset(item[0][1])]
+
+        result = {"timestamp": time.time(), "histograms": [], "counters": [], "rates": []}
+        for (name, labels), (kind, metric) in sorted(items, key=self._sort_key):
+            entry = {"name": name, "labels": dict(labels)}
+            if kind == "histogram":
+                entry.update(metric.snapshot())
+                result["histograms"].append(entry)
+            elif kind == "counter":
+                entry["value"] = metric.snapshot()
+                result["counters"].append(entry)
+            else:
+                entry.update(metric.snapshot())
+                result["rates"].append(entry)
+        return result
+
+    def to_json(self, indent=2):
+        """
+        خروجی JSON متریک‌ها
+
+        Returns:
+            str: متن JSON
+        """
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        """قالب برچسب‌های Prometheus"""
+        pairs = list(labels)
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        body = ",".join(
+            '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for key, value in pairs
+        )
+        return "{" + body + "}"
+
+    def to_prometheus(self):
+        """
+        خروجی متنی با قالب Prometheus
+
+        هیستوگرام‌ها با پسوند _ms، شمارنده‌ها با _total و نرخ‌ها به صورت gauge
+        با پسوند _per_second منتشر می‌شوند.
+
+        Returns:
+            str: متن قابل ارائه روی /metrics
+        """
+        with self._lock:
+            items = sorted(self._metrics.items(), key=self._sort_key)
+
+        lines = []
+        declared = set()
+        for (name, labels), (kind, metric) in items:
+            if kind == "histogram":
+                full_name = f"{self.prefix}_{name}_ms"
+                if full_name not in declared:
+                    lines.append(f"# TYPE {full_name} histogram")
+                    declared.add(full_name)
+                counts = metric.cumulative_counts()
+                for bound, count in zip(metric.buckets, counts):
+                    lines.append(f"{full_name}_bucket{self._format_labels(labels, ('le', bound))} {count}")
+                lines.append(f"{full_name}_bucket{self._format_labels(labels, ('le', '+Inf'))} {counts[-1]}")
+                lines.append(f"{full_name}_sum{self._format_labels(labels)} {metric.total}")
+                lines.append(f"{full_name}_count{self._format_labels(labels)} {metric.count}")
+            elif kind == "counter":
+                full_name = f"{self.prefix}_{name}_total"
+                if full_name not in declared:
+                    lines.append(f"# TYPE {full_name} counter")
+                    declared.add(full_name)
+                lines.append(f"{full_name}{self._format_labels(labels)} {metric.value}")
+            else:
+                full_name = f"{self.prefix}_{name}_per_second"
+                if full_name not in declared:
+                    lines.append(f"# TYPE {full_name} gauge")
+                    declared.add(full_name)
+                lines.append(f"{full_name}{self._format_labels(labels)} {metric.rate():.3f}")
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """حذف همه متریک‌ها"""
+        with self._lock:
+            self._metrics.clear()
+
+
+# رجیستری مشترک برنامه؛ اجزا در صورت عدم تعیین رجیستری از این استفاده می‌کنند
+metrics = MetricsRegistry()
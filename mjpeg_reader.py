@@ -0,0 +1,299 @@
+import time
+
+import cv2
+import numpy as np
+import requests
+
+
+# مسیرهای رایج استریم MJPEG روی HTTP
+MJPEG_PATHS = [
+    "/cgi-bin/mjpg/video.cgi?channel=1&subtype=1",
+    "/mjpeg",
+    "/video.mjpg",
+    "/axis-cgi/mjpg/video.cgi",
+    "/videostream.cgi"
+]
+
+SOI = b"\xff\xd8"
+EOI = b"\xff\xd9"
+
+
+def mjpeg_urls(base_url):
+    """
+    آدرس‌های ممکن MJPEG برای یک دوربین
+
+    Args:
+        base_url (str): آدرس پایه مثل http://192.168.1.108:80
+
+    Returns:
+        list: آدرس‌های کامل
+    """
+    return [f"{base_url}{path}" for path in MJPEG_PATHS]
+
+
+class MJPEGReader:
+    """
+    خواننده استریم multipart MJPEG روی requests.Session
+
+    بدنه پاسخ در یک bytearray قابل استفاده مجدد خوانده می‌شود و مرز هر بخش
+    بدون کپی‌های مکرر پیدا می‌شود؛ هر بار فقط یک فریم JPEG برگردانده می‌شود
+    و دیکد تنها وقتی انجام می‌شود که مصرف‌کننده پیکسل‌ها را بخواهد. رابط
+    read/grab/retrieve/isOpened/get/release مشابه cv2.VideoCapture است.
+    """
+
+    def __init__(self, session, url, timeout=10, chunk_size=64 * 1024, max_buffer=8 * 1024 * 1024):
+        """
+        مقداردهی اولیه
+
+        Args:
+            session (requests.Session): session احراز هویت شده
+            url (str): آدرس استریم MJPEG
+            timeout (float): مهلت اتصال و خواندن
+            chunk_size (int): اندازه هر بار خواندن از شبکه
+            max_buffer (int): حداکثر حجم بافر قبل از دور ریختن داده نامعتبر
+        """
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.max_buffer = max_buffer
+
+        self._response = None
+        self._chunks = None
+        self._boundary = None
+        self._buffer = bytearray()
+        self._pos = 0
+        self._last_jpeg = None
+        self._last_time = None
+        self._shape = None
+        self._fps = 0.0
+
+        self.frames_read = 0
+        self.bytes_read = 0
+
+    def open(self):
+        """
+        باز کردن اتصال HTTP و خواندن مرز multipart از هدرها
+
+        Returns:
+            bool: True اگر پاسخ یک استریم multipart یا JPEG باشد
+        """
+        try:
+            self._response = self.session.get(self.url, stream=True, timeout=self.timeout, verify=False)
+        except requests.exceptions.RequestException:
+            self._response = None
+            return False
+
+        content_type = self._response.headers.get("Content-Type", "")
+        if self._response.status_code != 200 or \
+                ("multipart" not in content_type.lower() and "jpeg" not in content_type.lower()):
+            self.release()
+            return False
+
+        for part in content_type.split(";"):
+            part = part.strip()
+            if part.lower().startswith("boundary="):
+                boundary = part[len("boundary="):].strip('"')
+                if not boundary.startswith("--"):
+                    boundary = "--" + boundary
+                self._boundary = boundary.encode("latin-1")
+
+        self._chunks = self._response.iter_content(chunk_size=self.chunk_size)
+        return True
+
+    def isOpened(self):
+        """آیا اتصال باز است"""
+        return self._response is not None
+
+    def _fill(self):
+        """خواندن داده بیشتر از شبکه به انتهای بافر"""
+        # فشرده کردن بافر وقتی بیش از نیمی از آن مصرف شده باشد
+        if self._pos and self._pos * 2 >= len(self._buffer):
+            del self._buffer[:self._pos]
+            self._pos = 0
+
+        if len(self._buffer) - self._pos > self.max_buffer:
+            # داده نامعتبر؛ از ابتدا جستجو می‌شود
+            del self._buffer[:]
+            self._pos = 0
+
+        try:
+            chunk = next(self._chunks)
+        except (StopIteration, requests.exceptions.RequestException):
+            return False
+
+        self._buffer += chunk
+        self.bytes_read += len(chunk)
+        return True
+
+    def _next_part_with_boundary(self):
+        """استخراج بخش بعدی بر اساس مرز multipart و Content-Length"""
+        buf = self._buffer
+        start = buf.find(self._boundary, self._pos)
+        if start < 0:
+            return None
+
+        header_end = buf.find(b"\r\n\r\n", start)
+        if header_end < 0:
+            return None
+
+        length = None
+        for line in bytes(buf[start:header_end]).split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                try:
+                    length = int(value.strip())
+                except ValueError:
+                    pass
+
+        body_start = header_end + 4
+        if length is not None:
+            body_end = body_start + length
+            if body_end > len(buf):
+                return None
+            self._pos = body_end
+            return bytes(buf[body_start:body_end])
+
+        next_start = buf.find(self._boundary, body_start)
+        if next_start < 0:
+            return None
+        self._pos = next_start
+        return bytes(buf[body_start:next_start]).rstrip(b"\r\n")
+
+    def _next_part_with_markers(self):
+        """استخراج JPEG بعدی بر اساس نشانگرهای SOI/EOI (وقتی مرز اعلام نشده)"""
+        buf = self._buffer
+        start = buf.find(SOI, self._pos)
+        if start < 0:
+            return None
+        end = buf.find(EOI, start + 2)
+        if end < 0:
+            return None
+        self._pos = end + 2
+        return bytes(buf[start:end + 2])
+
+    def read_jpeg(self):
+        """
+        خواندن یک فریم JPEG کامل بدون دیکد
+
+        Returns:
+            bytes: محتوای JPEG یا None اگر استریم قطع شده باشد
+        """
+        if self._response is None:
+            return None
+
+        while True:
+            if self._boundary is not None:
+                jpeg = self._next_part_with_boundary()
+            else:
+                jpeg = self._next_part_with_markers()
+
+            if jpeg:
+                now = time.monotonic()
+                if self._last_time is not None:
+                    interval = now - self._last_time
+                    if interval > 0:
+                        self._fps = 1.0 / interval if not self._fps else self._fps * 0.9 + 0.1 / interval
+                self._last_time = now
+                self.frames_read += 1
+                return jpeg
+
+            if not self._fill():
+                return None
+
+    def __iter__(self):
+        """تولید پیاپی فریم‌های JPEG"""
+        while True:
+            jpeg = self.read_jpeg()
+            if jpeg is None:
+                return
+            yield jpeg
+
+    @property
+    def last_jpeg(self):
+        """بایت‌های JPEG آخرین فریم دریافت شده"""
+        return self._last_jpeg
+
+    def grab(self):
+        """
+        دریافت فریم بعدی بدون دیکد
+
+        Returns:
+            bool: True در صورت موفقیت
+        """
+        self._last_jpeg = self.read_jpeg()
+        return self._last_jpeg is not None
+
+    def retrieve(self):
+        """
+        دیکد آخرین فریم دریافت شده با grab
+
+        Returns:
+            tuple: (ret, frame)
+        """
+        if self._last_jpeg is None:
+            return False, None
+        frame = cv2.imdecode(np.frombuffer(self._last_jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return False, None
+        self._shape = frame.shape
+        return True, frame
+
+    def read(self):
+        """
+        دریافت و دیکد فریم بعدی
+
+        Returns:
+            tuple: (ret, frame) مشابه cv2.VideoCapture.read
+        """
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop_id):
+        """
+        مقدار ویژگی‌های استریم (عرض و ارتفاع از آخرین فریم دیکد شده، FPS اندازه‌گیری شده)
+
+        Returns:
+            float: مقدار ویژگی یا 0
+        """
+        if prop_id == cv2.CAP_PROP_FPS:
+            return float(self._fps)
+        if self._shape is not None:
+            if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+                return float(self._shape[1])
+            if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+                return float(self._shape[0])
+        return 0.0
+
+    def release(self):
+        """بستن اتصال HTTP"""
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+        self._chunks = None
+        del self._buffer[:]
+        self._pos = 0
+
+
+def open_mjpeg(session, urls, timeout=10):
+    """
+    امتحان آدرس‌های MJPEG و برگرداندن اولین خواننده‌ای که یک فریم معتبر بدهد
+
+    Args:
+        session (requests.Session): session احراز هویت شده
+        urls (list): آدرس‌های MJPEG
+        timeout (float): مهلت هر تلاش
+
+    Returns:
+        tuple: (reader, first_frame) یا (None, None)
+    """
+    for url in urls:
+        reader = MJPEGReader(session, url, timeout=timeout)
+        if not reader.open():
+            continue
+        ret, frame = reader.read()
+        if ret:
+            return reader, frame
+        reader.release()
+    return None, None
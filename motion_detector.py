@@ -0,0 +1,274 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+
+# مرزهای هیستوگرام زمان تشخیص (میلی‌ثانیه)؛ هدف زیر یک میلی‌ثانیه در هر فریم است
+MOTION_BUCKETS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10)
+
+
+class MotionZone:
+    """
+    ناحیه مستطیلی تشخیص حرکت با مختصات نسبی (0 تا 1)
+    """
+
+    __slots__ = ("name", "rect", "threshold")
+
+    def __init__(self, name, rect=(0.0, 0.0, 1.0, 1.0), threshold=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            name (str): نام ناحیه برای گزارش رویداد
+            rect (tuple): (x, y, عرض, ارتفاع) نسبت به ابعاد تصویر
+            threshold (float): کسر پیکسل‌های تغییر کرده برای اعلام حرکت
+                (None یعنی آستانه پیش‌فرض تشخیص‌دهنده)
+        """
+        x, y, w, h = rect
+        if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > 1.0001 or y + h > 1.0001:
+            raise ValueError(f"ناحیه نامعتبر: {rect}")
+        self.name = name
+        self.rect = (float(x), float(y), float(w), float(h))
+        self.threshold = threshold
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        ساخت ناحیه از dict تنظیمات
+
+        Args:
+            config (dict): {"name": ..., "rect": [x, y, w, h], "threshold": ...}
+
+        Returns:
+            MotionZone: ناحیه
+        """
+        if isinstance(config, cls):
+            return config
+        return cls(config.get("name", "zone"), tuple(config.get("rect", (0, 0, 1, 1))), config.get("threshold"))
+
+    def to_config(self):
+        """تنظیمات ناحیه به صورت dict قابل ذخیره در JSON"""
+        return {"name": self.name, "rect": list(self.rect), "threshold": self.threshold}
+
+
+class MotionDetector:
+    """
+    تشخیص حرکت با تفاضل فریم‌ها روی نسخه کوچک خاکستری تصویر
+
+    هر فریم به عرض width کوچک، خاکستری و کمی محو می‌شود و با فریم قبلی
+    مقایسه می‌شود؛ کسر پیکسل‌هایی که بیش از pixel_threshold تغییر کرده‌اند
+    در هر ناحیه امتیاز آن ناحیه است. رویداد حرکت بعد از min_frames فریم
+    پیاپی بالای آستانه شروع و بعد از hold ثانیه بدون حرکت تمام می‌شود؛
+    رویداد بعدی تا cooldown ثانیه بعد از پایان قبلی شروع نمی‌شود.
+    """
+
+    def __init__(self, width=160, pixel_threshold=25, area_threshold=0.01, zones=None,
+                 min_frames=2, hold=2.0, cooldown=5.0, max_fps=None, blur=True,
+                 on_motion=None, on_motion_end=None, registry=None, camera=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            width (int): عرض نسخه کوچک برای مقایسه (پیکسل)
+            pixel_threshold (int): حداقل تغییر روشنایی یک پیکسل (0 تا 255)
+            area_threshold (float): کسر پیکسل‌های تغییر کرده برای اعلام حرکت در هر ناحیه
+            zones (list): فهرست MotionZone یا dict تنظیمات (پیش‌فرض کل تصویر)
+            min_frames (int): تعداد فریم پیاپی با حرکت قبل از شروع رویداد
+            hold (float): پایان رویداد بعد از این مدت بدون حرکت (ثانیه)
+            cooldown (float): حداقل فاصله بین پایان یک رویداد و شروع رویداد بعدی (ثانیه)
+            max_fps (float): حداکثر نرخ بررسی فریم‌ها (None یعنی همه)
+            blur (bool): محو کردن برای کاهش نویز حسگر
+            on_motion (callable): با dict رویداد هنگام شروع حرکت صدا زده می‌شود
+            on_motion_end (callable): با dict رویداد (شامل مدت) هنگام پایان صدا زده می‌شود
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها و رویدادها
+        """
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.min_frames = min_frames
+        self.hold = hold
+        self.cooldown = cooldown
+        self.max_fps = max_fps
+        self.blur = blur
+        self.on_motion = on_motion
+        self.on_motion_end = on_motion_end
+        self.camera = camera
+        self.enabled = True
+
+        self._lock = threading.Lock()
+        self.set_zones(zones)
+        self._previous = None
+        self._hits = 0
+        self._last_checked = None
+        self._last_motion = None
+        self._last_end = None
+        self._event = None
+
+        self.frames_checked = 0
+        self.events = 0
+        self.last_scores = {}
+
+        registry = registry if registry is not None else metrics
+        self._detect_hist = registry.histogram("motion_detect", buckets=MOTION_BUCKETS_MS, camera=camera)
+        self._event_counter = registry.counter("motion_events", camera=camera)
+
+    def set_zones(self, zones):
+        """
+        تعیین نواحی تشخیص
+
+        Args:
+            zones (list): فهرست MotionZone یا dict تنظیمات (None یعنی کل تصویر)
+        """
+        zones = [MotionZone.from_config(zone) for zone in zones] if zones else [MotionZone("all")]
+        with self._lock:
+            self.zones = zones
+            # برش‌های پیکسلی با اولین فریم بعدی دوباره محاسبه می‌شوند
+            self._slices = None
+            self._slices_shape = None
+
+    def reset(self):
+        """فراموش کردن فریم مرجع (مثلاً بعد از اتصال مجدد یا تغییر زاویه)"""
+        with self._lock:
+            self._previous = None
+            self._hits = 0
+
+    def _prepare(self, image):
+        """نسخه کوچک خاکستری تصویر"""
+        height, width = image.shape[:2]
+        if width > self.width:
+            small_height = max(1, int(round(height * self.width / width)))
+            # کوچک کردن قبل از تبدیل رنگ تا فقط پیکسل‌های کم پردازش شوند
+            image = cv2.resize(image, (self.width, small_height), interpolation=cv2.INTER_AREA)
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if self.blur:
+            image = cv2.GaussianBlur(image, (5, 5), 0)
+        return image
+
+    def _zone_slices(self, shape):
+        """برش‌های پیکسلی نواحی برای ابعاد فعلی (کش می‌شوند)"""
+        if self._slices_shape != shape:
+            height, width = shape
+            slices = []
+            for zone in self.zones:
+                x, y, w, h = zone.rect
+                x0, y0 = int(x * width), int(y * height)
+                x1 = max(x0 + 1, min(width, int(round((x + w) * width))))
+                y1 = max(y0 + 1, min(height, int(round((y + h) * height))))
+                threshold = zone.threshold if zone.threshold is not None else self.area_threshold
+                slices.append((zone.name, (slice(y0, y1), slice(x0, x1)), (y1 - y0) * (x1 - x0), threshold))
+            self._slices = slices
+            self._slices_shape = shape
+        return self._slices
+
+    def process(self, image, now=None):
+        """
+        بررسی یک فریم
+
+        Args:
+            image (numpy.ndarray): تصویر BGR یا خاکستری (با هر وضوحی)
+            now (float): زمان monotonic (پیش‌فرض اکنون)
+
+        Returns:
+            bool: آیا رویداد حرکت در جریان است
+        """
+        if not self.enabled or image is None:
+            return False
+        if now is None:
+            now = time.monotonic()
+        if self.max_fps and self._last_checked is not None and now - self._last_checked < 1.0 / self.max_fps:
+            return self._event is not None
+        self._last_checked = now
+
+        started = time.perf_counter()
+        with self._lock:
+            gray = self._prepare(image)
+            previous, self._previous = self._previous, gray
+            if previous is None or previous.shape != gray.shape:
+                return self._event is not None
+
+            changed = cv2.absdiff(gray, previous) > self.pixel_threshold
+            scores = {}
+            triggered = []
+            for name, region, area, threshold in self._zone_slices(gray.shape):
+                score = np.count_nonzero(changed[region]) / area
+                scores[name] = score
+                if score >= threshold:
+                    triggered.append(name)
+        self._detect_hist.observe((time.perf_counter() - started) * 1000)
+        self.frames_checked += 1
+        self.last_scores = scores
+
+        return self._update(triggered, scores, now)
+
+    def _update(self, triggered, scores, now):
+        """debounce و اعلام شروع و پایان رویداد"""
+        if triggered:
+            self._hits += 1
+            self._last_motion = now
+        else:
+            self._hits = 0
+
+        if self._event is None:
+            cooling = self._last_end is not None and now - self._last_end < self.cooldown
+            if self._hits >= self.min_frames and not cooling:
+                self.events += 1
+                self._event_counter.inc()
+                self._event = {
+                    "camera": self.camera,
+                    "index": self.events,
+                    "started": now,
+                    "wall_time": time.time(),
+                    "zones": list(triggered),
+                    "score": max(scores.values())
+                }
+                self._notify(self.on_motion, dict(self._event))
+        else:
+            if triggered:
+                for name in triggered:
+                    if name not in self._event["zones"]:
+                        self._event["zones"].append(name)
+                self._event["score"] = max(self._event["score"], max(scores.values()))
+            elif now - self._last_motion > self.hold:
+                event = dict(self._event, duration=self._last_motion - self._event["started"])
+                self._event = None
+                self._last_end = now
+                self._notify(self.on_motion_end, event)
+
+        return self._event is not None
+
+    def _notify(self, callback, event):
+        """صدا زدن callback بدون اینکه خطای آن حلقه دریافت فریم را متوقف کند"""
+        if callback is None:
+            return
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"❌ خطا در پردازش رویداد حرکت: {str(e)}")
+
+    @property
+    def in_motion(self):
+        """آیا رویداد حرکت در جریان است"""
+        return self._event is not None
+
+    def get_stats(self):
+        """
+        آمار تشخیص حرکت
+
+        Returns:
+            dict: تعداد فریم‌های بررسی شده، رویدادها، امتیاز آخرین فریم و زمان تشخیص
+        """
+        return {
+            "enabled": self.enabled,
+            "in_motion": self.in_motion,
+            "frames_checked": self.frames_checked,
+            "events": self.events,
+            "last_scores": dict(self.last_scores),
+            "zones": [zone.to_config() for zone in self.zones],
+            "detect_ms": self._detect_hist.snapshot()
+        }
@@ -0,0 +1,385 @@
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from metrics import metrics
+
+
+ANCHORS = ("top-left", "top-right", "bottom-left", "bottom-right")
+
+
+def render_text_tile(text, scale, color=(0, 255, 0), background=(0, 0, 0), background_alpha=110):
+    """
+    رسم یک متن در یک کاشی کوچک RGBA (ترتیب رنگ BGR)
+
+    Args:
+        text (str): متن
+        scale (float): اندازه فونت
+        color (tuple): رنگ متن (B, G, R)
+        background (tuple): رنگ پس‌زمینه (B, G, R)
+        background_alpha (int): شفافیت پس‌زمینه (0 یعنی بدون پس‌زمینه)
+
+    Returns:
+        numpy.ndarray: کاشی (h, w, 4)
+    """
+    thickness = max(1, int(round(2 * scale)))
+    (text_w, text_h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    pad = max(2, int(4 * scale))
+    tile = np.zeros((text_h + baseline + 2 * pad, text_w + 2 * pad, 4), dtype=np.uint8)
+    tile[:, :] = (*background, background_alpha)
+    cv2.putText(tile, text, (pad, pad + text_h), cv2.FONT_HERSHEY_SIMPLEX, scale,
+                (*color, 255), thickness, cv2.LINE_AA)
+    return tile
+
+
+class OverlayTile:
+    """
+    کاشی آماده ترکیب: رنگ پیش‌ضرب شده در آلفا و ضریب باقی‌مانده تصویر زیرین
+
+    محاسبه‌های آلفا یک بار هنگام ساخت کاشی انجام می‌شوند و در هر فریم فقط
+    ناحیه کوچک زیر کاشی ترکیب می‌شود.
+    """
+
+    __slots__ = ("x", "y", "width", "height", "_premultiplied", "_inverse_alpha", "_opaque")
+
+    def __init__(self, rgba, x, y, channel_order="bgr"):
+        """
+        مقداردهی اولیه
+
+        Args:
+            rgba (numpy.ndarray): کاشی (h, w, 4) با ترتیب رنگ BGR
+            x (int): ستون گوشه بالا-چپ در تصویر نمایش
+            y (int): سطر گوشه بالا-چپ در تصویر نمایش
+            channel_order (str): ترتیب رنگ تصویر مقصد ("bgr" یا "rgb")
+        """
+        color = rgba[:, :, :3]
+        if channel_order == "rgb":
+            color = color[:, :, ::-1]
+        alpha = rgba[:, :, 3:4].astype(np.float32) / 255.0
+        self.x, self.y = int(x), int(y)
+        self.height, self.width = rgba.shape[:2]
+        self._opaque = bool((rgba[:, :, 3] == 255).all())
+        self._premultiplied = color.astype(np.float32) * alpha
+        self._inverse_alpha = 1.0 - alpha
+
+    def blend(self, image):
+        """
+        ترکیب کاشی با ناحیه خودش در تصویر (درجا)
+
+        Args:
+            image (numpy.ndarray): تصویر نمایش با 3 کانال
+        """
+        height, width = image.shape[:2]
+        x0, y0 = max(0, self.x), max(0, self.y)
+        x1, y1 = min(width, self.x + self.width), min(height, self.y + self.height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        roi = image[y0:y1, x0:x1]
+        tile_region = (slice(y0 - self.y, y1 - self.y), slice(x0 - self.x, x1 - self.x))
+        premultiplied = self._premultiplied[tile_region]
+        if self._opaque:
+            roi[:] = premultiplied
+            return
+        roi[:] = roi * self._inverse_alpha[tile_region] + premultiplied
+
+
+class OverlayLayer:
+    """
+    یک لایه نمایشی روی تصویر (پایه لایه‌ها)
+
+    key() محتوای فعلی لایه را به صورت یک مقدار قابل مقایسه برمی‌گرداند؛ فقط
+    وقتی این مقدار یا اندازه نمایش عوض شود draw() دوباره صدا زده می‌شود.
+    """
+
+    def __init__(self, name, anchor="top-left", margin=10, enabled=True):
+        """
+        مقداردهی اولیه
+
+        Args:
+            name (str): نام یکتای لایه
+            anchor (str): گوشه قرارگیری (یکی از ANCHORS)
+            margin (int): فاصله از لبه در اندازه 1280 پیکسل (با اندازه نمایش مقیاس می‌شود)
+            enabled (bool): نمایش لایه
+        """
+        if anchor not in ANCHORS:
+            raise ValueError(f"گوشه نامعتبر: {anchor}")
+        self.name = name
+        self.anchor = anchor
+        self.margin = margin
+        self.enabled = enabled
+
+    def key(self, frame, values):
+        """
+        محتوای فعلی لایه
+
+        Args:
+            frame (Frame): فریم در حال نمایش (ممکن است None باشد)
+            values (dict): مقادیر لحظه‌ای (fps، motion_detector، ...)
+
+        Returns:
+            محتوای قابل مقایسه یا None برای پنهان بودن
+        """
+        raise NotImplementedError
+
+    def draw(self, key, size):
+        """
+        ساخت کاشی‌های لایه برای یک محتوا و اندازه نمایش
+
+        Args:
+            key: خروجی key()
+            size (tuple): (عرض، ارتفاع) تصویر نمایش
+
+        Returns:
+            list: [(rgba, x, y), ...]
+        """
+        raise NotImplementedError
+
+    def place(self, tile, size):
+        """مختصات گوشه بالا-چپ یک کاشی بر اساس گوشه لایه"""
+        width, height = size
+        margin = int(self.margin * max(0.4, width / 1280))
+        tile_h, tile_w = tile.shape[:2]
+        x = margin if self.anchor.endswith("left") else width - tile_w - margin
+        y = margin if self.anchor.startswith("top") else height - tile_h - margin
+        return x, y
+
+
+class TextLayer(OverlayLayer):
+    """متن ثابت (مثلاً نام یا IP دوربین)"""
+
+    def __init__(self, name, text, anchor="top-right", color=(255, 255, 255), **kwargs):
+        """
+        مقداردهی اولیه
+
+        Args:
+            name (str): نام لایه
+            text (str): متن
+            anchor (str): گوشه قرارگیری
+            color (tuple): رنگ متن (B, G, R)
+        """
+        super().__init__(name, anchor, **kwargs)
+        self.text = text
+        self.color = color
+
+    def key(self, frame, values):
+        return self.text or None
+
+    def draw(self, key, size):
+        tile = render_text_tile(key, max(0.4, size[0] / 1280), self.color)
+        return [(tile, *self.place(tile, size))]
+
+
+class TimestampLayer(TextLayer):
+    """زمان دریافت فریم؛ متن فقط با تغییر ثانیه دوباره رسم می‌شود"""
+
+    def __init__(self, name="timestamp", fmt="%Y-%m-%d %H:%M:%S", anchor="top-left",
+                 color=(0, 255, 0), **kwargs):
+        """
+        مقداردهی اولیه
+
+        Args:
+            name (str): نام لایه
+            fmt (str): قالب strftime
+            anchor (str): گوشه قرارگیری
+            color (tuple): رنگ متن (B, G, R)
+        """
+        super().__init__(name, None, anchor, color, **kwargs)
+        self.fmt = fmt
+
+    def key(self, frame, values):
+        wall_time = frame.wall_time if frame is not None else time.time()
+        return datetime.fromtimestamp(int(wall_time)).strftime(self.fmt)
+
+
+class FpsLayer(TextLayer):
+    """نرخ فریم؛ حداکثر هر interval ثانیه یک بار به‌روز می‌شود"""
+
+    def __init__(self, name="fps", anchor="bottom-left", interval=0.5, **kwargs):
+        """
+        مقداردهی اولیه
+
+        Args:
+            name (str): نام لایه
+            anchor (str): گوشه قرارگیری
+            interval (float): حداقل فاصله به‌روزرسانی متن (ثانیه)
+        """
+        super().__init__(name, None, anchor, **kwargs)
+        self.interval = interval
+        self._text = None
+        self._updated = 0.0
+
+    def key(self, frame, values):
+        fps = values.get("fps")
+        if fps is None:
+            return None
+        now = time.monotonic()
+        if self._text is None or now - self._updated >= self.interval:
+            self._text = f"{fps:.1f} FPS"
+            self._updated = now
+        return self._text
+
+
+class ZonesLayer(OverlayLayer):
+    """
+    نواحی تشخیص حرکت
+
+    هر ناحیه به صورت چهار نوار باریک لبه و یک برچسب نام رسم می‌شود تا فقط
+    پیکسل‌های لبه ترکیب شوند، نه کل مستطیل ناحیه.
+    """
+
+    def __init__(self, name="zones", idle_color=(0, 200, 255), active_color=(0, 0, 255), **kwargs):
+        """
+        مقداردهی اولیه
+
+        Args:
+            name (str): نام لایه
+            idle_color (tuple): رنگ نواحی بدون حرکت (B, G, R)
+            active_color (tuple): رنگ نواحی هنگام رویداد حرکت (B, G, R)
+        """
+        super().__init__(name, **kwargs)
+        self.idle_color = idle_color
+        self.active_color = active_color
+
+    def key(self, frame, values):
+        detector = values.get("motion_detector")
+        if detector is None:
+            return None
+        zones = tuple((zone.name, zone.rect) for zone in detector.zones)
+        active = ()
+        if detector.in_motion:
+            scores = detector.last_scores
+            active = tuple(
+                zone.name for zone in detector.zones
+                if scores.get(zone.name, 0.0) >= (zone.threshold if zone.threshold is not None else detector.area_threshold)
+            )
+        return zones, active
+
+    def draw(self, key, size):
+        zones, active = key
+        width, height = size
+        thickness = max(1, int(round(2 * max(0.4, width / 1280))))
+        placements = []
+        for name, (x, y, w, h) in zones:
+            color = self.active_color if name in active else self.idle_color
+            x0, y0 = int(x * width), int(y * height)
+            x1 = max(x0 + thickness, min(width, int(round((x + w) * width))))
+            y1 = max(y0 + thickness, min(height, int(round((y + h) * height))))
+            edge = (*color, 200)
+            horizontal = np.full((thickness, x1 - x0, 4), edge, dtype=np.uint8)
+            vertical = np.full((y1 - y0, thickness, 4), edge, dtype=np.uint8)
+            placements += [
+                (horizontal, x0, y0), (horizontal, x0, y1 - thickness),
+                (vertical, x0, y0), (vertical, x1 - thickness, y0)
+            ]
+            if name != "all":
+                label = render_text_tile(name, max(0.35, width / 1600), color)
+                placements.append((label, x0 + thickness, y0 + thickness))
+        return placements
+
+
+class OverlayCompositor:
+    """
+    ترکیب لایه‌های نمایشی با تصویر نمایش
+
+    کاشی‌های هر لایه فقط با تغییر محتوا یا اندازه نمایش دوباره ساخته می‌شوند
+    و در هر فریم فقط ناحیه زیر کاشی‌ها ترکیب می‌شود. apply() تصویر داده
+    شده را درجا تغییر می‌دهد، پس باید فقط روی نسخه نمایش (کوچک شده یا کپی)
+    صدا زده شود و هرگز روی فریمی که برای عکس، ضبط یا تحلیل استفاده می‌شود.
+    """
+
+    def __init__(self, layers=None, channel_order="bgr", registry=None, camera=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            layers (list): لایه‌ها به ترتیب رسم (پیش‌فرض فقط زمان)
+            channel_order (str): ترتیب رنگ تصویر نمایش ("bgr" برای OpenCV، "rgb" برای Qt)
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+        """
+        self.channel_order = channel_order
+        self._lock = threading.Lock()
+        self._layers = list(layers) if layers is not None else [TimestampLayer()]
+        self._cache = {}
+
+        registry = registry if registry is not None else metrics
+        self._apply_hist = registry.histogram("overlay", camera=camera)
+        self._render_counter = registry.counter("overlay_tile_renders", camera=camera)
+
+    def add_layer(self, layer):
+        """افزودن یا جایگزینی لایه با همان نام"""
+        with self._lock:
+            self._layers = [existing for existing in self._layers if existing.name != layer.name] + [layer]
+            self._cache.pop(layer.name, None)
+
+    def remove_layer(self, name):
+        """حذف لایه"""
+        with self._lock:
+            self._layers = [layer for layer in self._layers if layer.name != name]
+            self._cache.pop(name, None)
+
+    def get_layer(self, name):
+        """
+        پیدا کردن لایه با نام
+
+        Returns:
+            OverlayLayer: لایه یا None
+        """
+        with self._lock:
+            for layer in self._layers:
+                if layer.name == name:
+                    return layer
+        return None
+
+    def set_enabled(self, name, enabled):
+        """
+        نمایش یا پنهان کردن یک لایه
+
+        Returns:
+            bool: True اگر لایه وجود داشته باشد
+        """
+        layer = self.get_layer(name)
+        if layer is None:
+            return False
+        layer.enabled = enabled
+        return True
+
+    def _tiles(self, layer, key, size):
+        """کاشی‌های کش شده لایه یا ساخت دوباره آن‌ها"""
+        cached = self._cache.get(layer.name)
+        if cached is not None and cached[0] == key and cached[1] == size:
+            return cached[2]
+        tiles = [OverlayTile(rgba, x, y, self.channel_order) for rgba, x, y in layer.draw(key, size)]
+        self._cache[layer.name] = (key, size, tiles)
+        self._render_counter.inc()
+        return tiles
+
+    def apply(self, image, frame=None, **values):
+        """
+        رسم لایه‌های فعال روی تصویر نمایش (درجا)
+
+        Args:
+            image (numpy.ndarray): تصویر نمایش با 3 کانال
+            frame (Frame): فریم منبع (برای زمان دریافت)
+            **values: مقادیر لحظه‌ای لایه‌ها (fps، motion_detector، ...)
+
+        Returns:
+            numpy.ndarray: همان تصویر
+        """
+        started = time.perf_counter()
+        size = (image.shape[1], image.shape[0])
+        with self._lock:
+            layers = list(self._layers)
+        for layer in layers:
+            if not layer.enabled:
+                continue
+            key = layer.key(frame, values)
+            if key is None:
+                continue
+            for tile in self._tiles(layer, key, size):
+                tile.blend(image)
+        self._apply_hist.observe((time.perf_counter() - started) * 1000)
+        return image
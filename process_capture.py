@@ -0,0 +1,243 @@
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+
+def _capture_worker(url, backend, params, slots, conn, stop_event, latest_seq, slot_seqs, new_frame):
+    """
+    فرآیند دیکد: استریم را باز می‌کند و فریم‌ها را مستقیماً داخل slot های حافظه مشترک می‌خواند
+    """
+    if backend is not None and params:
+        cap = cv2.VideoCapture(url, backend, params)
+    elif backend is not None:
+        cap = cv2.VideoCapture(url, backend)
+    else:
+        cap = cv2.VideoCapture(url)
+
+    ret, first = cap.read() if cap.isOpened() else (False, None)
+    if not ret or first is None:
+        conn.send(("error", "امکان خواندن فریم از استریم وجود ندارد"))
+        cap.release()
+        return
+
+    props = {
+        cv2.CAP_PROP_FRAME_WIDTH: cap.get(cv2.CAP_PROP_FRAME_WIDTH),
+        cv2.CAP_PROP_FRAME_HEIGHT: cap.get(cv2.CAP_PROP_FRAME_HEIGHT),
+        cv2.CAP_PROP_FPS: cap.get(cv2.CAP_PROP_FPS)
+    }
+    conn.send(("ready", first.shape, first.dtype.str, props))
+
+    # حافظه مشترک توسط فرآیند اصلی ساخته و در نهایت حذف می‌شود
+    message = conn.recv()
+    if message[0] != "shm":
+        cap.release()
+        return
+
+    shm = shared_memory.SharedMemory(name=message[1])
+    frames = np.ndarray((slots,) + first.shape, dtype=first.dtype, buffer=shm.buf)
+
+    seq = 1
+    frames[seq % slots][...] = first
+    slot_seqs[seq % slots] = seq
+    with new_frame:
+        latest_seq.value = seq
+        new_frame.notify_all()
+
+    try:
+        while not stop_event.is_set():
+            seq += 1
+            slot = seq % slots
+            target = frames[slot]
+
+            # علامت‌گذاری slot به عنوان «در حال نوشتن»
+            slot_seqs[slot] = -1
+            ret, out = cap.read(image=target)
+            if not ret or out is None:
+                seq -= 1
+                time.sleep(0.01)
+                continue
+            if out is not target:
+                if out.shape != target.shape:
+                    conn.send(("error", f"تغییر رزولوشن استریم: {out.shape}"))
+                    break
+                np.copyto(target, out)
+
+            slot_seqs[slot] = seq
+            with new_frame:
+                latest_seq.value = seq
+                new_frame.notify_all()
+    finally:
+        frames = target = out = None
+        shm.close()
+        cap.release()
+        with new_frame:
+            new_frame.notify_all()
+
+
+class ProcessCapture:
+    """
+    Capture مبتنی بر فرآیند جداگانه با انتقال فریم از طریق حافظه مشترک
+
+    دیکد هر دوربین در فرآیند مستقل انجام می‌شود و فریم‌ها بدون pickle و بدون
+    کپی در یک ring از slot های shared_memory نوشته می‌شوند. رابط آن مشابه
+    cv2.VideoCapture است (read/isOpened/get/release) تا بتواند جایگزین آن شود.
+
+    آرایه برگردانده شده توسط read() مستقیماً روی حافظه مشترک است و تا
+    slots-1 فریم بعدی معتبر می‌ماند؛ برای نگه داشتن طولانی‌تر باید کپی شود.
+    """
+
+    def __init__(self, url, backend=None, params=None, slots=4, start_timeout=15.0, read_timeout=5.0):
+        """
+        شروع فرآیند دیکد
+
+        Args:
+            url (str): آدرس استریم
+            backend (int): backend OpenCV (اختیاری)
+            params (list): پارامترهای باز کردن capture (اختیاری)
+            slots (int): تعداد slot های ring
+            start_timeout (float): مهلت باز شدن استریم در فرآیند دیکد
+            read_timeout (float): حداکثر انتظار read() برای فریم جدید
+        """
+        self.url = url
+        self.slots = max(2, slots)
+        self.read_timeout = read_timeout
+        self.frames_dropped = 0
+        self.error = None
+
+        self._shm = None
+        self._frames = None
+        self._props = {}
+        self._last_seq = 0
+
+        ctx = mp.get_context("spawn")
+        self._stop_event = ctx.Event()
+        self._latest_seq = ctx.Value("q", 0, lock=False)
+        self._slot_seqs = ctx.Array("q", self.slots, lock=False)
+        self._new_frame = ctx.Condition()
+        self._conn, child_conn = ctx.Pipe()
+
+        self._process = ctx.Process(
+            target=_capture_worker,
+            args=(url, backend, params, self.slots, child_conn, self._stop_event,
+                  self._latest_seq, self._slot_seqs, self._new_frame),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+
+        self._handshake(start_timeout)
+
+    def _handshake(self, timeout):
+        """دریافت ابعاد فریم از فرآیند دیکد و ساخت حافظه مشترک"""
+        if not self._conn.poll(timeout):
+            self.error = "زمان باز شدن استریم در فرآیند دیکد به پایان رسید"
+            self.release()
+            return
+
+        message = self._conn.recv()
+        if message[0] != "ready":
+            self.error = message[1]
+            self.release()
+            return
+
+        _, shape, dtype, props = message
+        dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(shape)) * dtype.itemsize
+
+        self._shm = shared_memory.SharedMemory(create=True, size=frame_bytes * self.slots)
+        self._frames = np.ndarray((self.slots,) + tuple(shape), dtype=dtype, buffer=self._shm.buf)
+        self._props = props
+        self._conn.send(("shm", self._shm.name))
+
+    def isOpened(self):
+        """آیا فرآیند دیکد فعال است"""
+        return self._frames is not None and self._process.is_alive()
+
+    def get(self, prop_id):
+        """
+        مقدار یک ویژگی استریم (عرض، ارتفاع، FPS)
+
+        Returns:
+            float: مقدار ویژگی یا 0 اگر موجود نباشد
+        """
+        return float(self._props.get(prop_id, 0.0))
+
+    def read(self, timeout=None):
+        """
+        خواندن جدیدترین فریم بدون کپی
+
+        Args:
+            timeout (float): حداکثر انتظار برای فریم جدید (پیش‌فرض read_timeout)
+
+        Returns:
+            tuple: (ret, frame) مشابه cv2.VideoCapture.read
+        """
+        if self._frames is None:
+            return False, None
+
+        timeout = self.read_timeout if timeout is None else timeout
+        with self._new_frame:
+            self._new_frame.wait_for(
+                lambda: self._latest_seq.value > self._last_seq or not self._process.is_alive(),
+                timeout
+            )
+
+        seq = self._latest_seq.value
+        if seq <= self._last_seq:
+            self._poll_error()
+            return False, None
+
+        slot = seq % self.slots
+        if self._slot_seqs[slot] != seq:
+            # slot در حال بازنویسی است
+            return False, None
+
+        if self._last_seq:
+            self.frames_dropped += seq - self._last_seq - 1
+        self._last_seq = seq
+        return True, self._frames[slot]
+
+    def _poll_error(self):
+        """خواندن پیام خطای فرآیند دیکد (در صورت وجود)"""
+        try:
+            while self._conn.poll():
+                message = self._conn.recv()
+                if message[0] == "error":
+                    self.error = message[1]
+        except (EOFError, OSError):
+            pass
+
+    def release(self, timeout=2.0):
+        """
+        توقف فرآیند دیکد و آزاد کردن حافظه مشترک
+
+        Args:
+            timeout (float): حداکثر انتظار برای پایان فرآیند
+        """
+        self._stop_event.set()
+        if self._process.is_alive():
+            self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+
+        self._frames = None
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                # فریم‌هایی که هنوز نزد مصرف‌کننده هستند؛ mapping با GC بسته می‌شود
+                pass
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = None
+
+        try:
+            self._conn.close()
+        except OSError:
+            pass
@@ -0,0 +1,456 @@
+import collections
+import glob
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+
+from metrics import metrics
+
+
+def segment_path(directory, prefix, wall_time, ext):
+    """
+    مسیر فایل یک بخش ضبط با زمان شروع آن
+
+    Returns:
+        str: مثل recordings/rec_20250814_105916.mp4
+    """
+    return os.path.join(directory, f"{prefix}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(wall_time))}{ext}")
+
+
+class SegmentedRecorder:
+    """
+    ضبط مداوم فریم‌های دیکد شده در فایل‌های زمان‌بندی شده با cv2.VideoWriter
+
+    حلقه دریافت فقط write() را صدا می‌زند که فریم را در صف محدود قرار
+    می‌دهد؛ دیکد JPEG، encode ویدیو و نوشتن روی thread جداگانه انجام
+    می‌شود. اگر صف پر باشد فریم دور ریخته می‌شود تا پیش‌نمایش و حافظه
+    تحت تاثیر قرار نگیرند. هر بخش بعد از segment_seconds یا رسیدن به
+    max_segment_bytes بسته می‌شود. زمان ویدیو با زمان دریافت فریم‌ها هماهنگ
+    می‌ماند: فاصله‌های کوتاه با تکرار فریم قبلی پر و قطعی‌های طولانی باعث
+    شروع بخش جدید می‌شوند.
+    """
+
+    def __init__(self, directory="recordings", prefix="rec", fps=25.0, codec="mp4v", ext=".mp4",
+                 segment_seconds=300.0, max_segment_bytes=None, max_queue=30, max_gap=5.0,
+                 on_segment=None, registry=None, camera=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            directory (str): پوشه فایل‌های ضبط
+            prefix (str): پیشوند نام فایل‌ها
+            fps (float): نرخ فریم فایل خروجی (معمولاً نرخ دوربین)
+            codec (str): کد چهار حرفی VideoWriter
+            ext (str): پسوند فایل
+            segment_seconds (float): حداکثر مدت هر بخش
+            max_segment_bytes (int): حداکثر حجم هر بخش (None یعنی بدون محدودیت)
+            max_queue (int): حداکثر فریم در انتظار نوشتن
+            max_gap (float): فاصله بیشتر از این (ثانیه) بخش جدید شروع می‌کند
+            on_segment (callable): با dict اطلاعات هر بخش بسته شده صدا زده می‌شود
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.fps = float(fps) if fps else 25.0
+        self.codec = codec
+        self.ext = ext
+        self.segment_seconds = segment_seconds
+        self.max_segment_bytes = max_segment_bytes
+        self.max_gap = max_gap
+        self.on_segment = on_segment
+        self.running = False
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._writer = None
+        self._segment = None
+        # آخرین فریم نوشته شده برای پر کردن فاصله‌ها؛ فریم استخر تا جایگزینی retain می‌ماند
+        self._last_frame = None
+
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+        self.frames_skipped = 0
+        self.segments = collections.deque(maxlen=100)
+
+        registry = registry if registry is not None else metrics
+        self._write_hist = registry.histogram("record_write", camera=camera)
+        self._dropped_counter = registry.counter("record_frames_dropped", camera=camera)
+        self._segment_counter = registry.counter("record_segments", camera=camera)
+
+    @property
+    def current_path(self):
+        """مسیر بخش در حال نوشتن یا None"""
+        segment = self._segment
+        return segment["path"] if segment is not None else None
+
+    def start(self):
+        """شروع thread نوشتن"""
+        if self.running:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="segmented-recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        توقف ضبط؛ فریم‌های صف نوشته و بخش جاری بسته می‌شود
+
+        Args:
+            timeout (float): حداکثر انتظار برای پایان نوشتن
+        """
+        if not self.running:
+            return
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def write(self, frame):
+        """
+        قرار دادن یک فریم در صف ضبط (از حلقه دریافت؛ هرگز منتظر نمی‌ماند)
+
+        Args:
+            frame (Frame): فریم؛ تا پایان نوشتن نباید تغییر کند (فریم استخر retain می‌شود)
+
+        Returns:
+            bool: False اگر صف پر بوده و فریم دور ریخته شده باشد
+        """
+        if not self.running:
+            return False
+        frame.retain()
+        try:
+            self._queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            frame.release()
+            self.frames_dropped += 1
+            self._dropped_counter.inc()
+            return False
+
+    def _run(self):
+        """حلقه نوشتن فریم‌ها"""
+        while self.running or not self._queue.empty():
+            try:
+                frame = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._write_frame(frame)
+            except Exception as e:
+                print(f"❌ خطا در ضبط فریم: {str(e)}")
+                self._close_segment()
+            finally:
+                frame.release()
+        self._close_segment()
+
+    def _write_frame(self, frame):
+        """نوشتن یک فریم با هماهنگ نگه داشتن زمان ویدیو و زمان دریافت"""
+        started = time.perf_counter()
+        image = frame.image
+        if image is None:
+            return
+        height, width = image.shape[:2]
+
+        segment = self._segment
+        if segment is not None:
+            expected = int((frame.timestamp - segment["start_ts"]) * self.fps)
+            missing = expected - segment["frames"]
+            if (width, height) != segment["size"] or missing > self.max_gap * self.fps:
+                # تغییر وضوح (اتصال مجدد) یا قطعی طولانی: بخش جدید
+                self._close_segment()
+                segment = None
+            elif missing < 0:
+                # فریم زودتر از نرخ فایل رسیده؛ نوشتن آن زمان ویدیو را جلو می‌اندازد
+                self.frames_skipped += 1
+                return
+            else:
+                for _ in range(missing):
+                    self._writer.write(self._last_frame.image)
+                    segment["frames"] += 1
+                    self.frames_duplicated += 1
+            if segment is not None and self._should_cut(segment, frame.timestamp):
+                self._close_segment()
+                segment = None
+
+        if segment is None:
+            segment = self._open_segment(frame, width, height)
+            if segment is None:
+                return
+
+        self._writer.write(image)
+        previous, self._last_frame = self._last_frame, frame.retain()
+        if previous is not None:
+            previous.release()
+        segment["frames"] += 1
+        self.frames_written += 1
+        self._write_hist.observe((time.perf_counter() - started) * 1000)
+
+    def _should_cut(self, segment, timestamp):
+        """آیا بخش جاری به حد مدت یا حجم رسیده است"""
+        if timestamp - segment["start_ts"] >= self.segment_seconds:
+            return True
+        if self.max_segment_bytes and segment["frames"] % max(1, int(self.fps)) == 0:
+            # حجم فایل هر ثانیه یک بار بررسی می‌شود
+            try:
+                return os.path.getsize(segment["path"]) >= self.max_segment_bytes
+            except OSError:
+                return False
+        return False
+
+    def _open_segment(self, frame, width, height):
+        """شروع بخش جدید"""
+        path = segment_path(self.directory, self.prefix, frame.wall_time, self.ext)
+        if os.path.exists(path):
+            # دو بخش در یک ثانیه (مثلاً بعد از قطعی کوتاه)
+            path = path[:-len(self.ext)] + f"_{int(frame.wall_time * 1000) % 1000:03d}{self.ext}"
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*self.codec), self.fps, (width, height))
+        if not writer.isOpened():
+            print(f"❌ خطا در ایجاد فایل ضبط: {path}")
+            return None
+
+        self._writer = writer
+        self._segment = {
+            "path": path,
+            "size": (width, height),
+            "start_ts": frame.timestamp,
+            "started": frame.wall_time,
+            "frames": 0
+        }
+        return self._segment
+
+    def _close_segment(self):
+        """بستن بخش جاری و ثبت اطلاعات آن"""
+        segment, self._segment = self._segment, None
+        writer, self._writer = self._writer, None
+        last_frame, self._last_frame = self._last_frame, None
+        if last_frame is not None:
+            last_frame.release()
+        if writer is None:
+            return
+        writer.release()
+
+        info = {
+            "path": segment["path"],
+            "started": segment["started"],
+            "duration": segment["frames"] / self.fps,
+            "frames": segment["frames"],
+            "bytes": os.path.getsize(segment["path"]) if os.path.exists(segment["path"]) else 0
+        }
+        self.segments.append(info)
+        self._segment_counter.inc()
+        if self.on_segment is not None:
+            try:
+                self.on_segment(info)
+            except Exception as e:
+                print(f"❌ خطا در پردازش بخش ضبط: {str(e)}")
+
+    def get_stats(self):
+        """
+        آمار ضبط
+
+        Returns:
+            dict: بخش جاری، صف، فریم‌های نوشته/دور ریخته/تکراری و بخش‌های اخیر
+        """
+        segment = self._segment
+        return {
+            "mode": "encode",
+            "running": self.running,
+            "current_path": segment["path"] if segment is not None else None,
+            "queue_depth": self._queue.qsize(),
+            "frames_written": self.frames_written,
+            "frames_dropped": self.frames_dropped,
+            "frames_duplicated": self.frames_duplicated,
+            "frames_skipped": self.frames_skipped,
+            "segments": len(self.segments),
+            "last_segment": dict(self.segments[-1]) if self.segments else None
+        }
+
+
+class FFmpegRecorder:
+    """
+    ضبط بدون دیکد و encode (stream copy) با ffmpeg در فرآیند جداگانه
+
+    بسته‌های ویدیوی دوربین بدون تغییر در بخش‌های زمان‌بندی شده نوشته می‌شوند؛
+    مصرف CPU تقریباً صفر است و کیفیت همان کیفیت دوربین است. اگر ffmpeg
+    متوقف شود با تاخیر دوباره اجرا می‌شود؛ برای حد حجم، بخش جاری با
+    شروع مجدد ffmpeg بسته می‌شود.
+    """
+
+    def __init__(self, url, directory="recordings", prefix="rec", ext=".mp4",
+                 segment_seconds=300.0, max_segment_bytes=None, ffmpeg="ffmpeg",
+                 restart_delay=2.0, registry=None, camera=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            url (str): آدرس استریم (RTSP)
+            directory (str): پوشه فایل‌های ضبط
+            prefix (str): پیشوند نام فایل‌ها
+            ext (str): پسوند فایل
+            segment_seconds (float): مدت هر بخش
+            max_segment_bytes (int): حداکثر حجم هر بخش (None یعنی بدون محدودیت)
+            ffmpeg (str): مسیر فایل اجرایی ffmpeg
+            restart_delay (float): تاخیر اجرای مجدد بعد از توقف ffmpeg
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+        """
+        self.url = url
+        self.directory = directory
+        self.prefix = prefix
+        self.ext = ext
+        self.segment_seconds = segment_seconds
+        self.max_segment_bytes = max_segment_bytes
+        self.ffmpeg = ffmpeg
+        self.restart_delay = restart_delay
+        self.running = False
+
+        self._process = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.restarts = 0
+        self.size_cuts = 0
+        self.started_at = None
+
+        registry = registry if registry is not None else metrics
+        self._restart_counter = registry.counter("record_ffmpeg_restarts", camera=camera)
+
+    @staticmethod
+    def available(ffmpeg="ffmpeg"):
+        """آیا ffmpeg روی سیستم نصب است"""
+        return shutil.which(ffmpeg) is not None
+
+    @property
+    def current_path(self):
+        """جدیدترین فایل بخش (در حال نوشتن)"""
+        files = glob.glob(os.path.join(self.directory, f"{self.prefix}_*{self.ext}"))
+        return max(files, key=os.path.getmtime) if files else None
+
+    def _command(self):
+        """خط فرمان ffmpeg برای ضبط بخش‌بندی شده بدون encode"""
+        command = [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-nostdin"]
+        if self.url.startswith("rtsp://"):
+            command += ["-rtsp_transport", "tcp"]
+        command += [
+            "-i", self.url,
+            "-map", "0:v", "-c", "copy", "-an",
+            "-f", "segment", "-segment_time", str(self.segment_seconds),
+            "-reset_timestamps", "1", "-strftime", "1"
+        ]
+        if self.ext == ".mp4":
+            # MP4 تکه‌تکه؛ با قطع ناگهانی فرآیند هم فایل قابل پخش می‌ماند
+            command += ["-segment_format_options", "movflags=+frag_keyframe+empty_moov"]
+        command.append(os.path.join(self.directory, f"{self.prefix}_%Y%m%d_%H%M%S{self.ext}"))
+        return command
+
+    def _spawn(self):
+        """اجرای فرآیند ffmpeg"""
+        try:
+            self._process = subprocess.Popen(
+                self._command(), stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            return True
+        except OSError as e:
+            print(f"❌ خطا در اجرای ffmpeg: {str(e)}")
+            self._process = None
+            return False
+
+    def _terminate(self):
+        """پایان فرآیند ffmpeg با فرصت بستن فایل جاری"""
+        process, self._process = self._process, None
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def start(self):
+        """
+        شروع ضبط
+
+        Returns:
+            bool: True اگر ffmpeg اجرا شده باشد
+        """
+        if self.running:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        if not self._spawn():
+            return False
+        self.running = True
+        self.started_at = time.time()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._monitor, name="ffmpeg-recorder", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5.0):
+        """
+        توقف ضبط و بستن بخش جاری
+
+        Args:
+            timeout (float): حداکثر انتظار برای پایان thread نظارت
+        """
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._terminate()
+
+    def _monitor(self):
+        """نظارت بر ffmpeg: اجرای مجدد بعد از توقف و بستن بخش در حد حجم"""
+        while not self._stop_event.wait(1.0):
+            process = self._process
+            if process is None or process.poll() is not None:
+                self.restarts += 1
+                self._restart_counter.inc()
+                print(f"⚠️ ffmpeg متوقف شد، اجرای مجدد بعد از {self.restart_delay:.0f} ثانیه")
+                if self._stop_event.wait(self.restart_delay):
+                    break
+                self._spawn()
+                continue
+
+            if self.max_segment_bytes:
+                path = self.current_path
+                try:
+                    too_big = path is not None and os.path.getsize(path) >= self.max_segment_bytes
+                except OSError:
+                    too_big = False
+                if too_big:
+                    self.size_cuts += 1
+                    self._terminate()
+                    # نام بخش بر اساس ثانیه است؛ بخش بعدی نباید همان نام را بگیرد
+                    if self._stop_event.wait(1.0):
+                        break
+                    self._spawn()
+
+    def get_stats(self):
+        """
+        آمار ضبط
+
+        Returns:
+            dict: وضعیت فرآیند، فایل جاری و تعداد اجرای مجدد
+        """
+        process = self._process
+        return {
+            "mode": "copy",
+            "running": self.running,
+            "process_alive": process is not None and process.poll() is None,
+            "current_path": self.current_path,
+            "restarts": self.restarts,
+            "size_cuts": self.size_cuts,
+            "started": self.started_at
+        }
@@ -0,0 +1,399 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from metrics import metrics
+
+
+BOUNDARY = "camerareaderrelay"
+
+STREAM_PATHS = ("/stream.mjpg", "/mjpeg")
+STILL_PATHS = ("/snapshot.jpg", "/still.jpg")
+
+
+class SharedEncoder(threading.Thread):
+    """
+    encode هر فریم grabber فقط یک بار و اشتراک JPEG بین همه کلاینت‌ها
+
+    فقط وقتی کلاینتی متصل است (یا اخیراً عکس خواسته شده) کار می‌کند. هر
+    کلاینت بعد از ارسال فریم قبلی جدیدترین JPEG را برمی‌دارد، پس کلاینت کند
+    فریم‌های میانی را از دست می‌دهد و صفی برای او ساخته نمی‌شود.
+    """
+
+    def __init__(self, grabber, quality=80, max_fps=None, idle_timeout=2.0, registry=None, camera=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            grabber (FrameGrabber): منبع فریم‌ها (یک اتصال و یک دیکد برای همه)
+            quality (int): کیفیت JPEG خروجی (فریم‌های MJPEG بدون encode مجدد ارسال می‌شوند)
+            max_fps (float): سقف نرخ encode (None یعنی نرخ منبع)
+            idle_timeout (float): ادامه encode بعد از آخرین درخواست عکس (ثانیه)
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+        """
+        super().__init__(daemon=True)
+        self.grabber = grabber
+        self.quality = quality
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self.running = False
+
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._source_seq = 0
+        self._encoded_at = None
+        self._last_demand = 0.0
+        self.clients = 0
+        self.frames_encoded = 0
+
+        registry = registry if registry is not None else metrics
+        self._encode_hist = registry.histogram("relay_encode", camera=camera)
+
+    def start(self):
+        """شروع thread encode"""
+        self.running = True
+        super().start()
+
+    def stop(self):
+        """توقف thread encode و بیدار کردن کلاینت‌های منتظر"""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+
+    def add_client(self):
+        """ثبت یک کلاینت استریم"""
+        with self._condition:
+            self.clients += 1
+            self._condition.notify_all()
+
+    def remove_client(self):
+        """حذف یک کلاینت استریم"""
+        with self._condition:
+            self.clients -= 1
+
+    def _active(self):
+        """آیا کسی منتظر فریم است (باید با قفل فراخوانی شود)"""
+        return self.clients > 0 or time.monotonic() - self._last_demand < self.idle_timeout
+
+    def run(self):
+        """حلقه encode: جدیدترین فریم grabber با حداکثر max_fps"""
+        next_due = time.monotonic()
+
+        while self.running:
+            with self._condition:
+                if not self._active():
+                    self._condition.wait(0.5)
+                    continue
+
+            if self.max_fps:
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+            frame = self.grabber.get_latest(timeout=0.5, newer_than=self._source_seq)
+            if frame is None:
+                continue
+            self._source_seq = frame.seq
+
+            with self._encode_hist.time():
+                jpeg = frame.encode(self.quality)
+            frame.release()
+            if jpeg is None:
+                continue
+
+            now = time.monotonic()
+            with self._condition:
+                self._jpeg = jpeg
+                self._seq += 1
+                self._encoded_at = now
+                self.frames_encoded += 1
+                self._condition.notify_all()
+
+            if self.max_fps:
+                next_due = max(next_due + 1.0 / self.max_fps, now)
+
+    def wait_frame(self, after_seq=0, timeout=5.0):
+        """
+        انتظار برای JPEG جدیدتر از after_seq
+
+        Returns:
+            tuple: (seq, jpeg) یا (after_seq, None) در صورت پایان مهلت
+        """
+        with self._condition:
+            self._last_demand = time.monotonic()
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self._seq > after_seq or not self.running, timeout)
+            if self._seq <= after_seq:
+                return after_seq, None
+            return self._seq, self._jpeg
+
+    def latest(self, max_age=1.0, timeout=5.0):
+        """
+        آخرین JPEG برای درخواست عکس؛ اگر قدیمی‌تر از max_age باشد منتظر فریم جدید می‌ماند
+
+        Returns:
+            bytes: محتوای JPEG یا None
+        """
+        with self._condition:
+            if self._jpeg is not None and time.monotonic() - self._encoded_at <= max_age:
+                self._last_demand = time.monotonic()
+                return self._jpeg
+            after_seq = self._seq
+        return self.wait_frame(after_seq, timeout)[1]
+
+
+class RelayHandler(BaseHTTPRequestHandler):
+    """پاسخ به درخواست‌های استریم MJPEG، عکس و آمار"""
+
+    protocol_version = "HTTP/1.1"
+    # کلاینتی که بیش از این مدت دریافت نکند قطع می‌شود
+    timeout = 10
+
+    def log_message(self, format, *args):
+        """لاگ هر درخواست چاپ نمی‌شود"""
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        relay = self.server.relay
+
+        if path == "/":
+            body = (
+                f"<html><body><img src=\"{STREAM_PATHS[0]}\"></body></html>"
+            ).encode("utf-8")
+            self._send(200, "text/html; charset=utf-8", body)
+        elif path in STREAM_PATHS:
+            self._stream(relay)
+        elif path in STILL_PATHS:
+            jpeg = relay.encoder.latest()
+            if jpeg is None:
+                self._send(503, "text/plain", b"no frame")
+            else:
+                self._send(200, "image/jpeg", jpeg)
+        elif path == "/stats":
+            body = json.dumps(relay.get_stats(), ensure_ascii=False, indent=2).encode("utf-8")
+            self._send(200, "application/json; charset=utf-8", body)
+        elif path == "/metrics":
+            self._send(200, "text/plain; version=0.0.4", relay.registry.to_prometheus().encode("utf-8"))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status, content_type, body):
+        """ارسال پاسخ کامل با Content-Length"""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, relay):
+        """ارسال جدیدترین فریم‌ها به صورت multipart/x-mixed-replace"""
+        if not relay.try_add_client():
+            self._send(503, "text/plain", b"too many clients")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        seq = 0
+        try:
+            while relay.running:
+                last_seq = seq
+                seq, jpeg = relay.encoder.wait_frame(seq)
+                if jpeg is None:
+                    continue
+                if last_seq and seq > last_seq + 1:
+                    # کلاینت کند بوده؛ فریم‌های میانی ارسال نمی‌شوند
+                    relay.frames_dropped.inc(seq - last_seq - 1)
+                header = (
+                    f"--{BOUNDARY}\r\n"
+                    f"Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n"
+                ).encode("latin-1")
+                self.wfile.write(header + jpeg + b"\r\n")
+                relay.frames_sent.inc()
+        except (BrokenPipeError, ConnectionResetError, TimeoutError):
+            pass
+        finally:
+            relay.remove_client()
+
+
+class RelayServer:
+    """
+    بازپخش محلی یک دوربین برای چند مصرف‌کننده
+
+    یک اتصال به دوربین و یک دیکد (grabber کنترل کننده) برای همه برنامه‌ها؛
+    هر فریم خروجی یک بار encode می‌شود و همان بایت‌ها به همه کلاینت‌های
+    MJPEG و درخواست‌های عکس داده می‌شود. مسیرها:
+    /stream.mjpg، /snapshot.jpg، /stats و /metrics
+    """
+
+    def __init__(self, controller, host="127.0.0.1", port=8090, quality=80, max_fps=None,
+                 max_clients=32, registry=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            controller (CameraController): کنترل کننده دوربین (در صورت نیاز متصل می‌شود)
+            host (str): آدرس گوش دادن (پیش‌فرض فقط همین سیستم)
+            port (int): پورت HTTP (0 یعنی یک پورت آزاد)
+            quality (int): کیفیت JPEG خروجی
+            max_fps (float): سقف نرخ خروجی (None یعنی نرخ دوربین)
+            max_clients (int): حداکثر کلاینت استریم همزمان
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری کنترل کننده)
+        """
+        self.controller = controller
+        self.host = host
+        self.requested_port = port
+        self.quality = quality
+        self.max_fps = max_fps
+        self.max_clients = max_clients
+        self.registry = registry if registry is not None else controller.metrics
+        self.running = False
+        self.encoder = None
+        self.httpd = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+        camera = controller.ip_address
+        self.frames_sent = self.registry.counter("relay_frames_sent", camera=camera)
+        self.frames_dropped = self.registry.counter("relay_frames_dropped", camera=camera)
+        self.clients_total = self.registry.counter("relay_clients", camera=camera)
+
+    @property
+    def port(self):
+        """پورت واقعی سرور"""
+        return self.httpd.server_address[1] if self.httpd is not None else self.requested_port
+
+    @property
+    def url(self):
+        """آدرس استریم MJPEG برای مصرف‌کننده‌ها"""
+        return f"http://{self.host}:{self.port}{STREAM_PATHS[0]}"
+
+    def start(self):
+        """
+        اتصال به دوربین (در صورت نیاز) و شروع سرور در پس‌زمینه
+
+        Returns:
+            bool: True اگر سرور در حال اجرا باشد
+        """
+        if self.running:
+            return True
+
+        controller = self.controller
+        if controller.cap is None and not controller.open_camera():
+            return False
+        if not controller.start_grabber():
+            return False
+        controller.enable_supervisor()
+
+        try:
+            self.httpd = ThreadingHTTPServer((self.host, self.requested_port), RelayHandler)
+        except OSError as e:
+            print(f"❌ خطا در شروع سرور بازپخش: {str(e)}")
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.relay = self
+
+        self.encoder = SharedEncoder(
+            controller.grabber, quality=self.quality, max_fps=self.max_fps,
+            registry=self.registry, camera=controller.ip_address
+        )
+        self.running = True
+        self.encoder.start()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"✅ بازپخش دوربین روی {self.url}")
+        return True
+
+    def stop(self):
+        """
+        توقف سرور (اتصال دوربین باز می‌ماند)
+        """
+        if not self.running:
+            return
+        self.running = False
+        self.encoder.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        print("✅ سرور بازپخش متوقف شد")
+
+    def try_add_client(self):
+        """ثبت کلاینت جدید در صورت وجود ظرفیت"""
+        with self._lock:
+            if self.encoder.clients >= self.max_clients:
+                return False
+            self.encoder.add_client()
+        self.clients_total.inc()
+        return True
+
+    def remove_client(self):
+        """حذف کلاینت قطع شده"""
+        with self._lock:
+            self.encoder.remove_client()
+
+    def get_stats(self):
+        """
+        آمار بازپخش
+
+        Returns:
+            dict: تعداد کلاینت‌ها، فریم‌های encode و ارسال شده و آمار grabber
+        """
+        grabber = self.controller.grabber
+        return {
+            "url": self.url,
+            "clients": self.encoder.clients if self.encoder is not None else 0,
+            "clients_total": self.clients_total.value,
+            "frames_encoded": self.encoder.frames_encoded if self.encoder is not None else 0,
+            "frames_sent": self.frames_sent.value,
+            "frames_dropped": self.frames_dropped.value,
+            "encode": self.registry.histogram("relay_encode", camera=self.controller.ip_address).snapshot(),
+            "grabber": grabber.get_stats() if grabber is not None else None
+        }
+
+
+def main():
+    """اجرای مستقل سرور بازپخش"""
+    from camera_controller import CameraController
+
+    parser = argparse.ArgumentParser(description="بازپخش یک دوربین برای چند برنامه روی HTTP")
+    parser.add_argument("--ip", default="192.168.1.108")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--camera-port", type=int, default=80)
+    parser.add_argument("--backend", choices=("opencv", "process", "mjpeg"), default="opencv")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--max-fps", type=float)
+    args = parser.parse_args()
+
+    controller = CameraController(
+        args.ip, args.username, args.password, port=args.camera_port,
+        use_grabber=True, capture_backend=args.backend
+    )
+    relay = RelayServer(controller, args.host, args.port, quality=args.quality, max_fps=args.max_fps)
+    if not relay.start():
+        controller.close_camera()
+        return
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.stop()
+        controller.close_camera()
+
+
+if __name__ == "__main__":
+    main()
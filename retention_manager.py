@@ -0,0 +1,191 @@
+import fnmatch
+import os
+import shutil
+import threading
+import time
+
+from metrics import metrics
+
+
+# پیش‌فرض فقط فایل‌های ضبط؛ حذف عکس‌ها و متادیتای سری باید صریحاً خواسته شود
+DEFAULT_PATTERNS = ("*.mp4", "*.mkv", "*.avi")
+SNAPSHOT_PATTERNS = ("*.jpg", "*.jpeg", "*.json")
+
+
+class RetentionManager(threading.Thread):
+    """
+    نگه داشتن حجم فایل‌های ضبط زیر سهمیه دیسک
+
+    به صورت دوره‌ای پوشه‌ها را بررسی می‌کند و قدیمی‌ترین فایل‌ها (بر اساس
+    زمان تغییر) را تا رسیدن به max_bytes یا حداقل فضای آزاد حذف می‌کند.
+    فایل‌هایی که protect برمی‌گرداند (بخش در حال ضبط) هرگز حذف نمی‌شوند.
+    به طور پیش‌فرض فقط ویدیوها حذف می‌شوند؛ برای عکس‌ها باید
+    SNAPSHOT_PATTERNS صریحاً در patterns داده شود.
+    """
+
+    def __init__(self, directories, max_bytes=None, min_free_bytes=None, patterns=DEFAULT_PATTERNS,
+                 interval=60.0, protect=None, on_delete=None, registry=None):
+        """
+        مقداردهی اولیه
+
+        Args:
+            directories (list): پوشه‌های تحت مدیریت (مثلاً recordings)
+            max_bytes (int): حداکثر حجم کل فایل‌ها (None یعنی بدون محدودیت)
+            min_free_bytes (int): حداقل فضای آزاد دیسک (None یعنی بدون بررسی)
+            patterns (tuple): الگوی نام فایل‌هایی که حذف آن‌ها مجاز است
+            interval (float): فاصله بررسی‌ها بر حسب ثانیه
+            protect (callable): تابعی که مجموعه مسیرهای در حال استفاده را برمی‌گرداند
+            on_delete (callable): برای هر فایل حذف شده با (path, size) صدا زده می‌شود
+            registry (MetricsRegistry): محل ثبت متریک‌ها (پیش‌فرض رجیستری مشترک)
+        """
+        super().__init__(daemon=True)
+        if max_bytes is None and min_free_bytes is None:
+            raise ValueError("حداقل یکی از max_bytes یا min_free_bytes باید تعیین شود")
+
+        self.directories = [directories] if isinstance(directories, str) else list(directories)
+        self.max_bytes = max_bytes
+        self.min_free_bytes = min_free_bytes
+        self.patterns = tuple(patterns)
+        self.interval = interval
+        self.protect = protect
+        self.on_delete = on_delete
+        self.running = False
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        self.total_bytes = 0
+        self.file_count = 0
+        self.deleted_files = 0
+        self.deleted_bytes = 0
+        self.last_run = None
+        self.last_error = None
+
+        registry = registry if registry is not None else metrics
+        self._deleted_counter = registry.counter("retention_deleted_files")
+        self._deleted_bytes_counter = registry.counter("retention_deleted_bytes")
+
+    def start(self):
+        """شروع بررسی دوره‌ای (اولین بررسی بلافاصله انجام می‌شود)"""
+        self.running = True
+        super().start()
+
+    def stop(self, timeout=2.0):
+        """
+        توقف بررسی دوره‌ای
+
+        Args:
+            timeout (float): حداکثر انتظار برای پایان thread
+        """
+        self.running = False
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        """حلقه بررسی دوره‌ای"""
+        while self.running:
+            try:
+                self.enforce()
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ خطا در پاکسازی فایل‌های قدیمی: {str(e)}")
+            if self._stop_event.wait(self.interval):
+                break
+
+    def _scan(self):
+        """فهرست فایل‌های مجاز به حذف: [(mtime, size, path), ...]"""
+        files = []
+        for directory in self.directories:
+            if not os.path.isdir(directory):
+                continue
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    if not any(fnmatch.fnmatch(name.lower(), pattern) for pattern in self.patterns):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        return files
+
+    def _free_bytes(self):
+        """فضای آزاد دیسک اولین پوشه"""
+        for directory in self.directories:
+            if os.path.isdir(directory):
+                return shutil.disk_usage(directory).free
+        return None
+
+    def enforce(self):
+        """
+        یک بار بررسی و حذف قدیمی‌ترین فایل‌ها تا رسیدن به سهمیه
+
+        Returns:
+            list: مسیر فایل‌های حذف شده
+        """
+        with self._lock:
+            files = self._scan()
+            total = sum(size for _, size, _ in files)
+            protected = set(os.path.abspath(path) for path in (self.protect() if self.protect else ()) if path)
+
+            need = 0
+            if self.max_bytes is not None and total > self.max_bytes:
+                need = total - self.max_bytes
+            if self.min_free_bytes is not None:
+                free = self._free_bytes()
+                if free is not None and free < self.min_free_bytes:
+                    need = max(need, self.min_free_bytes - free)
+
+            deleted = []
+            freed = 0
+            for _, size, path in files:
+                if freed >= need:
+                    break
+                if os.path.abspath(path) in protected:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    self.last_error = str(e)
+                    continue
+                freed += size
+                deleted.append((path, size))
+
+            self.total_bytes = total - freed
+            self.file_count = len(files) - len(deleted)
+            self.deleted_files += len(deleted)
+            self.deleted_bytes += freed
+            self.last_run = time.time()
+
+        if deleted:
+            self._deleted_counter.inc(len(deleted))
+            self._deleted_bytes_counter.inc(freed)
+            print(f"🧹 {len(deleted)} فایل قدیمی حذف شد ({freed / (1024 * 1024):.1f} MB)")
+            if self.on_delete is not None:
+                for path, size in deleted:
+                    try:
+                        self.on_delete(path, size)
+                    except Exception as e:
+                        print(f"❌ خطا در callback حذف فایل: {str(e)}")
+        return [path for path, _ in deleted]
+
+    def get_stats(self):
+        """
+        آمار سهمیه
+
+        Returns:
+            dict: حجم و تعداد فعلی فایل‌ها و مجموع حذف شده‌ها
+        """
+        return {
+            "directories": list(self.directories),
+            "max_bytes": self.max_bytes,
+            "min_free_bytes": self.min_free_bytes,
+            "total_bytes": self.total_bytes,
+            "files": self.file_count,
+            "deleted_files": self.deleted_files,
+            "deleted_bytes": self.deleted_bytes,
+            "last_run": self.last_run,
+            "last_error": self.last_error
+        }
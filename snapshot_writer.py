@@ -0,0 +1,226 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+
+from frame import Frame
+from metrics import metrics
+
+
+class SnapshotWriter:
+    """
+    ذخیره‌کننده پس‌زمینه عکس‌ها با صف محدود و چند worker برای encode و نوشتن
+
+    فراخواننده فقط فریم را در صف قرار می‌دهد و بلافاصله یک Future دریافت می‌کند؛
+    encode JPEG و نوشتن روی دیسک روی thread های worker انجام می‌شود. وقتی صف
+    پر باشد درخواست رد می‌شود (backpressure) و شمارنده رد شده‌ها افزایش می‌یابد.
+    """
+
+    def __init__(self, workers=2, max_queue=32, registry=None, camera=None):
+        """
+        مقداردهی اولیه و شروع worker ها
+
+        Args:
+            workers (int): تعداد thread های encode/نوشتن
+            max_queue (int): حداکثر تعداد عکس در انتظار
+            registry (MetricsRegistry): محل ثبت زمان‌های صف، encode و نوشتن (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+        """
+        self.max_queue = max_queue
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._running = True
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+        registry = registry if registry is not None else metrics
+        self._queue_hist = registry.histogram("snapshot_queue", camera=camera)
+        self._encode_hist = registry.histogram("snapshot_encode", camera=camera)
+        self._write_hist = registry.histogram("snapshot_write", camera=camera)
+        self._rejected_counter = registry.counter("snapshots_rejected", camera=camera)
+        self._failed_counter = registry.counter("snapshots_failed", camera=camera)
+
+        self._workers = []
+        for i in range(max(1, workers)):
+            worker = threading.Thread(target=self._worker_loop, name=f"snapshot-writer-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, frame, filename, quality=95, callback=None, block=False, timeout=None):
+        """
+        قرار دادن یک فریم در صف ذخیره
+
+        اگر Frame بایت‌های JPEG اصلی داشته باشد و خروجی JPEG باشد، همان بایت‌ها
+        بدون دیکد و encode مجدد نوشته می‌شوند؛ در غیر این صورت دیکد (در صورت
+        نیاز) و encode روی thread worker انجام می‌شود.
+
+        Args:
+            frame (Frame | numpy.ndarray): فریم؛ تا پایان ذخیره نباید تغییر کند (Frame استخر
+                تا پایان ذخیره retain می‌شود)
+            filename (str): مسیر فایل خروجی
+            quality (int): کیفیت JPEG
+            callback (callable): تابعی که با Future تکمیل شده صدا زده می‌شود (روی thread worker)
+            block (bool): در صورت پر بودن صف منتظر بماند
+            timeout (float): حداکثر انتظار در حالت block
+
+        Returns:
+            Future: نتیجه شامل {path, bytes, queue_ms, encode_ms, write_ms} یا None اگر صف پر باشد
+        """
+        is_jpeg = filename.lower().endswith((".jpg", ".jpeg"))
+        if isinstance(frame, Frame) and frame.jpeg is not None and is_jpeg:
+            return self._enqueue(("bytes", frame, None), filename, callback, block, timeout)
+
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)] if is_jpeg else []
+        if isinstance(frame, Frame):
+            frame.retain()
+        future = self._enqueue(("frame", frame, params), filename, callback, block, timeout)
+        if future is None and isinstance(frame, Frame):
+            frame.release()
+        return future
+
+    def submit_bytes(self, data, filename, callback=None, block=False, timeout=None):
+        """
+        قرار دادن بایت‌های از پیش encode شده (مثلاً JPEG دوربین) در صف نوشتن
+
+        Args:
+            data (bytes): محتوای فایل
+            filename (str): مسیر فایل خروجی
+            callback (callable): تابعی که با Future تکمیل شده صدا زده می‌شود
+            block (bool): در صورت پر بودن صف منتظر بماند
+            timeout (float): حداکثر انتظار در حالت block
+
+        Returns:
+            Future: مشابه submit یا None اگر صف پر باشد
+        """
+        return self._enqueue(("bytes", data, None), filename, callback, block, timeout)
+
+    def _enqueue(self, payload, filename, callback, block, timeout):
+        """ساخت Future و قرار دادن کار در صف"""
+        if not self._running:
+            return None
+
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        job = (future, payload, filename, time.perf_counter())
+        try:
+            self._queue.put(job, block=block, timeout=timeout)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            self._rejected_counter.inc()
+            print(f"⚠️ صف ذخیره عکس پر است ({self.max_queue})، عکس رد شد: {filename}")
+            return None
+
+        with self._lock:
+            self.submitted += 1
+        return future
+
+    def _worker_loop(self):
+        """حلقه worker: encode و نوشتن کارهای صف"""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                break
+
+            future, (kind, data, params), filename, enqueued = job
+            frame = data if isinstance(data, Frame) else None
+            if not future.set_running_or_notify_cancel():
+                if kind == "frame" and frame is not None:
+                    frame.release()
+                self._queue.task_done()
+                continue
+
+            try:
+                started = time.perf_counter()
+                if kind == "frame":
+                    image = frame.image if frame is not None else data
+                    ext = os.path.splitext(filename)[1] or ".jpg"
+                    ok, encoded = cv2.imencode(ext, image, params)
+                    if not ok:
+                        raise IOError(f"خطا در encode تصویر: {filename}")
+                    data = encoded.tobytes()
+                elif frame is not None:
+                    data = frame.jpeg
+                encoded_at = time.perf_counter()
+
+                directory = os.path.dirname(filename)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(filename, "wb") as f:
+                    f.write(data)
+                written_at = time.perf_counter()
+
+                result = {
+                    "path": filename,
+                    "bytes": len(data),
+                    "queue_ms": (started - enqueued) * 1000,
+                    "encode_ms": (encoded_at - started) * 1000,
+                    "write_ms": (written_at - encoded_at) * 1000
+                }
+                if frame is not None:
+                    # تاخیر سرتاسری از دریافت فریم تا ذخیره روی دیسک
+                    result["capture_to_write_ms"] = frame.age() * 1000
+                self._queue_hist.observe(result["queue_ms"])
+                self._encode_hist.observe(result["encode_ms"])
+                self._write_hist.observe(result["write_ms"])
+                with self._lock:
+                    self.completed += 1
+                future.set_result(result)
+
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                self._failed_counter.inc()
+                future.set_exception(e)
+            finally:
+                if kind == "frame" and frame is not None:
+                    frame.release()
+                self._queue.task_done()
+
+    def get_stats(self):
+        """
+        آمار صف ذخیره
+
+        Returns:
+            dict: عمق صف، ظرفیت و شمارنده‌ها
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self.max_queue,
+                "full": self._queue.full(),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected
+            }
+
+    def flush(self):
+        """انتظار تا ذخیره همه عکس‌های صف"""
+        self._queue.join()
+
+    def shutdown(self, wait=True):
+        """
+        توقف worker ها
+
+        Args:
+            wait (bool): انتظار برای ذخیره عکس‌های باقیمانده در صف
+        """
+        if not self._running:
+            return
+        self._running = False
+
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_CACHE_PATH = "stream_cache.json"
+
+# قفل مشترک هر فایل کش بین نمونه‌های StreamCache همین فرآیند
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path):
+    """قفل مشترک یک مسیر فایل"""
+    with _file_locks_guard:
+        return _file_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def strip_credentials(url):
+    """
+    حذف نام کاربری و رمز عبور از آدرس استریم (برای ذخیره روی دیسک)
+
+    Args:
+        url (str): آدرس کامل
+
+    Returns:
+        str: آدرس بدون اطلاعات ورود
+    """
+    parts = urlsplit(url)
+    host = parts.hostname or ""
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return urlunsplit((parts.scheme, host, parts.path, parts.query, parts.fragment))
+
+
+def add_credentials(url, username, password):
+    """
+    اضافه کردن نام کاربری و رمز عبور به آدرس استریم
+
+    Args:
+        url (str): آدرس بدون اطلاعات ورود
+        username (str): نام کاربری
+        password (str): رمز عبور
+
+    Returns:
+        str: آدرس کامل (مسیر فایل محلی بدون تغییر)
+    """
+    parts = urlsplit(url)
+    if not parts.hostname:
+        return url
+    netloc = f"{username}:{password}@{parts.netloc}" if username else parts.netloc
+    return urlunsplit((parts.scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+class StreamCache:
+    """
+    کش دائمی آخرین آدرس استریم، backend و پارامترهای موفق برای هر دوربین
+
+    کلید هر ورودی ترکیب IP و مدل دوربین است. پس از چند شکست پیاپی
+    ورودی حذف می‌شود تا دفعه بعد همه آدرس‌ها دوباره امتحان شوند. برای
+    چند دوربین بهتر است یک نمونه مشترک استفاده شود؛ با این حال هر ذخیره
+    فایل را دوباره می‌خواند و فقط کلید تغییر کرده را جایگزین می‌کند تا
+    نمونه‌های دیگر روی همان فایل ورودی‌های هم را پاک نکنند.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_failures=3):
+        """
+        مقداردهی اولیه کش
+
+        Args:
+            path (str): مسیر فایل JSON کش
+            max_failures (int): تعداد شکست پیاپی قبل از حذف ورودی
+        """
+        self.path = path
+        self.max_failures = max_failures
+        self._lock = threading.Lock()
+        self._file_lock = _file_lock(path)
+        self._entries = self._load()
+
+    @staticmethod
+    def make_key(ip_address, model):
+        """کلید کش برای یک دوربین"""
+        return f"{ip_address}|{model}"
+
+    def _load(self):
+        """خواندن کش از دیسک"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, key):
+        """
+        ادغام تغییر یک کلید با محتوای فعلی فایل و ذخیره اتمیک (باید با قفل فراخوانی شود)
+
+        Args:
+            key (str): کلید تغییر کرده؛ اگر در حافظه نباشد از فایل هم حذف می‌شود
+        """
+        with self._file_lock:
+            entries = self._load()
+            if key in self._entries:
+                entries[key] = self._entries[key]
+            else:
+                entries.pop(key, None)
+            # ورودی‌های نوشته شده توسط نمونه‌های دیگر هم در حافظه دیده می‌شوند
+            self._entries = entries
+
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                print(f"❌ خطا در ذخیره کش استریم: {str(e)}")
+
+    def get(self, ip_address, model, username=None, password=None):
+        """
+        دریافت ورودی کش یک دوربین
+
+        Args:
+            ip_address (str): آدرس IP دوربین
+            model (str): مدل دوربین
+            username (str): نام کاربری برای ساخت آدرس کامل (اختیاری)
+            password (str): رمز عبور برای ساخت آدرس کامل (اختیاری)
+
+        Returns:
+            dict: {url, backend, params, failures, updated} یا None
+        """
+        with self._lock:
+            entry = self._entries.get(self.make_key(ip_address, model))
+            if entry is None:
+                return None
+            entry = dict(entry)
+
+        if username:
+            entry["url"] = add_credentials(entry["url"], username, password)
+        return entry
+
+    def store(self, ip_address, model, url, backend=None, params=None):
+        """
+        ثبت آدرس موفق و صفر کردن شمارنده شکست
+
+        Args:
+            ip_address (str): آدرس IP دوربین
+            model (str): مدل دوربین
+            url (str): آدرس استریم موفق
+            backend (int): backend استفاده شده
+            params (list): پارامترهای باز کردن capture
+        """
+        key = self.make_key(ip_address, model)
+        with self._lock:
+            self._entries[key] = {
+                "url": strip_credentials(url),
+                "backend": backend,
+                "params": list(params or []),
+                "failures": 0,
+                "updated": time.time()
+            }
+            self._save(key)
+
+    def record_failure(self, ip_address, model):
+        """
+        ثبت یک شکست برای ورودی کش؛ با رسیدن به حد مجاز ورودی حذف می‌شود
+
+        Returns:
+            bool: True اگر ورودی حذف شده باشد
+        """
+        key = self.make_key(ip_address, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+
+            entry["failures"] = entry.get("failures", 0) + 1
+            invalidated = entry["failures"] >= self.max_failures
+            if invalidated:
+                del self._entries[key]
+            self._save(key)
+            return invalidated
+
+    def invalidate(self, ip_address, model):
+        """حذف ورودی کش یک دوربین"""
+        key = self.make_key(ip_address, model)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._save(key)
+
+
+def probe_with_cache(prober, cache, ip_address, model, username, password, urls):
+    """
+    اتصال با اولویت آدرس کش شده و در صورت شکست، امتحان همه آدرس‌ها
+
+    Args:
+        prober (StreamProber): موتور امتحان آدرس‌ها
+        cache (StreamCache): کش آدرس‌ها (می‌تواند None باشد)
+        ip_address (str): آدرس IP دوربین
+        model (str): مدل دوربین
+        username (str): نام کاربری
+        password (str): رمز عبور
+        urls (list): همه آدرس‌های ممکن
+
+    Returns:
+        dict: خروجی prober به همراه کلید from_cache یا None
+    """
+    if cache is not None:
+        entry = cache.get(ip_address, model, username, password)
+        if entry is not None:
+            result = prober.probe_one(entry["url"], entry.get("backend"), entry.get("params"))
+            if result is not None:
+                result["from_cache"] = True
+                cache.store(ip_address, model, result["url"], result["backend"], result["params"])
+                return result
+            cache.record_failure(ip_address, model)
+
+    result = prober.probe(urls)
+    if result is None:
+        return None
+
+    result["from_cache"] = False
+    if cache is not None:
+        cache.store(ip_address, model, result["url"], result["backend"], result["params"])
+    return result
@@ -0,0 +1,254 @@
+import queue
+import threading
+import time
+
+import cv2
+
+
+def open_capture(url, timeout_ms=None, backend=None, params=None):
+    """
+    باز کردن یک استریم با محدودیت زمانی اتصال و خواندن (در صورت پشتیبانی OpenCV)
+
+    Args:
+        url (str): آدرس استریم
+        timeout_ms (int): حداکثر زمان باز کردن و خواندن بر حسب میلی‌ثانیه
+        backend (int): backend مشخص OpenCV (مثلاً از کش)؛ در این حالت params استفاده می‌شود
+        params (list): پارامترهای باز کردن capture
+
+    Returns:
+        tuple: (cap, backend, params)
+    """
+    if backend is not None:
+        params = list(params or [])
+        if params:
+            return cv2.VideoCapture(url, backend, params), backend, params
+        return cv2.VideoCapture(url, backend), backend, params
+
+    if timeout_ms and hasattr(cv2, "CAP_PROP_OPEN_TIMEOUT_MSEC"):
+        backend = cv2.CAP_FFMPEG
+        params = [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(timeout_ms),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(timeout_ms)
+        ]
+        return cv2.VideoCapture(url, backend, params), backend, params
+
+    return cv2.VideoCapture(url), cv2.CAP_ANY, []
+
+
+class StreamProber:
+    """
+    امتحان همزمان چند آدرس استریم و انتخاب اولین آدرسی که فریم معتبر برگرداند
+    """
+
+    def __init__(self, timeout=10.0, max_workers=4):
+        """
+        مقداردهی اولیه
+
+        Args:
+            timeout (float): مهلت هر تلاش اتصال بر حسب ثانیه
+            max_workers (int): حداکثر تعداد تلاش همزمان
+        """
+        self.timeout = timeout
+        self.max_workers = max(1, max_workers)
+        self.timings = []
+
+    def probe(self, urls):
+        """
+        امتحان آدرس‌ها به صورت موازی
+
+        Capture های بازنده بلافاصله پس از باز شدن آزاد می‌شوند و تلاش‌هایی
+        که هنوز شروع نشده‌اند لغو می‌شوند. اتصالی که موفق ولی کندتر از timeout
+        باز شده باشد کنار گذاشته نمی‌شود و فقط در زمان‌ها با slow علامت می‌خورد.
+
+        Args:
+            urls (list): آدرس‌های استریم به ترتیب اولویت
+
+        Returns:
+            dict: {url, cap, frame, backend, params, elapsed, slow} یا None اگر هیچ آدرسی کار نکند
+        """
+        if not urls:
+            return None
+
+        results = queue.Queue()
+        done = threading.Event()
+        lock = threading.Lock()
+        slots = threading.Semaphore(self.max_workers)
+        timeout_ms = int(self.timeout * 1000)
+
+        def worker(url):
+            with slots:
+                if done.is_set():
+                    results.put({"url": url, "status": "cancelled", "elapsed": 0.0})
+                    return
+
+                started = time.monotonic()
+                cap = None
+                frame = None
+                backend = None
+                params = []
+                status = "failed"
+                error = None
+
+                try:
+                    cap, backend, params = open_capture(url, timeout_ms)
+                    if cap.isOpened():
+                        ret, frame = cap.read()
+                        if ret and frame is not None:
+                            status = "ok"
+                except Exception as e:
+                    error = str(e)
+
+                elapsed = time.monotonic() - started
+
+                is_winner = False
+                with lock:
+                    if status == "ok":
+                        if done.is_set():
+                            status = "cancelled"
+                        else:
+                            done.set()
+                            is_winner = True
+
+                if not is_winner and cap is not None:
+                    try:
+                        cap.release()
+                    except Exception:
+                        pass
+
+                result = {"url": url, "status": status, "elapsed": elapsed}
+                if error:
+                    result["error"] = error
+                if is_winner:
+                    result.update({
+                        "cap": cap,
+                        "frame": frame,
+                        "backend": backend,
+                        "params": params
+                    })
+                results.put(result)
+
+        for url in urls:
+            threading.Thread(target=worker, args=(url,), daemon=True).start()
+
+        # مهلت کل: هر دسته از تلاش‌ها حداکثر یک timeout طول می‌کشد
+        rounds = -(-len(urls) // self.max_workers)
+        deadline = time.monotonic() + self.timeout * rounds + 1.0
+        winner = None
+        pending = set(urls)
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                result = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            pending.discard(result["url"])
+            self._record(result["url"], result["status"], result["elapsed"])
+
+            if "cap" in result:
+                winner = result
+                break
+
+        with lock:
+            done.set()
+
+        # ممکن است برنده درست قبل از پایان مهلت ثبت شده باشد
+        while winner is None:
+            try:
+                result = results.get_nowait()
+            except queue.Empty:
+                break
+            pending.discard(result["url"])
+            self._record(result["url"], result["status"], result["elapsed"])
+            if "cap" in result:
+                winner = result
+
+        for url in pending:
+            self._record(url, "abandoned", None)
+
+        if winner is None:
+            return None
+
+        return {
+            "url": winner["url"],
+            "cap": winner["cap"],
+            "frame": winner["frame"],
+            "backend": winner["backend"],
+            "params": winner["params"],
+            "elapsed": winner["elapsed"],
+            "slow": winner["elapsed"] > self.timeout
+        }
+
+    def probe_one(self, url, backend=None, params=None):
+        """
+        امتحان یک آدرس مشخص (مثلاً آدرس ذخیره شده در کش)
+
+        Args:
+            url (str): آدرس استریم
+            backend (int): backend ذخیره شده (اختیاری)
+            params (list): پارامترهای ذخیره شده (اختیاری)
+
+        Returns:
+            dict: مشابه خروجی probe یا None در صورت شکست
+        """
+        started = time.monotonic()
+        cap = None
+        status = "failed"
+        frame = None
+
+        try:
+            cap, backend, params = open_capture(
+                url, int(self.timeout * 1000), backend=backend, params=params
+            )
+            if cap.isOpened():
+                ret, frame = cap.read()
+                if ret and frame is not None:
+                    status = "ok"
+        except Exception:
+            pass
+
+        elapsed = time.monotonic() - started
+        self._record(url, status, elapsed)
+
+        if status != "ok":
+            if cap is not None:
+                cap.release()
+            return None
+
+        return {
+            "url": url,
+            "cap": cap,
+            "frame": frame,
+            "backend": backend,
+            "params": params,
+            "elapsed": elapsed,
+            "slow": elapsed > self.timeout
+        }
+
+    def _record(self, url, status, elapsed):
+        """ثبت زمان یک تلاش؛ اتصال موفق کندتر از timeout با slow علامت می‌خورد"""
+        self.timings.append({
+            "url": url,
+            "status": status,
+            "elapsed": elapsed,
+            "slow": status == "ok" and elapsed is not None and elapsed > self.timeout
+        })
+
+    def format_timings(self):
+        """
+        متن خلاصه زمان هر تلاش برای نمایش در لاگ
+
+        Returns:
+            list: خطوط متنی
+        """
+        lines = []
+        for item in self.timings:
+            if item["elapsed"] is None:
+                lines.append(f"⏱️ {item['url']}: {item['status']}")
+            else:
+                slow = " ⚠️ کندتر از مهلت" if item.get("slow") else ""
+                lines.append(f"⏱️ {item['url']}: {item['status']} ({item['elapsed']:.2f}s){slow}")
+        return lines
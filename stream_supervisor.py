@@ -0,0 +1,253 @@
+import collections
+import random
+import threading
+import time
+
+from metrics import metrics
+
+
+class StreamSupervisor(threading.Thread):
+    """
+    نگهبان اتصال استریم: تشخیص توقف فریم‌ها و اتصال مجدد در پس‌زمینه
+
+    حلقه خواندن فقط frame_received() یا report_failure() را صدا می‌زند. اگر
+    تا stall_timeout فریمی نرسد یا خطا گزارش شود، اتصال جدید با تاخیر نمایی
+    تصادفی (jitter) ساخته و با on_swap جایگزین می‌شود؛ thread خواندن و
+    رابط کاربری دوباره ساخته نمی‌شوند. capture قبلی توسط خود حلقه خواندن
+    (بعد از برگشتن read مسدود شده) آزاد می‌شود. مدت هر قطعی تا رسیدن اولین
+    فریم جدید ثبت می‌شود.
+    """
+
+    def __init__(self, connect, on_swap, stall_timeout=5.0, initial_backoff=0.5,
+                 max_backoff=30.0, backoff_factor=2.0, jitter=0.5, on_status=None,
+                 registry=None, camera=None, max_outages=100, connected=False):
+        """
+        مقداردهی اولیه
+
+        Args:
+            connect (callable): ساخت capture جدید (ترجیحاً با آدرس قبلی)؛ None در صورت شکست
+            on_swap (callable): نصب capture جدید در حلقه خواندن
+            stall_timeout (float): حداکثر فاصله مجاز بین دو فریم قبل از اعلام توقف
+            initial_backoff (float): تاخیر اولین تلاش مجدد (ثانیه)
+            max_backoff (float): سقف تاخیر بین تلاش‌ها
+            backoff_factor (float): ضریب افزایش تاخیر بعد از هر شکست
+            jitter (float): دامنه تغییر تصادفی تاخیر (0.5 یعنی ±50%)
+            on_status (callable): تابعی با (connected, message) برای گزارش وضعیت
+            registry (MetricsRegistry): محل ثبت شمارنده‌ها و زمان بازیابی (پیش‌فرض رجیستری مشترک)
+            camera (str): برچسب دوربین در متریک‌ها
+            max_outages (int): تعداد قطعی‌های اخیر نگه داشته شده
+            connected (bool): اتصال اولیه از قبل برقرار است و فقط نظارت لازم است
+        """
+        super().__init__(daemon=True)
+        self.connect = connect
+        self.on_swap = on_swap
+        self.stall_timeout = stall_timeout
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self.on_status = on_status
+        self.running = False
+
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._needs_connect = not connected
+        self._connected = connected
+        self._started_at = time.monotonic()
+        self._last_frame = self._started_at if connected else None
+        self._outage = None
+
+        self.state = "connected" if connected else "connecting"
+        self.outages = collections.deque(maxlen=max_outages)
+        self.reconnects = 0
+        self.stalls = 0
+        self.failed_attempts = 0
+        self.initial_connect_seconds = None
+
+        registry = registry if registry is not None else metrics
+        self._recovery_hist = registry.histogram(
+            "recovery", buckets=(100, 500, 1000, 2000, 5000, 10000, 30000, 60000, 300000), camera=camera
+        )
+        self._reconnect_counter = registry.counter("reconnects", camera=camera)
+        self._stall_counter = registry.counter("stalls", camera=camera)
+        self._attempt_counter = registry.counter("reconnect_attempts_failed", camera=camera)
+
+    def _status(self, connected, message):
+        """گزارش وضعیت بدون اینکه خطای گیرنده حلقه نگهبان را متوقف کند"""
+        if self.on_status is not None:
+            try:
+                self.on_status(connected, message)
+            except Exception as e:
+                print(f"❌ خطا در گزارش وضعیت: {str(e)}")
+
+    def start(self):
+        """شروع نگهبان (اولین اتصال هم توسط همین thread انجام می‌شود)"""
+        self.running = True
+        self._started_at = time.monotonic()
+        if self._connected:
+            self._last_frame = self._started_at
+        super().start()
+
+    def stop(self, timeout=2.0):
+        """
+        توقف نگهبان
+
+        Args:
+            timeout (float): حداکثر انتظار برای پایان thread
+        """
+        self.running = False
+        self._stop_event.set()
+        with self._wake:
+            self._wake.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+        self.state = "stopped"
+
+    def frame_received(self, now=None):
+        """
+        اعلام رسیدن یک فریم سالم (از حلقه خواندن)
+
+        Args:
+            now (float): زمان monotonic (پیش‌فرض اکنون)
+        """
+        if now is None:
+            now = time.monotonic()
+        self._last_frame = now
+
+        if self._outage is None:
+            return
+        with self._lock:
+            outage = self._outage
+            if outage is None or self._needs_connect:
+                return
+            self._outage = None
+            self.state = "connected"
+
+        recovered = now - outage["started"]
+        outage["recovered_after"] = recovered
+        self.outages.append(outage)
+        self._recovery_hist.observe(recovered * 1000)
+        self._status(True, f"✅ استریم بعد از {recovered:.1f} ثانیه بازیابی شد ({outage['attempts']} تلاش)")
+
+    def report_failure(self, reason="خطا در دریافت فریم"):
+        """
+        اعلام خطای خواندن از حلقه خواندن؛ اتصال مجدد بلافاصله شروع می‌شود
+
+        Args:
+            reason (str): علت برای ثبت در تاریخچه قطعی‌ها
+        """
+        with self._wake:
+            self._begin_outage(reason, time.monotonic())
+            self._wake.notify_all()
+
+    def _begin_outage(self, reason, now):
+        """ثبت شروع قطعی و درخواست اتصال مجدد (باید با قفل فراخوانی شود)"""
+        if self._needs_connect or not self._connected:
+            return
+        self._needs_connect = True
+        self.state = "reconnecting"
+
+        if self._outage is None:
+            # قطعی از زمان آخرین فریم سالم حساب می‌شود
+            started = self._last_frame if self._last_frame is not None else now
+            self._outage = {
+                "reason": reason,
+                "started": started,
+                "wall_time": time.time() - (now - started),
+                "detected_after": now - started,
+                "attempts": 0,
+                "recovered_after": None
+            }
+
+    def run(self):
+        """حلقه نگهبان: بررسی توقف فریم‌ها و اتصال در صورت نیاز"""
+        check_interval = max(0.1, min(1.0, self.stall_timeout / 4))
+
+        while self.running:
+            with self._wake:
+                if not self._needs_connect:
+                    self._wake.wait(check_interval)
+                if not self.running:
+                    break
+
+                now = time.monotonic()
+                if self._connected and not self._needs_connect and self._last_frame is not None and \
+                        now - self._last_frame > self.stall_timeout:
+                    self.stalls += 1
+                    self._stall_counter.inc()
+                    self._begin_outage(f"هیچ فریمی در {self.stall_timeout:.0f} ثانیه", now)
+                    stalled = True
+                else:
+                    stalled = False
+                needs_connect = self._needs_connect
+
+            if stalled:
+                self._status(False, f"⚠️ استریم متوقف شده (بیش از {self.stall_timeout:.0f} ثانیه بدون فریم)")
+            if needs_connect:
+                self._connect_with_backoff()
+
+    def _connect_with_backoff(self):
+        """تلاش برای اتصال با تاخیر نمایی تصادفی تا موفقیت یا توقف"""
+        delay = self.initial_backoff
+        reconnect = self._connected
+
+        while self.running:
+            if self._outage is not None:
+                self._outage["attempts"] += 1
+
+            try:
+                cap = self.connect()
+            except Exception as e:
+                print(f"❌ خطا در اتصال مجدد: {str(e)}")
+                cap = None
+
+            if cap is not None:
+                if not self.running:
+                    cap.release()
+                    return
+                self.on_swap(cap)
+                with self._lock:
+                    now = time.monotonic()
+                    # زمان توقف از لحظه نصب capture جدید دوباره شمرده می‌شود
+                    self._last_frame = now
+                    self._needs_connect = False
+                    self._connected = True
+                    if reconnect:
+                        self.reconnects += 1
+                        self._reconnect_counter.inc()
+                        self.state = "recovering"
+                    else:
+                        self.initial_connect_seconds = now - self._started_at
+                        self.state = "connected"
+                return
+
+            self.failed_attempts += 1
+            self._attempt_counter.inc()
+            wait = min(self.max_backoff, delay) * (1 + random.uniform(-self.jitter, self.jitter))
+            self._status(False, f"🔄 اتصال ناموفق، تلاش مجدد بعد از {wait:.1f} ثانیه")
+            if self._stop_event.wait(wait):
+                return
+            delay = min(self.max_backoff, delay * self.backoff_factor)
+
+    def get_stats(self):
+        """
+        آمار نگهبان
+
+        Returns:
+            dict: وضعیت، تعداد اتصال مجدد و توقف، قطعی جاری و زمان بازیابی قطعی‌های اخیر
+        """
+        recoveries = [outage["recovered_after"] for outage in self.outages]
+        current = self._outage
+        return {
+            "state": self.state,
+            "reconnects": self.reconnects,
+            "stalls": self.stalls,
+            "failed_attempts": self.failed_attempts,
+            "initial_connect_seconds": self.initial_connect_seconds,
+            "last_frame_age": time.monotonic() - self._last_frame if self._last_frame is not None else None,
+            "current_outage_seconds": time.monotonic() - current["started"] if current is not None else None,
+            "last_recovery_seconds": recoveries[-1] if recoveries else None,
+            "max_recovery_seconds": max(recoveries) if recoveries else None,
+            "outages": [dict(outage) for outage in self.outages]
+        }
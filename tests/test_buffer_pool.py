@@ -0,0 +1,138 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+import recorder  # noqa: E402
+from buffer_pool import BufferPool  # noqa: E402
+from frame import Frame  # noqa: E402
+from metrics import MetricsRegistry  # noqa: E402
+from recorder import SegmentedRecorder  # noqa: E402
+
+
+SHAPE = (4, 4, 3)
+
+
+@pytest.fixture
+def pool():
+    return BufferPool(max_buffers=4, registry=MetricsRegistry())
+
+
+def _pooled_frame(pool, value, timestamp=0.0):
+    """فریمی روی آرایه استخر با lease، مثل حلقه دریافت"""
+    image = pool.acquire(SHAPE)
+    image[:] = value
+    return Frame(image=image, timestamp=timestamp, wall_time=1000.0 + timestamp, lease=pool.lease(image))
+
+
+def test_released_buffer_is_reused(pool):
+    buffer = pool.acquire(SHAPE)
+    pool.release(buffer)
+
+    assert pool.acquire(SHAPE) is buffer
+    assert pool.reuses == 1
+    assert pool.allocations == 1
+
+
+def test_retained_buffer_is_not_reused(pool):
+    frame = _pooled_frame(pool, 1)
+    frame.retain()
+    # ارجاع حلقه دریافت آزاد می‌شود ولی مصرف‌کننده هنوز فریم را نگه داشته است
+    frame.release()
+
+    other = pool.acquire(SHAPE)
+    assert other is not frame.image
+    assert frame.image.min() == 1
+    pool.release(other)
+
+    frame.release()
+    assert pool.get_stats()["busy"] == 0
+    reused = pool.acquire(SHAPE)
+    assert reused is frame.image or reused is other
+
+
+def test_lease_counts(pool):
+    buffer = pool.acquire(SHAPE)
+    lease = pool.lease(buffer)
+    assert lease.refs == 1
+
+    assert lease.retain() is lease
+    assert lease.refs == 2
+    lease.release()
+    assert lease.refs == 1
+    assert pool.get_stats()["busy"] == 1
+
+    lease.release()
+    assert lease.refs == 0
+    assert pool.get_stats()["busy"] == 0
+
+
+def test_release_after_zero_is_ignored(pool):
+    buffer = pool.acquire(SHAPE)
+    lease = pool.lease(buffer)
+    lease.release()
+    lease.release()
+
+    assert lease.refs == 0
+    assert pool.get_stats()["buffers"] == 1
+    with pytest.raises(RuntimeError):
+        lease.retain()
+
+
+def test_double_and_foreign_release_are_ignored(pool):
+    buffer = pool.acquire(SHAPE)
+    pool.release(buffer)
+    pool.release(buffer)
+    pool.release(np.zeros(SHAPE, dtype=np.uint8))
+
+    assert pool.get_stats()["buffers"] == 1
+    assert pool.lease(np.zeros(SHAPE, dtype=np.uint8)) is None
+
+
+def test_frame_without_lease_ignores_retain_and_release():
+    frame = Frame(image=np.zeros(SHAPE, dtype=np.uint8))
+    assert frame.lease is None
+    assert frame.retain() is frame
+    frame.release()
+
+
+class FakeVideoWriter:
+    """VideoWriter ساختگی که کپی هر تصویر نوشته شده را نگه می‌دارد"""
+
+    instances = []
+
+    def __init__(self, path, fourcc, fps, size):
+        self.frames = []
+        FakeVideoWriter.instances.append(self)
+
+    def isOpened(self):
+        return True
+
+    def write(self, image):
+        self.frames.append(image.copy())
+
+    def release(self):
+        pass
+
+
+def test_recorder_gap_fill_keeps_the_previous_frame(pool, tmp_path, monkeypatch):
+    FakeVideoWriter.instances = []
+    monkeypatch.setattr(recorder.cv2, "VideoWriter", FakeVideoWriter)
+    rec = SegmentedRecorder(directory=str(tmp_path), fps=10, registry=MetricsRegistry())
+
+    first = _pooled_frame(pool, 1, timestamp=0.0)
+    rec._write_frame(first)
+    first.release()
+
+    # آرایه استخر آزاد دیگر نباید همان آرایه فریم قبلی باشد
+    second = _pooled_frame(pool, 2, timestamp=0.3)
+    assert second.image is not first.image
+    rec._write_frame(second)
+    second.release()
+
+    written = FakeVideoWriter.instances[0].frames
+    assert [int(image.max()) for image in written] == [1, 1, 1, 2]
+    assert rec.frames_duplicated == 2
+
+    rec._close_segment()
+    assert pool.get_stats()["busy"] == 0
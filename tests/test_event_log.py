@@ -0,0 +1,100 @@
+import pytest
+
+import event_log
+from event_log import EventLog
+from metrics import MetricsRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(event_log.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def log():
+    log = EventLog(window=5.0, rate_limit=3, registry=MetricsRegistry())
+    yield log
+    log.close()
+
+
+def test_numbers_do_not_change_the_key():
+    assert EventLog.make_key("تلاش 3 بعد از 1.5 ثانیه") == EventLog.make_key("تلاش 4 بعد از 2.0 ثانیه")
+
+
+def test_repeats_beyond_the_limit_are_suppressed(clock, log):
+    results = [log.log(f"خطا در خواندن فریم {i}") for i in range(10)]
+
+    assert results == [True] * 3 + [False] * 7
+    assert log.suppressed == 7
+    assert len(log.drain()) == 3
+
+
+def test_window_end_adds_one_summary_line(clock, log):
+    for i in range(10):
+        log.log(f"خطا در خواندن فریم {i}")
+    log.drain()
+
+    clock.now += 5.0
+    entries = log.drain()
+
+    assert len(entries) == 1
+    assert entries[0].repeats == 10
+    assert "×10" in entries[0].message
+    assert "فریم 9" in entries[0].message
+
+
+def test_no_summary_when_nothing_was_suppressed(clock, log):
+    log.log("اتصال برقرار شد")
+    log.drain()
+
+    clock.now += 5.0
+    assert log.drain() == []
+
+
+def test_new_window_allows_messages_again(clock, log):
+    for _ in range(5):
+        log.log("پیام", key="same")
+    clock.now += 5.0
+
+    assert log.log("پیام", key="same") is True
+    messages = [entry.message for entry in log.drain()]
+    # سه پیام پنجره اول، خلاصه آن و اولین پیام پنجره جدید
+    assert len(messages) == 5
+    assert "×5" in messages[3]
+
+
+def test_keys_are_limited_independently(clock, log):
+    for _ in range(3):
+        log.log("a", key="a")
+    assert log.log("b", key="b") is True
+    assert log.log("a", key="a") is False
+
+
+def test_recent_is_bounded_by_capacity(clock):
+    log = EventLog(capacity=5, rate_limit=100, registry=MetricsRegistry())
+    for i in range(10):
+        log.log(f"پیام {i}", key=str(i))
+
+    assert [entry.message for entry in log.recent()] == [f"پیام {i}" for i in range(5, 10)]
+    assert [entry.message for entry in log.recent(2)] == ["پیام 8", "پیام 9"]
+
+
+def test_file_output(tmp_path, clock):
+    path = tmp_path / "events.log"
+    log = EventLog(file_path=str(path), registry=MetricsRegistry())
+    log.log("اتصال برقرار شد", level="warning")
+    log.close()
+
+    content = path.read_text(encoding="utf-8")
+    assert "WARNING" in content
+    assert "اتصال برقرار شد" in content
@@ -0,0 +1,51 @@
+import pytest
+
+from frame_pacer import FramePacer
+
+
+def test_passes_every_frame_without_target():
+    pacer = FramePacer()
+    assert all(pacer.on_frame(now=i * 0.04) for i in range(10))
+    assert pacer.frames_out == 10
+    assert pacer.frames_skipped == 0
+
+
+def test_passes_every_frame_when_target_above_source_rate():
+    pacer = FramePacer(target_fps=30)
+    pacer.set_source_fps(25)
+    assert all(pacer.on_frame(now=i * 0.04) for i in range(10))
+
+
+def test_halves_a_25fps_source_to_12_5fps():
+    pacer = FramePacer(target_fps=12.5)
+    decisions = [pacer.on_frame(now=i * 0.04) for i in range(100)]
+
+    assert decisions[:4] == [True, False, True, False]
+    assert sum(decisions) == 50
+    assert pacer.frames_skipped == 50
+
+
+def test_does_not_burst_after_a_long_gap():
+    pacer = FramePacer(target_fps=10)
+    pacer.on_frame(now=0.0)
+    # بعد از توقف طولانی فقط یک فریم عبور می‌کند، نه فریم‌های عقب مانده
+    assert pacer.on_frame(now=5.0)
+    assert not pacer.on_frame(now=5.01)
+    assert not pacer.on_frame(now=5.05)
+    assert pacer.on_frame(now=5.1)
+
+
+def test_measures_input_and_output_rates():
+    pacer = FramePacer(target_fps=5)
+    for i in range(51):
+        pacer.on_frame(now=i * 0.04)
+
+    assert pacer.input_fps == pytest.approx(25.0)
+    assert pacer.output_fps == pytest.approx(5.0)
+
+
+@pytest.mark.parametrize("fps", [0, -1, None, 1000])
+def test_ignores_invalid_source_fps(fps):
+    pacer = FramePacer()
+    pacer.set_source_fps(fps)
+    assert pacer.source_fps == 0.0
@@ -0,0 +1,91 @@
+import json
+import time
+
+from metrics import Counter, Histogram, MetricsRegistry, RateMeter
+
+
+def test_histogram_quantiles_and_buckets():
+    histogram = Histogram(buckets=(1, 10, 100))
+    for value in (0.5, 5, 5, 50, 500):
+        histogram.observe(value)
+
+    assert histogram.count == 5
+    assert histogram.cumulative_counts() == [1, 3, 4, 5]
+    assert histogram.quantile(0.5) == 5
+
+
+def test_counter_and_rate():
+    counter = Counter()
+    counter.inc()
+    counter.inc(4)
+    assert counter.snapshot() == 5
+
+    rate = RateMeter(window=5.0)
+    now = time.monotonic()
+    for offset in (-2.0, -1.0, 0.0):
+        rate.mark(now + offset)
+    assert 0.9 < rate.rate() <= 1.0
+    assert rate.snapshot()["total"] == 3
+
+
+def test_rate_forgets_events_outside_window():
+    rate = RateMeter(window=1.0)
+    now = time.monotonic()
+    rate.mark(now - 10.0)
+    rate.mark(now - 9.5)
+    assert rate.rate() == 0.0
+    assert rate.total == 2
+
+
+def test_same_labels_return_same_metric():
+    registry = MetricsRegistry()
+    first = registry.counter("frames", camera="10.0.0.1")
+    second = registry.counter("frames", camera="10.0.0.1")
+    other = registry.counter("frames", camera="10.0.0.2")
+
+    assert first is second
+    assert first is not other
+
+
+def test_none_label_beside_string_label_does_not_break_export():
+    # یک جزء بدون دوربین (camera=None) کنار جزء دیگری با IP زیر همان نام
+    registry = MetricsRegistry()
+    registry.counter("buffer_reuses", pool="frames", camera=None).inc()
+    registry.counter("buffer_reuses", pool="frames", camera="192.168.1.108").inc(2)
+    registry.histogram("overlay", camera=None).observe(1.0)
+    registry.histogram("overlay", camera="192.168.1.108").observe(2.0)
+
+    snapshot = registry.snapshot()
+    labels = [entry["labels"] for entry in snapshot["counters"]]
+    assert {"pool": "frames"} in labels
+    assert {"pool": "frames", "camera": "192.168.1.108"} in labels
+
+    text = registry.to_prometheus()
+    assert 'camerareader_buffer_reuses_total{pool="frames"} 1' in text
+    assert 'camerareader_buffer_reuses_total{camera="192.168.1.108",pool="frames"} 2' in text
+    json.loads(registry.to_json())
+
+
+def test_none_label_is_same_as_missing_label():
+    registry = MetricsRegistry()
+    assert registry.counter("drops", camera=None) is registry.counter("drops")
+
+
+def test_non_string_label_values_are_normalized():
+    registry = MetricsRegistry()
+    registry.counter("frames", camera=1).inc()
+    registry.counter("frames", camera="1").inc()
+    registry.counter("frames", camera="a").inc()
+
+    values = {entry["labels"]["camera"]: entry["value"] for entry in registry.snapshot()["counters"]}
+    assert values == {"1": 2, "a": 1}
+
+
+def test_snapshot_filters_by_label():
+    registry = MetricsRegistry()
+    registry.counter("frames", camera="10.0.0.1").inc()
+    registry.counter("frames", camera="10.0.0.2").inc()
+    registry.counter("frames").inc()
+
+    counters = registry.snapshot(camera="10.0.0.1")["counters"]
+    assert [entry["labels"] for entry in counters] == [{"camera": "10.0.0.1"}]
@@ -0,0 +1,112 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("requests")
+
+from mjpeg_reader import MJPEGReader  # noqa: E402
+
+
+JPEGS = [b"\xff\xd8" + bytes([i]) * (50 + i * 7) + b"\xff\xd9" for i in range(1, 6)]
+
+
+class FakeResponse:
+    def __init__(self, body, content_type, chunk, status_code=200):
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.status_code = status_code
+        self.chunk = chunk
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        # اندازه chunk ثابت تست تا مرزها وسط chunkها بیفتند
+        for start in range(0, len(self.body), self.chunk):
+            yield self.body[start:start + self.chunk]
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, **kwargs):
+        return self.response
+
+
+def _multipart(parts, boundary=b"--myboundary", content_length=True):
+    body = b""
+    for part in parts:
+        body += boundary + b"\r\nContent-Type: image/jpeg\r\n"
+        if content_length:
+            body += b"Content-Length: " + str(len(part)).encode() + b"\r\n"
+        body += b"\r\n" + part + b"\r\n"
+    return body
+
+
+def _reader(body, content_type="multipart/x-mixed-replace; boundary=myboundary", chunk=17, **kwargs):
+    reader = MJPEGReader(FakeSession(FakeResponse(body, content_type, chunk)), "http://camera/mjpeg", **kwargs)
+    assert reader.open()
+    return reader
+
+
+@pytest.mark.parametrize("chunk", [1, 17, 64, 4096])
+def test_parts_with_content_length(chunk):
+    reader = _reader(_multipart(JPEGS), chunk=chunk)
+
+    assert list(reader) == JPEGS
+    assert reader.frames_read == len(JPEGS)
+    assert reader.read_jpeg() is None
+
+
+@pytest.mark.parametrize("chunk", [1, 17, 4096])
+def test_parts_without_content_length(chunk):
+    # بدون Content-Length، هر بخش با رسیدن مرز بعدی کامل می‌شود
+    body = _multipart(JPEGS, content_length=False) + b"--myboundary--\r\n"
+    reader = _reader(body, chunk=chunk)
+
+    assert list(reader) == JPEGS
+
+
+def test_quoted_boundary_with_dashes():
+    body = _multipart(JPEGS[:2], boundary=b"--frame")
+    reader = _reader(body, content_type='multipart/x-mixed-replace;boundary="--frame"')
+
+    assert list(reader) == JPEGS[:2]
+
+
+def test_markers_used_when_boundary_is_missing():
+    body = b"garbage" + b"\r\n".join(JPEGS)
+    reader = _reader(body, content_type="image/jpeg")
+
+    assert list(reader) == JPEGS
+
+
+def test_non_mjpeg_response_is_rejected():
+    response = FakeResponse(b"<html></html>", "text/html", 64)
+    reader = MJPEGReader(FakeSession(response), "http://camera/")
+
+    assert not reader.open()
+    assert response.closed
+    assert not reader.isOpened()
+
+
+def test_error_status_is_rejected():
+    response = FakeResponse(b"", "multipart/x-mixed-replace; boundary=x", 64, status_code=401)
+    assert not MJPEGReader(FakeSession(response), "http://camera/").open()
+
+
+def test_grab_keeps_jpeg_without_decoding():
+    reader = _reader(_multipart(JPEGS))
+
+    assert reader.grab()
+    assert reader.last_jpeg == JPEGS[0]
+    assert reader.grab()
+    assert reader.last_jpeg == JPEGS[1]
+
+
+def test_buffer_is_compacted_while_reading():
+    reader = _reader(_multipart(JPEGS * 20), chunk=64)
+    for _ in reader:
+        assert len(reader._buffer) < 1024
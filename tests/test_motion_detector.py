@@ -0,0 +1,106 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from metrics import MetricsRegistry  # noqa: E402
+from motion_detector import MotionDetector, MotionZone  # noqa: E402
+
+
+DARK = np.zeros((40, 40), dtype=np.uint8)
+BRIGHT = np.full((40, 40), 255, dtype=np.uint8)
+
+
+def _detector(**kwargs):
+    events, ends = [], []
+    detector = MotionDetector(
+        width=40, blur=False, min_frames=2, hold=1.0, cooldown=5.0,
+        on_motion=events.append, on_motion_end=ends.append, registry=MetricsRegistry(), **kwargs
+    )
+    return detector, events, ends
+
+
+def _feed(detector, frames, start=0.0, step=0.1):
+    """ارسال فریم‌ها با فاصله زمانی ثابت؛ زمان فریم بعدی برگردانده می‌شود"""
+    now = start
+    for image in frames:
+        detector.process(image, now=now)
+        now += step
+    return now
+
+
+def _flicker(count):
+    """فریم‌های متناوب تاریک و روشن (حرکت در هر فریم)"""
+    return [BRIGHT if i % 2 else DARK for i in range(count)]
+
+
+def test_single_changed_frame_does_not_start_an_event():
+    detector, events, _ = _detector()
+    _feed(detector, [DARK, BRIGHT, BRIGHT, BRIGHT])
+
+    assert events == []
+    assert not detector.in_motion
+
+
+def test_event_starts_after_min_frames_of_motion():
+    detector, events, _ = _detector()
+    _feed(detector, _flicker(3))
+
+    assert len(events) == 1
+    assert events[0]["index"] == 1
+    assert events[0]["zones"] == ["all"]
+    assert detector.in_motion
+
+
+def test_event_ends_after_hold_without_motion():
+    detector, events, ends = _detector()
+    # آخرین حرکت در فریم چهارم (t=0.3)، رویداد از فریم سوم (t=0.2)
+    now = _feed(detector, _flicker(4))
+
+    now = _feed(detector, [BRIGHT] * 5, start=now)
+    assert ends == []
+    _feed(detector, [BRIGHT] * 10, start=now)
+
+    assert len(ends) == 1
+    assert ends[0]["duration"] == pytest.approx(0.1)
+    assert not detector.in_motion
+
+
+def test_cooldown_blocks_the_next_event():
+    detector, events, ends = _detector()
+    now = _feed(detector, _flicker(3))
+    now = _feed(detector, [BRIGHT] * 15, start=now)
+    assert len(ends) == 1
+
+    now = _feed(detector, _flicker(4), start=now)
+    assert len(events) == 1
+
+    now = _feed(detector, [BRIGHT] * 50, start=now)
+    _feed(detector, _flicker(4), start=now)
+    assert len(events) == 2
+    assert events[1]["index"] == 2
+
+
+def test_motion_outside_zone_is_ignored():
+    detector, events, _ = _detector(zones=[MotionZone("left", (0.0, 0.0, 0.5, 1.0))])
+    right = DARK.copy()
+    right[:, 30:] = 255
+    _feed(detector, [DARK, right, DARK, right])
+
+    assert events == []
+    assert detector.last_scores["left"] == 0
+
+
+def test_callback_errors_do_not_stop_detection():
+    def broken(event):
+        raise RuntimeError("boom")
+
+    detector = MotionDetector(width=40, blur=False, min_frames=1, on_motion=broken, registry=MetricsRegistry())
+    _feed(detector, _flicker(2))
+    assert detector.events == 1
+
+
+@pytest.mark.parametrize("rect", [(0, 0, 0, 1), (0.5, 0, 0.6, 1), (-0.1, 0, 0.5, 0.5)])
+def test_invalid_zone_is_rejected(rect):
+    with pytest.raises(ValueError):
+        MotionZone("bad", rect)
@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from metrics import MetricsRegistry
+from retention_manager import DEFAULT_PATTERNS, SNAPSHOT_PATTERNS, RetentionManager
+
+
+def _make_file(directory, name, size, mtime):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    directory = tmp_path / "recordings"
+    directory.mkdir()
+    return str(directory)
+
+
+def test_requires_a_limit(recordings):
+    with pytest.raises(ValueError):
+        RetentionManager([recordings])
+
+
+def test_deletes_oldest_files_until_under_quota(recordings):
+    oldest = _make_file(recordings, "a.mp4", 100, 1000)
+    middle = _make_file(recordings, "b.mp4", 100, 2000)
+    newest = _make_file(recordings, "c.mp4", 100, 3000)
+
+    manager = RetentionManager(recordings, max_bytes=150, registry=MetricsRegistry())
+    deleted = manager.enforce()
+
+    assert deleted == [oldest, middle]
+    assert os.path.exists(newest)
+    stats = manager.get_stats()
+    assert stats["total_bytes"] == 100
+    assert stats["files"] == 1
+    assert stats["deleted_bytes"] == 200
+
+
+def test_protected_file_is_never_deleted(recordings):
+    active = _make_file(recordings, "a.mp4", 100, 1000)
+    older = _make_file(recordings, "b.mp4", 100, 2000)
+
+    manager = RetentionManager(
+        recordings, max_bytes=50, protect=lambda: [active], registry=MetricsRegistry()
+    )
+
+    assert manager.enforce() == [older]
+    assert os.path.exists(active)
+
+
+def test_snapshots_are_kept_by_default(recordings, tmp_path):
+    snapshots = tmp_path / "snapshots"
+    snapshots.mkdir()
+    snapshot = _make_file(str(snapshots), "auto_1.jpg", 100, 500)
+    sidecar = _make_file(str(snapshots), "series_1.json", 100, 500)
+    video = _make_file(recordings, "a.mp4", 100, 1000)
+
+    manager = RetentionManager([recordings, str(snapshots)], max_bytes=0, registry=MetricsRegistry())
+
+    assert manager.enforce() == [video]
+    assert os.path.exists(snapshot)
+    assert os.path.exists(sidecar)
+
+
+def test_snapshot_eviction_is_opt_in(tmp_path):
+    snapshots = tmp_path / "snapshots"
+    snapshots.mkdir()
+    snapshot = _make_file(str(snapshots), "auto_1.jpg", 100, 500)
+
+    manager = RetentionManager(
+        str(snapshots), max_bytes=0, patterns=DEFAULT_PATTERNS + SNAPSHOT_PATTERNS,
+        registry=MetricsRegistry()
+    )
+
+    assert manager.enforce() == [snapshot]
+
+
+def test_on_delete_reports_each_file(recordings):
+    first = _make_file(recordings, "a.mp4", 10, 1000)
+    second = _make_file(recordings, "b.mkv", 20, 2000)
+    reported = []
+
+    def broken_callback(path, size):
+        reported.append((path, size))
+        raise RuntimeError("callback error")
+
+    manager = RetentionManager(recordings, max_bytes=0, on_delete=broken_callback, registry=MetricsRegistry())
+
+    assert manager.enforce() == [first, second]
+    assert reported == [(first, 10), (second, 20)]
@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+pytest.importorskip("cv2")
+
+import stream_prober  # noqa: E402
+from stream_prober import StreamProber  # noqa: E402
+
+
+class SlowCapture:
+    def __init__(self, delay):
+        self.delay = delay
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def read(self):
+        time.sleep(self.delay)
+        return True, object()
+
+    def release(self):
+        self.released = True
+
+
+def test_slow_but_working_stream_is_kept(monkeypatch):
+    cap = SlowCapture(0.1)
+    monkeypatch.setattr(stream_prober, "open_capture", lambda url, timeout_ms=None, **kwargs: (cap, 1900, []))
+
+    prober = StreamProber(timeout=0.05, max_workers=1)
+    result = prober.probe(["rtsp://camera/slow"])
+
+    assert result is not None
+    assert result["cap"] is cap
+    assert result["slow"] is True
+    assert not cap.released
+    assert prober.timings[0]["status"] == "ok"
+    assert prober.timings[0]["slow"] is True
+    assert "کندتر از مهلت" in prober.format_timings()[0]
@@ -0,0 +1,101 @@
+import pytest
+
+from metrics import MetricsRegistry
+from stream_supervisor import StreamSupervisor
+
+
+class FakeCapture:
+    def __init__(self):
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+def _supervisor(results, **kwargs):
+    """نگهبانی که connect آن به ترتیب results را برمی‌گرداند و به جای خواب تاخیرها را ثبت می‌کند"""
+    results = list(results)
+    swapped = []
+    waits = []
+    supervisor = StreamSupervisor(
+        connect=lambda: results.pop(0), on_swap=swapped.append,
+        registry=MetricsRegistry(), **kwargs
+    )
+    supervisor._stop_event.wait = lambda timeout: waits.append(timeout) or False
+    supervisor.running = True
+    return supervisor, swapped, waits
+
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    cap = FakeCapture()
+    supervisor, swapped, waits = _supervisor(
+        [None] * 6 + [cap], initial_backoff=0.5, max_backoff=4.0, backoff_factor=2.0, jitter=0
+    )
+
+    supervisor._connect_with_backoff()
+
+    assert waits == [0.5, 1.0, 2.0, 4.0, 4.0, 4.0]
+    assert swapped == [cap]
+    assert supervisor.failed_attempts == 6
+    assert supervisor.state == "connected"
+    assert supervisor.initial_connect_seconds is not None
+
+
+def test_jitter_stays_within_bounds():
+    supervisor, _, waits = _supervisor(
+        [None] * 20 + [FakeCapture()], initial_backoff=1.0, max_backoff=1.0, jitter=0.5
+    )
+
+    supervisor._connect_with_backoff()
+
+    assert len(waits) == 20
+    assert all(0.5 <= wait <= 1.5 for wait in waits)
+
+
+def test_connect_exception_counts_as_failed_attempt():
+    cap = FakeCapture()
+    calls = iter([RuntimeError("boom"), cap])
+
+    def connect():
+        result = next(calls)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    supervisor, swapped, waits = _supervisor([], initial_backoff=0.25, jitter=0)
+    supervisor.connect = connect
+
+    supervisor._connect_with_backoff()
+
+    assert waits == [0.25]
+    assert swapped == [cap]
+
+
+def test_stop_during_backoff_ends_the_loop():
+    supervisor, swapped, _ = _supervisor([None, FakeCapture()], jitter=0)
+    supervisor._stop_event.wait = lambda timeout: True
+
+    supervisor._connect_with_backoff()
+
+    assert swapped == []
+    assert supervisor.failed_attempts == 1
+
+
+def test_failure_then_frame_records_recovery():
+    cap = FakeCapture()
+    supervisor, swapped, _ = _supervisor([cap], connected=True, jitter=0)
+    supervisor.frame_received(now=100.0)
+
+    supervisor.report_failure("read error")
+    assert supervisor.state == "reconnecting"
+    supervisor._connect_with_backoff()
+    assert supervisor.reconnects == 1
+    assert swapped == [cap]
+
+    supervisor.frame_received(now=103.0)
+
+    stats = supervisor.get_stats()
+    assert stats["state"] == "connected"
+    assert stats["last_recovery_seconds"] == pytest.approx(3.0)
+    assert stats["outages"][0]["reason"] == "read error"
+    assert stats["outages"][0]["attempts"] == 1